@@ -0,0 +1 @@
+# Benchmark suite: synthetic Downloads trees and a runner for the core operations
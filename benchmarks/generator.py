@@ -0,0 +1,101 @@
+import math
+import os
+import random
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+# Extension mix of a typical Downloads folder, as relative weights
+DEFAULT_EXTENSIONS = {
+    'pdf': 30, 'docx': 10, 'xlsx': 8, 'zip': 10, 'exe': 5, 'mp4': 4,
+    'jpg': 15, 'png': 8, 'txt': 5, '': 2, 'tmp': 3,
+}
+NAME_WORDS = [
+    'report', 'invoice', 'setup', 'photo', 'scan', 'draft', 'budget',
+    'resume', 'notes', 'statement', 'installer', 'video', 'backup', 'slides',
+]
+EXCLUDED_FOLDERS = ['node_modules', '.git', 'venv']
+
+def generate_tree(root: Path,
+                  files: int = 10000,
+                  depth: int = 4,
+                  files_per_folder: int = 50,
+                  extensions: Optional[Dict[str, float]] = None,
+                  median_size_kb: float = 512,
+                  size_sigma: float = 2.0,
+                  mtime_spread_days: int = 365,
+                  excluded_fraction: float = 0.2,
+                  seed: int = 0) -> Dict[str, Any]:
+    """
+    Create a deterministic synthetic Downloads tree under ``root``
+
+    The same arguments always produce the same names, sizes and times.
+    Files are sparse, so large trees cost almost no disk space.
+
+    Args:
+        root: Directory to create the tree in
+        files: Number of regular files, including excluded-folder noise
+        depth: Maximum folder nesting below ``root``
+        files_per_folder: Average number of files per folder
+        extensions: Extension weights (defaults to a typical Downloads mix)
+        median_size_kb: Median of the log-normal size distribution
+        size_sigma: Spread of the log-normal size distribution
+        mtime_spread_days: Modification times are spread uniformly over this many past days
+        excluded_fraction: Share of files placed under node_modules/.git/venv folders
+        seed: Random seed
+
+    Returns:
+        Summary of what was generated
+    """
+    rng = random.Random(seed)
+    extensions = extensions or DEFAULT_EXTENSIONS
+    ext_names = list(extensions)
+    ext_weights = [extensions[ext] for ext in ext_names]
+    now = time.time()
+
+    folder_count = max(1, math.ceil(files / files_per_folder))
+    folders: List[Path] = [root]
+    excluded_folders: List[Path] = []
+    for i in range(folder_count - 1):
+        parent = rng.choice(folders)
+        if len(parent.relative_to(root).parts) >= depth:
+            parent = root
+        folders.append(parent / f"{rng.choice(NAME_WORDS)}_{i}")
+    if excluded_fraction > 0:
+        for i, name in enumerate(EXCLUDED_FOLDERS):
+            base = rng.choice(folders) / name
+            excluded_folders.extend(base / f"pkg_{i}_{j}" for j in range(max(1, folder_count // 20)))
+
+    for folder in folders + excluded_folders:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    total_bytes = 0
+    excluded_files = 0
+    for i in range(files):
+        if excluded_folders and rng.random() < excluded_fraction:
+            folder = rng.choice(excluded_folders)
+            excluded_files += 1
+        else:
+            folder = rng.choice(folders)
+        ext = rng.choices(ext_names, ext_weights)[0]
+        name = f"{rng.choice(NAME_WORDS)}_{i}" + (f".{ext}" if ext else "")
+        if rng.random() < 0.05:
+            name = '.' + name  # Hidden file
+        size = int(rng.lognormvariate(math.log(median_size_kb * 1024), size_sigma))
+        mtime = now - rng.uniform(0, mtime_spread_days) * 86400
+
+        path = folder / name
+        with open(path, 'wb') as f:
+            f.truncate(size)  # Sparse: no data blocks are written
+        os.utime(path, (mtime, mtime))
+        total_bytes += size
+
+    return {
+        'root': str(root),
+        'files': files,
+        'folders': len(folders),
+        'excluded_folders': len(excluded_folders),
+        'excluded_files': excluded_files,
+        'total_bytes': total_bytes,
+        'seed': seed,
+    }
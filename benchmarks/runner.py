@@ -0,0 +1,367 @@
+"""
+Benchmark runner for the core DropClear operations
+
+Each operation runs in a fresh interpreter against a freshly generated
+synthetic tree, so peak RSS and filesystem call counts belong to that
+operation alone. Results are written as JSON and can be compared against
+an earlier run:
+
+    python -m benchmarks.runner --files 20000 --output after.json --compare before.json
+
+The startup operation times a headless ``dropclear.py scan --json`` over an
+empty folder; the runner exits with status 1 when it exceeds
+STARTUP_BUDGET_S.
+"""
+import argparse
+import builtins
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.generator import generate_tree, EXCLUDED_FOLDERS
+
+# Wall-time budget for interpreter start-up plus a headless command
+STARTUP_BUDGET_S = 0.3
+
+# Filesystem functions counted as syscalls at the os module boundary
+COUNTED_CALLS = [
+    'stat', 'lstat', 'scandir', 'unlink', 'remove', 'replace', 'rename',
+    'mkdir', 'rmdir', 'utime', 'chmod', 'copy_file_range', 'sendfile',
+]
+
+class _CountingEntry:
+    """DirEntry proxy that counts the one stat syscall behind its cached stat()"""
+    __slots__ = ('_entry', '_counter', '_stated')
+
+    def __init__(self, entry: os.DirEntry, counter: 'SyscallCounter'):
+        self._entry = entry
+        self._counter = counter
+        self._stated = False
+
+    @property
+    def name(self) -> str:
+        return self._entry.name
+
+    @property
+    def path(self) -> str:
+        return self._entry.path
+
+    def is_dir(self, *, follow_symlinks: bool = True) -> bool:
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, *, follow_symlinks: bool = True) -> bool:
+        return self._entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self) -> bool:
+        return self._entry.is_symlink()
+
+    def inode(self) -> int:
+        return self._entry.inode()
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result:
+        if not self._stated:
+            self._counter.add('stat')
+            self._stated = True
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+    def __fspath__(self) -> str:
+        return self._entry.path
+
+class _CountingScandir:
+    def __init__(self, iterator, counter: 'SyscallCounter'):
+        self._iterator = iterator
+        self._counter = counter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._iterator.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> _CountingEntry:
+        return _CountingEntry(next(self._iterator), self._counter)
+
+    def close(self) -> None:
+        self._iterator.close()
+
+class SyscallCounter:
+    """
+    Counts filesystem calls made through the os module and open()
+
+    DirEntry.stat() is counted once per entry, matching the single stat the
+    kernel performs before the result is cached.
+    """
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._originals: Dict[str, Callable] = {}
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def _wrap(self, name: str, func: Callable) -> Callable:
+        def counted(*args, **kwargs):
+            self.add(name)
+            return func(*args, **kwargs)
+        return counted
+
+    def __enter__(self) -> 'SyscallCounter':
+        for name in COUNTED_CALLS:
+            if hasattr(os, name):
+                self._originals[name] = getattr(os, name)
+                setattr(os, name, self._wrap(name, getattr(os, name)))
+        original_scandir = self._originals['scandir']
+        os.scandir = lambda *args: (self.add('scandir'), _CountingScandir(original_scandir(*args), self))[1]
+        self._originals['open'] = builtins.open
+        builtins.open = self._wrap('open', builtins.open)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        builtins.open = self._originals.pop('open')
+        for name, func in self._originals.items():
+            setattr(os, name, func)
+        self._originals.clear()
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+def peak_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def bench_config(root: str) -> Dict[str, Any]:
+    return {
+        'downloads_path': root,
+        'archive_path': root + '_archive',
+        'min_size_mb': 1,
+        'max_age_days': 30,
+        'exclude_extensions': ['zip', 'mp4', 'exe'],
+        'exclude_folders': list(EXCLUDED_FOLDERS),
+        'delete_workers': 8,
+        'archive_workers': 4,
+    }
+
+# Each operation does its untimed setup and returns the timed callable,
+# which returns the number of files it processed.
+
+def op_scan_directory(config: Dict[str, Any]) -> Callable[[], int]:
+    from src.utils.file_utils import scan_directory
+    return lambda: len(scan_directory(Path(config['downloads_path']), exclude_folders=config['exclude_folders']))
+
+def _file_infos(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from src.utils.file_utils import scan_file_infos
+    return list(scan_file_infos(Path(config['downloads_path']), config['exclude_folders']))
+
+def op_filter_files(config: Dict[str, Any]) -> Callable[[], int]:
+    from src.utils.file_utils import filter_files
+    infos = _file_infos(config)
+
+    def run() -> int:
+        filter_files(
+            infos,
+            min_age=config['max_age_days'],
+            min_size=config['min_size_mb'],
+            exclude_extensions=config['exclude_extensions'],
+            exclude_folders=config['exclude_folders']
+        )
+        return len(infos)
+    return run
+
+def op_fuzzy_match_file(config: Dict[str, Any]) -> Callable[[], int]:
+    from src.utils.file_utils import fuzzy_match_file
+    infos = _file_infos(config)
+
+    def run() -> int:
+        for info in infos:
+            fuzzy_match_file(info, 'invoce statment')
+        return len(infos)
+    return run
+
+def op_clean_files(config: Dict[str, Any]) -> Callable[[], int]:
+    from src.core.cleaner import FileCleaner
+    from src.utils.file_utils import filter_files
+    files = filter_files(
+        _file_infos(config),
+        min_age=config['max_age_days'],
+        min_size=config['min_size_mb'],
+        exclude_extensions=config['exclude_extensions']
+    )
+    cleaner = FileCleaner(config)
+    return lambda: len(cleaner.clean_files(files).deleted)
+
+def op_archive_files(config: Dict[str, Any]) -> Callable[[], int]:
+    from src.core.archiver import FileArchiver
+    archiver = FileArchiver(config)
+    return lambda: len(archiver.archive_files(['pdf', 'docx', 'xlsx'], config['archive_path']))
+
+def op_startup(config: Dict[str, Any]) -> Callable[[], int]:
+    # An empty Downloads folder leaves only start-up and config loading
+    empty = config['downloads_path'] + '_empty'
+    os.makedirs(empty, exist_ok=True)
+    config_file = config['downloads_path'] + '_config.json'
+    with open(config_file, 'w') as f:
+        json.dump(dict(config, downloads_path=empty), f)
+    command = [sys.executable, str(PROJECT_ROOT / 'dropclear.py'), '--config', config_file, 'scan', '--json']
+
+    def run() -> int:
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        return 1
+    return run
+
+OPERATIONS = {
+    'startup': op_startup,
+    'scan_directory': op_scan_directory,
+    'filter_files': op_filter_files,
+    'fuzzy_match_file': op_fuzzy_match_file,
+    'clean_files': op_clean_files,
+    'archive_files': op_archive_files,
+}
+
+def run_single(operation: str, root: str) -> Dict[str, Any]:
+    """Measure one operation in the current process"""
+    run = OPERATIONS[operation](bench_config(root))
+    with SyscallCounter() as counter:
+        started = time.perf_counter()
+        files = run()
+        wall = time.perf_counter() - started
+    return {
+        'wall_s': wall,
+        'files': files,
+        'files_per_s': files / wall if wall else None,
+        'syscalls': counter.total,
+        'syscalls_by_call': dict(counter.counts),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(operations: List[str], tree_options: Dict[str, Any]) -> Dict[str, Any]:
+    results = {}
+    for operation in operations:
+        # A fresh tree per operation keeps destructive runs independent
+        with tempfile.TemporaryDirectory(prefix='dropclear-bench-') as workdir:
+            root = os.path.join(workdir, 'Downloads')
+            tree = generate_tree(Path(root), **tree_options)
+            result_file = os.path.join(workdir, 'result.json')
+            subprocess.run(
+                [sys.executable, '-m', 'benchmarks.runner', '--single', operation,
+                 '--root', root, '--result', result_file],
+                cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, check=True
+            )
+            with open(result_file) as f:
+                results[operation] = json.load(f)
+        print(f"{operation:>18}: {results[operation]['wall_s']:.3f}s, "
+              f"{results[operation]['syscalls']} syscalls, "
+              f"{results[operation]['peak_rss_kb']} KB peak RSS")
+
+    if 'startup' in results:
+        results['startup']['budget_s'] = STARTUP_BUDGET_S
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'tree': {key: value for key, value in tree.items() if key != 'root'},
+        'tree_options': tree_options,
+        'results': results,
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print per-operation changes against a baseline run"""
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for operation, result in current['results'].items():
+        before = baseline['results'].get(operation)
+        if not before:
+            continue
+        ratio = result['wall_s'] / before['wall_s'] if before['wall_s'] else float('inf')
+        print(f"{operation:>18}: wall x{ratio:.2f}, "
+              f"syscalls {before['syscalls']} -> {result['syscalls']}, "
+              f"peak RSS {before['peak_rss_kb']} -> {result['peak_rss_kb']} KB")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark DropClear's core operations on a synthetic Downloads tree")
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--files-per-folder', type=int, default=50)
+    parser.add_argument('--median-size-kb', type=float, default=512)
+    parser.add_argument('--mtime-spread-days', type=int, default=365)
+    parser.add_argument('--excluded-fraction', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--operations', default=','.join(OPERATIONS),
+                        help="comma-separated subset of: " + ', '.join(OPERATIONS))
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    # Internal: measure one operation in this process
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    parser.add_argument('--root', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        result = run_single(args.single, args.root)
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+        return
+
+    operations = [op.strip() for op in args.operations.split(',') if op.strip()]
+    unknown = [op for op in operations if op not in OPERATIONS]
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(unknown)}")
+
+    report = run_benchmarks(operations, {
+        'files': args.files,
+        'depth': args.depth,
+        'files_per_folder': args.files_per_folder,
+        'median_size_kb': args.median_size_kb,
+        'mtime_spread_days': args.mtime_spread_days,
+        'excluded_fraction': args.excluded_fraction,
+        'seed': args.seed,
+    })
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+    startup = report['results'].get('startup')
+    if startup and startup['wall_s'] > STARTUP_BUDGET_S:
+        print(f"\nStartup took {startup['wall_s']:.3f}s, over the {STARTUP_BUDGET_S}s budget")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,234 @@
-from src.utils.config import Config
-from src.cli.commands import CommandHandler
-from rich.console import Console
+import argparse
+import multiprocessing
+import sys
 
-console = Console()
+# Only argument parsing happens at import time; rich, numpy, thefuzz and the
+# core modules are imported by the command that needs them, so scheduled
+# headless runs do not pay for the interactive menu
+HEADLESS_COMMANDS = ("scan", "top", "clean", "archive", "dupes", "extract", "trash", "usage", "verify")
+WATCH_ACTIONS = ("report", "clean", "archive")  # FolderWatcher.ACTIONS
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="dropclear", description="Smart CLI Cleaner for Windows Downloads Folder")
+    parser.add_argument(
+        "--config",
+        default="config.json",
+        help="configuration file to use (default: config.json)"
+    )
+    parser.add_argument(
+        "--use-index",
+        action="store_true",
+        help="serve unchanged folders from the persistent scan index instead of rewalking them"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="dropclear-trace.json",
+        metavar="TRACE_FILE",
+        help="record phase timings and counters, write a Chrome trace (default: dropclear-trace.json) and print a summary on exit"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    watch_parser = subparsers.add_parser("watch", help="keep running and enforce the cleaning policy as files change")
+    watch_parser.add_argument(
+        "--action",
+        choices=WATCH_ACTIONS,
+        default="report",
+        help="what to do with files that match the policy (default: report)"
+    )
+    watch_parser.add_argument(
+        "--interval",
+        type=float,
+        default=60,
+        help="seconds between policy passes (default: 60)"
+    )
+
+    # Options shared by the non-interactive commands
+    output_parser = argparse.ArgumentParser(add_help=False)
+    output_parser.add_argument("--json", action="store_true", help="write the result to stdout as JSON")
+    filter_parser = argparse.ArgumentParser(add_help=False)
+    filter_parser.add_argument("--days", type=int, help="minimum age in days (default: config's max_age_days)")
+    filter_parser.add_argument("--min-size", type=float, help="minimum size in MB (default: config's min_size_mb)")
+
+    scan_parser = subparsers.add_parser(
+        "scan", parents=[output_parser, filter_parser],
+        help="list files matching the cleaning criteria without prompting"
+    )
+    scan_parser.add_argument("--pattern", default="", help="fuzzy match file names and paths")
+    scan_parser.add_argument("--include-hidden", action="store_true", help="include hidden files")
+    scan_parser.add_argument("--limit", type=int, help="stop after this many matches")
+
+    top_parser = subparsers.add_parser(
+        "top", parents=[output_parser],
+        help="list the largest, oldest or least recently accessed files, in constant memory"
+    )
+    top_parser.add_argument(
+        "--by", choices=("size", "age", "access"), default="size",
+        help="rank by size, by modification time (oldest first) or by last access (default: size)"
+    )
+    top_parser.add_argument("--limit", type=int, default=50, help="number of files to list, per folder with --per-folder (default: 50)")
+    top_parser.add_argument("--per-folder", action="store_true", help="list the top files of every folder")
+    top_parser.add_argument("--include-hidden", action="store_true", help="include hidden files")
+
+    clean_parser = subparsers.add_parser(
+        "clean", parents=[output_parser, filter_parser],
+        help="delete files matching the cleaning criteria without prompting"
+    )
+    clean_parser.add_argument("--dry-run", action="store_true", help="report what would be deleted and delete nothing")
+    clean_parser.add_argument(
+        "--resume", action="store_true",
+        help="finish the last interrupted clean run from its checkpoint instead of scanning"
+    )
+    target_group = clean_parser.add_mutually_exclusive_group()
+    target_group.add_argument(
+        "--reclaim",
+        metavar="SIZE",
+        help="instead of the age and size limits, clean the fewest, stalest files that free SIZE (e.g. 20GB)"
+    )
+    target_group.add_argument(
+        "--min-free",
+        metavar="PERCENT",
+        help="instead of the age and size limits, clean until each downloads volume has PERCENT free (e.g. 15%%)"
+    )
+
+    archive_parser = subparsers.add_parser(
+        "archive", parents=[output_parser],
+        help="move files with the given extensions to the archive folder"
+    )
+    archive_parser.add_argument("--extensions", help="comma-separated extensions (default: pdf,docx,xlsx)")
+    archive_parser.add_argument("--target", help="archive folder (default: config's archive_path)")
+    archive_parser.add_argument(
+        "--resume", action="store_true",
+        help="finish the last interrupted archive run from its checkpoint instead of scanning"
+    )
+    archive_parser.add_argument(
+        "--format",
+        choices=("files", "zip", "tar.zst"),
+        help="move loose files, or stream them into rolling compressed containers (default: config's archive_format)"
+    )
+
+    extract_parser = subparsers.add_parser(
+        "extract", parents=[output_parser],
+        help="extract one file from an archive container"
+    )
+    extract_parser.add_argument("container", help="path of the .zip or .tar.zst container")
+    extract_parser.add_argument("name", help="archived name, as listed in the container's manifest")
+    extract_parser.add_argument("--to", default=".", help="directory to extract into (default: current directory)")
+
+    dupes_parser = subparsers.add_parser(
+        "dupes", parents=[output_parser],
+        help="report files with identical content"
+    )
+    dupes_parser.add_argument("--delete", action="store_true", help="delete every copy but the oldest of each set")
+
+    trash_parser = subparsers.add_parser(
+        "trash", parents=[output_parser],
+        help="list, restore or purge files cleaned in trash mode"
+    )
+    trash_parser.add_argument("action", choices=("list", "restore", "purge"))
+    trash_parser.add_argument("batch", nargs="?", help="batch id to restore or purge (see trash list)")
+    trash_parser.add_argument(
+        "--all",
+        action="store_true",
+        help="purge every batch, not only those older than config's trash_retention_days"
+    )
+
+    verify_parser = subparsers.add_parser(
+        "verify", parents=[output_parser],
+        help="check archived files against the checksums recorded when they were archived"
+    )
+    verify_parser.add_argument("--target", help="archive folder to check (default: the archive path and every rule's archive_to)")
+    verify_parser.add_argument("--full", action="store_true", help="rehash every file, not only those whose size or mtime changed")
+
+    usage_parser = subparsers.add_parser(
+        "usage", parents=[output_parser],
+        help="report the folders using the most space, from the totals cached by the last scan"
+    )
+    usage_parser.add_argument("--limit", type=int, default=10, help="number of folders to list (default: 10)")
+    usage_parser.add_argument("--depth", type=int, help="only list folders at most this many levels below a root")
+    usage_parser.add_argument("--refresh", action="store_true", help="rewalk the roots instead of using the cached totals")
+    return parser.parse_args()
+
+def run_menu(args, console):
+    from src.utils.config import Config
+    from src.utils import reporter, sniffer
+    from src.cli.commands import CommandHandler
+
+    config = Config(args.config)
+    sniffer.use_cache(config.type_cache_file)
+    # Core progress is drawn only in the interactive menu
+    reporter.use(reporter.RichSink(console))
+    index_file = config.index_file if args.use_index else None
+    handler = CommandHandler(
+        config.config, index_file, config.hash_cache_file, config.rollup_file, config.checkpoint_dir
+    )
+
+    while True:
+        choice = handler.menu.display_main_menu()
+
+        if choice == "1":
+            handler.handle_scan()
+        elif choice == "2":
+            handler.handle_clean()
+        elif choice == "3":
+            handler.handle_archive()
+        elif choice == "4":
+            handler.handle_config()
+        elif choice == "5":
+            handler.handle_duplicates()
+        elif choice == "6":
+            handler.handle_top()
+        elif choice == "7":
+            console.print("[cyan]Thank you for using DropClear![/cyan]")
+            break
+
+        input("\nPress Enter to continue...")
 
 def main():
+    args = parse_args()
+    headless = args.command in HEADLESS_COMMANDS
+
+    from rich.console import Console
+    from src.utils import profiler
+
+    # Headless stdout carries only the result
+    console = Console(stderr=headless)
+    if args.profile:
+        profiler.enable()
     try:
-        config = Config()
-        handler = CommandHandler(config.config)
-        
-        while True:
-            choice = handler.menu.display_main_menu()
-            
-            if choice == "1":
-                handler.handle_scan()
-            elif choice == "2":
-                handler.handle_clean()
-            elif choice == "3":
-                handler.handle_archive()
-            elif choice == "4":
-                handler.handle_config()
-            elif choice == "5":
-                console.print("[cyan]Thank you for using DropClear![/cyan]")
-                break
-            
-            input("\nPress Enter to continue...")
-    
+        if headless:
+            from src.cli.headless import run_command
+            return run_command(args)
+
+        if args.command == "watch":
+            from src.utils.config import Config
+            from src.utils import sniffer
+            from src.core.watcher import FolderWatcher
+            config = Config(args.config)
+            sniffer.use_cache(config.type_cache_file)
+            FolderWatcher(config.config, args.action, args.interval).run()
+            return 0
+
+        run_menu(args, console)
+
     except KeyboardInterrupt:
         console.print("\n[cyan]Goodbye![/cyan]")
+        if headless:
+            # The shell convention for a run stopped by SIGINT
+            return 130
     except Exception as e:
         console.print(f"[red]An error occurred: {str(e)}[/red]")
+        if headless:
+            return 2
+    finally:
+        if args.profile:
+            profile = profiler.disable()
+            profile.write_trace(args.profile)
+            console.print(profile.summary())
+            console.print(f"[dim]Trace written to {args.profile}[/dim]")
+    return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Duplicate hashing uses worker processes, which frozen builds must support
+    multiprocessing.freeze_support()
+    sys.exit(main())
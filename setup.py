@@ -3,14 +3,19 @@ from setuptools import setup, find_packages
 setup(
     name="dropclear",
     version="1.0.0",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks"]),
     install_requires=[
         "rich>=10.0.0",
         "tqdm>=4.65.0",
         "thefuzz>=0.19.0",
         "python-Levenshtein>=0.21.1",
+        "numpy>=1.20.0",
         "pyinstaller>=5.13.0"
     ],
+    extras_require={
+        # tar.zst archive containers
+        "zstd": ["zstandard>=0.21.0"],
+    },
     entry_points={
         'console_scripts': [
             'dropclear=dropclear:main',
@@ -1,4 +1,15 @@
-from .commands import CommandHandler
-from .menu import MainMenu
+from importlib import import_module
 
-__all__ = ['CommandHandler', 'MainMenu'] 
\ No newline at end of file
+# Exports are resolved on first access, so the headless commands never load
+# the interactive menu
+_EXPORTS = {
+    'CommandHandler': '.commands',
+    'MainMenu': '.menu',
+}
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
+
+__all__ = ['CommandHandler', 'MainMenu']
@@ -5,63 +5,137 @@ from pathlib import Path
 from ..core.scanner import FileScanner
 from ..core.cleaner import FileCleaner
 from ..core.archiver import FileArchiver
+from ..core.duplicates import DuplicateFinder
+from ..core.checkpoint import RunCheckpoint
+from ..utils.file_utils import common_root, downloads_roots, format_size
 from .menu import MainMenu
 
 console = Console()
 
 class CommandHandler:
-    def __init__(self, config):
+    def __init__(self, config, index_file=None, hash_cache_file=None, rollup_file=None, checkpoint_dir=None):
         self.config = config
+        self.checkpoint_dir = checkpoint_dir
         self.menu = MainMenu(config)
-        self.scanner = FileScanner(config)
-        self.cleaner = FileCleaner(config)
-        self.archiver = FileArchiver(config)
+        self.scanner = FileScanner(config, index_file, rollup_file)
+        self.cleaner = FileCleaner(config, index_file, rollup_file, checkpoint_dir)
+        self.archiver = FileArchiver(config, index_file, rollup_file, checkpoint_dir)
+        self.duplicate_finder = DuplicateFinder(config, hash_cache_file, index_file)
+        if config.get('delete_mode', 'delete') == 'trash':
+            # Purge expired trash batches while the menu waits for input
+            from ..core.trash import TrashStore
+            TrashStore(downloads_roots(config)).start_background_purge(config.get('trash_retention_days', 7))
     
     def handle_scan(self):
         options = self.menu.display_scan_options()
-        files = self.scanner.scan_files(
+        files = self.menu.display_streaming_results(self.scanner.iter_files(
             min_age=options['days'],
             min_size=options['min_size'],
             pattern=options['pattern'],
             include_hidden=options['include_hidden']
+        ))
+        self.menu.display_root_scans(self.scanner.root_scans)
+        if self.scanner.rollup.complete:
+            self.menu.display_top_folders(self.scanner.rollup.top(5))
+        self.menu.display_scan_results(files)
+    
+    def _resume(self, operation):
+        """Whether to finish an interrupted run of ``operation`` instead of starting a new one"""
+        return RunCheckpoint.pending(self.checkpoint_dir, operation) and Confirm.ask(
+            f"An earlier {operation} run was interrupted. Resume it?", default=True
         )
-        
-        # Group files by folder and display results
-        grouped_files = self.scanner.group_files_by_folder(files)
-        self.menu.display_scan_results(grouped_files)
     
     def handle_clean(self):
+        if self._resume('clean'):
+            result = self.cleaner.resume_clean()
+            if result is not None:
+                self._report_clean(result)
+                return
+        
         # Scan files with default criteria
-        files = self.scanner.scan_files()
-        if not files:
+        files = self.scanner.scan_table()
+        self.menu.display_root_scans(self.scanner.root_scans)
+        if not len(files):
             console.print("[yellow]No files to clean[/yellow]")
             return
         
-        # Group files by folder for display
-        grouped_files = self.scanner.group_files_by_folder(files)
-        
         if self.menu.display_clean_confirmation(files):
-            deleted = self.cleaner.clean_files(files)
-            console.print(f"[green]Successfully deleted {len(deleted)} files[/green]")
+            to_delete, to_archive = self.cleaner.partition_actions(files)
+            result = self.cleaner.clean_files(to_delete)
+            self._report_clean(result)
+            for target, archive_files in to_archive.items():
+                archived = self.archiver.move_files(archive_files, target)
+                console.print(f"[green]Archived {len(archived)} files to {target}[/green]")
             
             # Show summary of cleaned folders
-            if deleted:
+            if result.deleted:
                 console.print("\n[bold]Cleaned folders:[/bold]")
-                cleaned_folders = {}
-                for file in files:
-                    folder = str(file['relative_path'].parent)
-                    if folder == '.':
-                        folder = 'Root'
-                    cleaned_folders[folder] = cleaned_folders.get(folder, 0) + 1
-                
-                for folder, count in cleaned_folders.items():
+                for folder, (count, _) in files.folder_totals().items():
                     console.print(f"📁 {folder}: {count} files")
     
+    def _report_clean(self, result):
+        """Print the outcome and throughput of a clean run"""
+        if result.trash_batch:
+            console.print(f"[green]Moved {len(result.deleted)} files to the trash (batch {result.trash_batch})[/green]")
+            console.print(f"[dim]Undo with: dropclear trash restore {result.trash_batch}[/dim]")
+        else:
+            console.print(f"[green]Successfully deleted {len(result.deleted)} files[/green]")
+        console.print(
+            f"[dim]{result.files_per_second:.0f} files/s, "
+            f"{format_size(result.bytes_per_second / (1024 * 1024))}/s reclaimed "
+            f"({format_size(result.bytes_freed / (1024 * 1024))} in {result.elapsed:.2f}s)[/dim]"
+        )
+        
+        if result.errors:
+            console.print(f"\n[red]Failed to delete {len(result.errors)} files:[/red]")
+            for path, error in result.errors[:10]:
+                console.print(f"[red]{path}: {error}[/red]")
+            if len(result.errors) > 10:
+                console.print(f"[red]... and {len(result.errors) - 10} more[/red]")
+    
+    def handle_top(self):
+        options = self.menu.display_top_options()
+        if options['per_folder']:
+            folders = self.scanner.top_files_by_folder(options['limit'], options['by'], options['include_hidden'])
+            root = common_root(downloads_roots(self.config))
+            for folder, files in folders.items():
+                location = Path(folder).relative_to(root) if root else folder
+                self.menu.display_top_files(files, options['by'], title=f"📁 {location}")
+            if not folders:
+                console.print("[yellow]No files found[/yellow]")
+        else:
+            self.menu.display_top_files(
+                self.scanner.top_files(options['limit'], options['by'], options['include_hidden']), options['by']
+            )
+        self.menu.display_root_scans(self.scanner.root_scans)
+    
+    def handle_duplicates(self):
+        groups = self.duplicate_finder.find_duplicates()
+        if not groups:
+            console.print("[yellow]No duplicate files found[/yellow]")
+            return
+        
+        redundant = self.cleaner.identify_duplicates_to_clean(groups)
+        if self.menu.display_duplicates(groups, redundant):
+            result = self.cleaner.clean_files(redundant)
+            self._report_clean(result)
+    
     def handle_archive(self):
+        if self._resume('archive'):
+            resumed = self.archiver.resume_archive()
+            if resumed is not None:
+                target, archived = resumed
+                console.print(f"[green]Archived {len(archived)} files to {target}[/green]")
+                return
+        
         extensions = console.input("Enter file extensions to archive (comma-separated, default: pdf,docx,xlsx): ")
         if extensions:
             extensions = [ext.strip() for ext in extensions.split(',')]
         
+        if self.config.get('archive_format', 'files') != 'files':
+            self._report_containers(self.archiver.archive_to_containers(extensions))
+            return
+        
         archived = self.archiver.archive_files(extensions)
         if archived:
             console.print(f"\n[green]Successfully archived {len(archived)} files[/green]")
@@ -95,6 +169,27 @@ class CommandHandler:
         else:
             console.print("[yellow]No files were archived[/yellow]")
     
+    def _report_containers(self, result):
+        """Print the outcome of archiving into containers"""
+        if not result.files:
+            console.print("[yellow]No files were archived[/yellow]")
+        else:
+            ratio = result.bytes_out / result.bytes_in if result.bytes_in else 1.0
+            console.print(f"\n[green]Successfully archived {result.files} files into {len(result.containers)} containers[/green]")
+            console.print(
+                f"[dim]{format_size(result.bytes_in / (1024 * 1024))} stored as "
+                f"{format_size(result.bytes_out / (1024 * 1024))} ({ratio:.0%}) in {result.elapsed:.2f}s[/dim]"
+            )
+            for container in result.containers:
+                console.print(f"📦 {container}")
+        
+        if result.errors:
+            console.print(f"\n[red]Failed to archive {len(result.errors)} files:[/red]")
+            for path, error in result.errors[:10]:
+                console.print(f"[red]{path}: {error}[/red]")
+            if len(result.errors) > 10:
+                console.print(f"[red]... and {len(result.errors) - 10} more[/red]")
+    
     def handle_config(self):
         """Handle configuration settings"""
         while True:
@@ -103,7 +198,7 @@ class CommandHandler:
             
             # Display current settings
             console.print("\n[bold]Current Settings:[/bold]")
-            console.print(f"Downloads Path: [cyan]{self.config['downloads_path']}[/cyan]")
+            console.print(f"Downloads Path: [cyan]{'; '.join(map(str, downloads_roots(self.config)))}[/cyan]")
             console.print(f"Archive Path: [cyan]{self.config['archive_path']}[/cyan]")
             console.print(f"Minimum Size: [cyan]{self.config['min_size_mb']} MB[/cyan]")
             console.print(f"Maximum Age: [cyan]{self.config['max_age_days']} days[/cyan]")
@@ -125,13 +220,20 @@ class CommandHandler:
                 break
                 
             if choice == "1":
-                new_path = Prompt.ask("Enter new Downloads path", default=self.config['downloads_path'])
-                path = Path(new_path)
-                if path.exists() and path.is_dir():
-                    self.config.update({"downloads_path": str(path)})
-                    console.print(f"[green]Downloads path updated to: {path}[/green]")
+                new_path = Prompt.ask(
+                    "Enter new Downloads path (separate several roots with ';')",
+                    default='; '.join(map(str, downloads_roots(self.config)))
+                )
+                paths = [Path(part.strip()) for part in new_path.split(';') if part.strip()]
+                missing = [path for path in paths if not path.is_dir()]
+                if not paths:
+                    console.print("[red]No path given[/red]")
+                elif missing:
+                    console.print(f"[red]Path does not exist: {missing[0]}[/red]")
                 else:
-                    console.print(f"[red]Path does not exist: {path}[/red]")
+                    value = str(paths[0]) if len(paths) == 1 else [str(path) for path in paths]
+                    self.config.update({"downloads_path": value})
+                    console.print(f"[green]Downloads path updated to: {'; '.join(map(str, paths))}[/green]")
             
             elif choice == "2":
                 new_path = Prompt.ask("Enter new Archive path", default=self.config['archive_path'])
@@ -0,0 +1,499 @@
+"""
+Non-interactive commands for scheduled and scripted runs
+
+Nothing here prompts. Results are written to stdout, as a JSON document with
+``--json`` or as plain lines otherwise, while warnings are sent to stderr so
+the output stays machine-readable. Progress goes to the reporter's default
+null sink, so large runs spend no time drawing it. Core modules are
+imported by the command that needs them, keeping start-up short.
+"""
+import json
+import sys
+from datetime import datetime
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, Optional
+
+def _file_record(info: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-safe subset of a get_file_info dictionary"""
+    return {
+        'path': str(info['path']),
+        'relative_path': str(info['relative_path']),
+        'size_mb': round(info['size'], 3),
+        'age_days': info['age'],
+        'modified': info['modified'].isoformat(timespec='seconds'),
+        'last_access': info['last_access'].isoformat(timespec='seconds'),
+        'extension': info['extension'],
+        'action': info.get('action', 'delete'),
+    }
+
+def _root_records(scans) -> List[Dict[str, Any]]:
+    """JSON-safe per-root timings from a scan's RootScan list"""
+    return [
+        {'root': str(scan.root), 'files': scan.files, 'elapsed_s': round(scan.elapsed, 3), 'error': scan.error}
+        for scan in scans
+    ]
+
+def run_scan(config: Dict[str, Any], args, index_file=None, hash_cache_file=None, rollup_file=None,
+             checkpoint_dir=None) -> Dict[str, Any]:
+    from ..core.scanner import FileScanner
+
+    scanner = FileScanner(config, index_file, rollup_file)
+    files = [_file_record(info) for info in scanner.iter_files(
+        min_age=args.days,
+        min_size=args.min_size,
+        pattern=args.pattern,
+        include_hidden=args.include_hidden,
+        limit=args.limit
+    )]
+    return {
+        'command': 'scan',
+        'files': files,
+        'count': len(files),
+        'total_size_mb': round(sum(record['size_mb'] for record in files), 3),
+        'roots': _root_records(scanner.root_scans),
+    }
+
+def run_top(config: Dict[str, Any], args, index_file=None, hash_cache_file=None, rollup_file=None,
+            checkpoint_dir=None) -> Dict[str, Any]:
+    from ..core.scanner import FileScanner
+
+    scanner = FileScanner(config, index_file, rollup_file)
+    result = {'command': 'top', 'by': args.by, 'limit': args.limit}
+    if args.per_folder:
+        folders = scanner.top_files_by_folder(args.limit, args.by, args.include_hidden)
+        result['folders'] = [
+            {'folder': folder, 'files': [_file_record(info) for info in infos]}
+            for folder, infos in folders.items()
+        ]
+    else:
+        result['files'] = [_file_record(info) for info in scanner.top_files(args.limit, args.by, args.include_hidden)]
+    result['roots'] = _root_records(scanner.root_scans)
+    return result
+
+def _reclaim_plan(config: Dict[str, Any], args, index_file=None):
+    """The SpaceReclaimer plan for clean's --reclaim or --min-free"""
+    from ..core.reclaim import SpaceReclaimer
+    from ..utils.file_utils import parse_size
+
+    reclaimer = SpaceReclaimer(config, index_file)
+    if args.reclaim:
+        return reclaimer.plan(reclaim=parse_size(args.reclaim))
+    try:
+        percent = float(args.min_free.strip().rstrip('%'))
+    except ValueError:
+        percent = -1
+    if not 0 <= percent < 100:
+        raise ValueError(f"Invalid free space target {args.min_free!r}; use a percentage such as 15%")
+    return reclaimer.plan(min_free_percent=percent)
+
+def _clean_record(cleaned) -> Dict[str, Any]:
+    record = {
+        'deleted': cleaned.deleted,
+        'errors': [{'path': path, 'error': error} for path, error in cleaned.errors],
+        'bytes_freed': cleaned.bytes_freed,
+        'elapsed_s': round(cleaned.elapsed, 3),
+    }
+    if cleaned.trash_batch:
+        record['trash_batch'] = cleaned.trash_batch
+    return record
+
+def run_clean(config: Dict[str, Any], args, index_file=None, hash_cache_file=None, rollup_file=None,
+              checkpoint_dir=None) -> Dict[str, Any]:
+    from ..core.scanner import FileScanner
+    from ..core.cleaner import FileCleaner
+
+    if getattr(args, 'resume', False):
+        cleaned = FileCleaner(config, index_file, rollup_file, checkpoint_dir).resume_clean()
+        if cleaned is None:
+            raise ValueError("No interrupted clean run to resume")
+        result = {
+            'command': 'clean',
+            'dry_run': False,
+            'resumed': True,
+            'matched': len(cleaned.deleted) + len(cleaned.errors),
+            'roots': [],
+        }
+        result.update(_clean_record(cleaned))
+        return result
+
+    if getattr(args, 'reclaim', None) or getattr(args, 'min_free', None):
+        plan = _reclaim_plan(config, args, index_file)
+        files = plan.files
+        target = {
+            'need_bytes': plan.need,
+            'planned_bytes': plan.planned,
+            'shortfall_bytes': plan.shortfall,
+            'considered': plan.considered,
+        }
+        roots = []
+    else:
+        scanner = FileScanner(config, index_file, rollup_file)
+        files = list(scanner.iter_files(min_age=args.days, min_size=args.min_size))
+        target = None
+        roots = _root_records(scanner.root_scans)
+    result = {
+        'command': 'clean',
+        'dry_run': args.dry_run,
+        'matched': len(files),
+        'matched_size_mb': round(sum(info['size'] for info in files), 3),
+        'roots': roots,
+    }
+    if target is not None:
+        result['target'] = target
+    if args.dry_run:
+        result['files'] = [_file_record(info) for info in files]
+        return result
+
+    cleaner = FileCleaner(config, index_file, rollup_file, checkpoint_dir)
+    to_delete, to_archive = cleaner.partition_actions(files)
+    # Moving files into the trash frees nothing, so a space target always deletes
+    delete_mode = 'delete' if target is not None else None
+    result.update(_clean_record(cleaner.clean_files(to_delete, delete_mode=delete_mode)))
+    if to_archive:
+        from ..core.archiver import FileArchiver
+        
+        archiver = FileArchiver(config, index_file, rollup_file)
+        result['archived'] = {}
+        for target, archive_files in to_archive.items():
+            archived = archiver.move_files(archive_files, target)
+            result['archived'][target] = archived
+            # The archiver reports why on stderr
+            moved = set(archived)
+            result['errors'].extend(
+                {'path': str(info['path']), 'error': f"could not be archived to {target}"}
+                for info in archive_files if str(info['relative_path']) not in moved
+            )
+    return result
+
+def run_archive(config: Dict[str, Any], args, index_file=None, hash_cache_file=None, rollup_file=None,
+                checkpoint_dir=None) -> Dict[str, Any]:
+    from ..core.archiver import FileArchiver
+
+    if getattr(args, 'resume', False):
+        resumed = FileArchiver(config, index_file, rollup_file, checkpoint_dir).resume_archive()
+        if resumed is None:
+            raise ValueError("No interrupted archive run to resume")
+        target, archived = resumed
+        return {
+            'command': 'archive',
+            'target': str(target),
+            'format': 'files',
+            'resumed': True,
+            'archived': archived,
+            'count': len(archived),
+        }
+
+    extensions = [ext.strip().lower() for ext in args.extensions.split(',') if ext.strip()] if args.extensions else None
+    archive_format = args.format or config.get('archive_format', 'files')
+    if archive_format != 'files':
+        result = FileArchiver(config, index_file, rollup_file).archive_to_containers(extensions, args.target, archive_format)
+        return {
+            'command': 'archive',
+            'target': args.target or config['archive_path'],
+            'format': archive_format,
+            'containers': result.containers,
+            'count': result.files,
+            'bytes_in': result.bytes_in,
+            'bytes_out': result.bytes_out,
+            'errors': [{'path': path, 'error': error} for path, error in result.errors],
+            'elapsed_s': round(result.elapsed, 3),
+        }
+    
+    archived = FileArchiver(config, index_file, rollup_file, checkpoint_dir).archive_files(extensions, args.target)
+    return {
+        'command': 'archive',
+        'target': args.target or config['archive_path'],
+        'format': 'files',
+        'archived': archived,
+        'count': len(archived),
+    }
+
+def run_dupes(config: Dict[str, Any], args, index_file=None, hash_cache_file=None, rollup_file=None,
+              checkpoint_dir=None) -> Dict[str, Any]:
+    from ..core.duplicates import DuplicateFinder
+    from ..core.cleaner import FileCleaner
+
+    groups = DuplicateFinder(config, hash_cache_file, index_file).find_duplicates()
+    cleaner = FileCleaner(config, index_file, rollup_file)
+    redundant = cleaner.identify_duplicates_to_clean(groups)
+    result = {
+        'command': 'dupes',
+        'groups': [
+            {
+                'keep': str(group[0]['path']),
+                'copies': [str(info['path']) for info in group[1:]],
+                'size_mb': round(group[0]['size'], 3),
+            }
+            for group in groups
+        ],
+        'wasted_size_mb': round(sum(info['size'] for info in redundant), 3),
+    }
+    if args.delete and redundant:
+        cleaned = cleaner.clean_files(redundant)
+        result['deleted'] = cleaned.deleted
+        result['errors'] = [{'path': path, 'error': error} for path, error in cleaned.errors]
+    return result
+
+def run_extract(config: Optional[Dict[str, Any]], args, index_file=None, hash_cache_file=None, rollup_file=None,
+                checkpoint_dir=None) -> Dict[str, Any]:
+    from ..core.containers import extract_member
+
+    return {
+        'command': 'extract',
+        'container': args.container,
+        'name': args.name,
+        'extracted': extract_member(args.container, args.name, args.to),
+    }
+
+def run_trash(config: Dict[str, Any], args, index_file=None, hash_cache_file=None, rollup_file=None,
+              checkpoint_dir=None) -> Dict[str, Any]:
+    from ..core.trash import TrashStore
+    from ..utils.file_utils import downloads_roots
+
+    store = TrashStore(downloads_roots(config))
+    result: Dict[str, Any] = {'command': 'trash', 'action': args.action}
+    if args.action == 'list':
+        result['batches'] = [
+            {
+                'batch': batch.batch_id,
+                'created': datetime.fromtimestamp(batch.created).isoformat(timespec='seconds'),
+                'state': batch.state,
+                'files': len(batch.files),
+                'size_mb': round(batch.size / (1024 * 1024), 3),
+            }
+            for batch in store.batches()
+        ]
+        return result
+
+    if args.action == 'restore':
+        if not args.batch:
+            raise ValueError("trash restore needs a batch id (see trash list)")
+        sizes = {source: size for batch in store.batches() if batch.batch_id == args.batch
+                 for source, _, size in batch.files}
+        outcomes = [store.restore(args.batch)]
+        if rollup_file:
+            from ..utils.rollup import FolderRollup
+            FolderRollup.update_saved(
+                rollup_file, downloads_roots(config),
+                added=[(path, sizes[path]) for outcome in outcomes for path in outcome.files]
+            )
+    else:
+        older_than = None if args.all or args.batch else config.get('trash_retention_days', 7)
+        outcomes = store.purge(older_than, args.batch)
+    result.update({
+        'batches': [outcome.batch_id for outcome in outcomes],
+        'files': [path for outcome in outcomes for path in outcome.files],
+        'bytes': sum(outcome.bytes for outcome in outcomes),
+        'errors': [{'path': path, 'error': error} for outcome in outcomes for path, error in outcome.errors],
+    })
+    return result
+
+def run_usage(config: Dict[str, Any], args, index_file=None, hash_cache_file=None, rollup_file=None,
+              checkpoint_dir=None) -> Dict[str, Any]:
+    from ..utils.file_utils import downloads_roots
+    from ..utils.rollup import FolderRollup
+
+    roots = downloads_roots(config)
+    rollup = None
+    if rollup_file and not args.refresh:
+        rollup = FolderRollup.load(rollup_file, roots)
+    cached = rollup is not None
+    if rollup is None:
+        from ..core.scanner import FileScanner
+        rollup = FileScanner(config, index_file, rollup_file).build_rollup()
+    return {
+        'command': 'usage',
+        'cached': cached,
+        'root_totals': [
+            {'root': root, 'bytes': size, 'files': files}
+            for root in rollup.roots
+            for size, files in [rollup.totals(root)]
+        ],
+        'folders': [
+            {'folder': folder, 'bytes': size, 'files': files}
+            for folder, size, files in rollup.top(args.limit, args.depth)
+        ],
+    }
+
+def run_verify(config: Dict[str, Any], args, index_file=None, hash_cache_file=None, rollup_file=None,
+               checkpoint_dir=None) -> Dict[str, Any]:
+    import os
+    from ..core.integrity import verify_archive
+
+    if args.target:
+        targets = [args.target]
+    else:
+        # The archive folder and every folder a rule archives to
+        targets = [config['archive_path']]
+        for rule in config.get('rules', []):
+            if rule.get('archive_to'):
+                targets.append(os.path.expanduser(rule['archive_to']))
+        targets = list(dict.fromkeys(targets))
+    result: Dict[str, Any] = {'command': 'verify', 'full': args.full, 'archives': [], 'errors': []}
+    for target in targets:
+        checked = verify_archive(target, args.full, config.get('archive_workers', 4))
+        result['archives'].append({
+            'target': target,
+            'verified': len(checked.verified),
+            'skipped': len(checked.skipped),
+            'unverifiable': checked.unverifiable,
+            'bytes_read': checked.bytes_read,
+            'elapsed_s': round(checked.elapsed, 3),
+        })
+        result['errors'].extend(
+            {'path': os.path.join(target, path), 'error': 'missing'} for path in checked.missing
+        )
+        result['errors'].extend(
+            {'path': os.path.join(target, path), 'error': error} for path, error in checked.corrupt
+        )
+    return result
+
+COMMANDS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    'scan': run_scan,
+    'top': run_top,
+    'clean': run_clean,
+    'archive': run_archive,
+    'dupes': run_dupes,
+    'extract': run_extract,
+    'trash': run_trash,
+    'usage': run_usage,
+    'verify': run_verify,
+}
+# Commands that work on their arguments alone and never load the config
+STANDALONE_COMMANDS = ('extract',)
+
+def _text_lines(result: Dict[str, Any]) -> List[str]:
+    """Plain one-line-per-item rendering for shells and log files"""
+    command = result['command']
+    if command == 'scan':
+        lines = [record['path'] for record in result['files']]
+        lines.append(f"{result['count']} files, {result['total_size_mb']:.1f} MB")
+    elif command == 'clean':
+        if result['dry_run']:
+            lines = [record['path'] for record in result['files']]
+            lines.append(f"{result['matched']} files would be deleted ({result['matched_size_mb']:.1f} MB)")
+        else:
+            lines = [f"{error['path']}: {error['error']}" for error in result['errors']]
+            for target, archived in result.get('archived', {}).items():
+                lines.append(f"{len(archived)} files archived to {target}")
+            if 'trash_batch' in result:
+                lines.append(
+                    f"{len(result['deleted'])} files moved to the trash as batch {result['trash_batch']} "
+                    f"({result['bytes_freed'] / (1024 * 1024):.1f} MB), {len(result['errors'])} errors"
+                )
+            else:
+                lines.append(
+                    f"{len(result['deleted'])} files deleted, {result['bytes_freed'] / (1024 * 1024):.1f} MB freed, "
+                    f"{len(result['errors'])} errors"
+                )
+        target = result.get('target')
+        if target:
+            lines.append(
+                f"target {target['need_bytes'] / (1024 * 1024):.1f} MB, "
+                f"{target['planned_bytes'] / (1024 * 1024):.1f} MB selected from {target['considered']} files"
+                + (f", {target['shortfall_bytes'] / (1024 * 1024):.1f} MB short" if target['shortfall_bytes'] else "")
+            )
+    elif command == 'archive':
+        if result['format'] == 'files':
+            lines = list(result['archived'])
+        else:
+            lines = list(result['containers'])
+            lines.extend(f"{error['path']}: {error['error']}" for error in result['errors'])
+        lines.append(f"{result['count']} files archived to {result['target']}")
+    elif command == 'top':
+        column = {'size': 'size_mb', 'age': 'modified', 'access': 'last_access'}[result['by']]
+        
+        def row(record: Dict[str, Any]) -> str:
+            value = f"{record['size_mb']:10.1f} MB" if column == 'size_mb' else record[column]
+            return f"{value}  {record['path']}"
+        
+        if 'folders' in result:
+            lines = []
+            for folder in result['folders']:
+                lines.append(f"{folder['folder']}:")
+                lines.extend(f"  {row(record)}" for record in folder['files'])
+        else:
+            lines = [row(record) for record in result['files']]
+    elif command == 'extract':
+        lines = [result['extracted']]
+    elif command == 'trash':
+        if result['action'] == 'list':
+            lines = [
+                f"{batch['batch']}  {batch['created']}  {batch['files']} files  {batch['size_mb']:.1f} MB  {batch['state']}"
+                for batch in result['batches']
+            ]
+            lines.append(f"{len(result['batches'])} batches in the trash")
+        else:
+            lines = [f"{error['path']}: {error['error']}" for error in result['errors']]
+            verb = 'restored' if result['action'] == 'restore' else 'purged'
+            lines.append(
+                f"{len(result['files'])} files {verb} from {len(result['batches'])} batches "
+                f"({result['bytes'] / (1024 * 1024):.1f} MB), {len(result['errors'])} errors"
+            )
+    elif command == 'verify':
+        lines = [f"{error['path']}: {error['error']}" for error in result['errors']]
+        for archive in result['archives']:
+            lines.extend(f"{archive['target']}/{path}: changed since archiving, no checksum to compare"
+                         for path in archive['unverifiable'])
+            lines.append(
+                f"{archive['target']}: {archive['verified']} files verified, {archive['skipped']} unchanged "
+                f"({archive['bytes_read'] / (1024 * 1024):.1f} MB read in {archive['elapsed_s']:.2f}s)"
+            )
+        lines.append(f"{len(result['errors'])} missing or corrupt files")
+    elif command == 'usage':
+        lines = [
+            f"{folder['bytes'] / (1024 * 1024):10.1f} MB  {folder['files']:>7} files  {folder['folder']}"
+            for folder in result['folders']
+        ]
+        lines.extend(
+            f"{root['bytes'] / (1024 * 1024):10.1f} MB  {root['files']:>7} files  {root['root']} (total)"
+            for root in result['root_totals']
+        )
+        if result['cached']:
+            lines.append("from the cached folder totals; rerun with --refresh to rewalk")
+    else:
+        lines = []
+        for group in result['groups']:
+            lines.append(f"keep {group['keep']}")
+            lines.extend(f"  copy {copy}" for copy in group['copies'])
+        lines.append(f"{len(result['groups'])} duplicate sets, {result['wasted_size_mb']:.1f} MB redundant")
+        if 'deleted' in result:
+            lines.append(f"{len(result['deleted'])} copies deleted, {len(result['errors'])} errors")
+    if len(result.get('roots', ())) > 1:
+        lines.extend(
+            f"root {record['root']}: " + (record['error'] or f"{record['files']} files in {record['elapsed_s']:.2f}s")
+            for record in result['roots']
+        )
+    return lines
+
+def run_command(args) -> int:
+    """
+    Run a headless subcommand and write its result to stdout
+
+    Returns:
+        Process exit status: 0 on success, 1 if any file operation failed
+    """
+    from ..utils.config import Config
+
+    output = sys.stdout
+    # Everything the core prints (warnings) goes to stderr
+    with redirect_stdout(sys.stderr):
+        if args.command in STANDALONE_COMMANDS:
+            result = COMMANDS[args.command](None, args)
+        else:
+            from ..utils import sniffer
+
+            config = Config(args.config)
+            sniffer.use_cache(config.type_cache_file)
+            index_file = config.index_file if args.use_index else None
+            result = COMMANDS[args.command](
+                config.config, args, index_file, config.hash_cache_file, config.rollup_file,
+                config.checkpoint_dir
+            )
+
+    if args.json:
+        json.dump(result, output, indent=2)
+        output.write('\n')
+    else:
+        output.write('\n'.join(_text_lines(result)) + '\n')
+    return 1 if result.get('errors') else 0
@@ -3,7 +3,16 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.prompt import Prompt, Confirm
 from rich.tree import Tree
-from typing import Dict, Any, List
+from rich.live import Live
+from collections import deque
+from typing import Dict, Any, Iterable, List, Union
+import heapq
+import time
+from ..utils.file_table import FileTable, FileTableBuilder
+from ..utils.file_utils import RootScan, common_root, downloads_roots, format_size
+from ..utils.rollup import BYTES_PER_MB
+from .results_view import ResultsView
+from ..utils import profiler
 
 console = Console()
 
@@ -23,11 +32,13 @@ class MainMenu:
         table.add_row("[2]", "[red]Clean files[/red]")
         table.add_row("[3]", "[green]Archive files[/green]")
         table.add_row("[4]", "[yellow]Configure settings[/yellow]")
-        table.add_row("[5]", "[white]Exit[/white]")
+        table.add_row("[5]", "[magenta]Find duplicates[/magenta]")
+        table.add_row("[6]", "[blue]Largest and oldest files[/blue]")
+        table.add_row("[7]", "[white]Exit[/white]")
         
         console.print(table)
         
-        choice = Prompt.ask("\nSelect an option", choices=["1", "2", "3", "4", "5"])
+        choice = Prompt.ask("\nSelect an option", choices=["1", "2", "3", "4", "5", "6", "7"])
         return choice
     
     def display_scan_options(self) -> Dict[str, Any]:
@@ -46,48 +57,120 @@ class MainMenu:
             'include_hidden': include_hidden
         }
     
-    def display_scan_results(self, grouped_files: Dict[str, List[Dict[str, Any]]]) -> None:
-        """Display scan results in a tree structure"""
-        if not grouped_files:
-            console.print("[yellow]No files found matching the criteria[/yellow]")
-            return
+    def display_streaming_results(self, files: Iterable[Dict[str, Any]]) -> FileTable:
+        """Render matches live as the scan yields them and return the collected files"""
+        found = FileTableBuilder(common_root(downloads_roots(self.config)))
+        count = 0
+        recent = deque(maxlen=10)
+        total_size = 0
+        last_render = 0.0
         
-        total_files = sum(len(files) for files in grouped_files.values())
-        total_size = sum(
-            sum(f['size'] for f in files)
-            for files in grouped_files.values()
-        )
+        with Live(console=console, transient=True) as live:
+            for file in files:
+                found.append_info(file)
+                recent.append(file)
+                count += 1
+                total_size += file['size']
+                
+                # Redraw at most ten times per second regardless of match rate
+                now = time.monotonic()
+                if now - last_render >= 0.1:
+                    live.update(self._render_stream(recent, count, total_size))
+                    last_render = now
         
-        console.print(Panel(f"Found {total_files} files (Total size: {total_size:.1f} MB)"))
+        return found.build()
+    
+    def _render_stream(self, recent: Iterable[Dict[str, Any]], count: int, total_size: float) -> Table:
+        table = Table(title=f"Scanning... {count} matches ({total_size:.1f} MB)", show_header=True)
+        table.add_column("File")
+        table.add_column("Size")
+        table.add_column("Age (days)")
+        table.add_column("Location")
+        for file in recent:
+            table.add_row(
+                file['name'],
+                f"{file['size']:.1f} MB",
+                str(file['age']),
+                str(file['relative_path'].parent)
+            )
+        return table
+    
+    def display_top_options(self) -> Dict[str, Any]:
+        console.clear()
+        console.print(Panel("🏆 [bold]Largest and Oldest Files[/bold]"))
         
-        # Create tree structure
-        tree = Tree("[bold]📁 Downloads[/bold]")
+        by = Prompt.ask("Rank files by", choices=["size", "age", "access"], default="size")
+        per_folder = Confirm.ask("Rank within each folder?", default=False)
+        limit = Prompt.ask("How many files" + (" per folder" if per_folder else ""), default="10" if per_folder else "50")
+        include_hidden = Confirm.ask("Include hidden files?", default=False)
         
-        # Sort folders by file count
-        sorted_folders = sorted(
-            grouped_files.items(),
-            key=lambda x: len(x[1]),
-            reverse=True
-        )
-        
-        for folder, files in sorted_folders:
-            folder_size = sum(f['size'] for f in files)
-            folder_node = tree.add(
-                f"[bold blue]📁 {folder}[/bold blue] ({len(files)} files, {folder_size:.1f} MB)"
-            )
-            
-            # Sort files by size
-            sorted_files = sorted(files, key=lambda x: x['size'], reverse=True)
-            for file in sorted_files:
-                age_color = "red" if file['age'] > 90 else "yellow" if file['age'] > 30 else "green"
-                folder_node.add(
-                    f"[{age_color}]📄 {file['name']}[/{age_color}] - "
-                    f"{file['size']:.1f}MB ({file['age']} days old)"
-                )
+        return {
+            'by': by,
+            'limit': int(limit),
+            'per_folder': per_folder,
+            'include_hidden': include_hidden
+        }
+    
+    def display_top_files(self, files: List[Dict[str, Any]], by: str, title: str = "Top files") -> None:
+        """Show ranked files, with the column they were ranked by first"""
+        if not files:
+            console.print("[yellow]No files found[/yellow]")
+            return
         
-        console.print(tree)
+        table = Table(title=title, show_header=True)
+        table.add_column({'size': "Size", 'age': "Modified", 'access': "Last access"}[by])
+        table.add_column("File")
+        table.add_column("Size" if by != 'size' else "Age (days)", justify="right")
+        table.add_column("Location")
+        for file in files:
+            if by == 'size':
+                ranked, other = format_size(file['size']), str(file['age'])
+            else:
+                moment = file['modified'] if by == 'age' else file['last_access']
+                ranked, other = moment.strftime('%Y-%m-%d'), format_size(file['size'])
+            table.add_row(ranked, file['name'], other, str(file['relative_path'].parent))
+        console.print(table)
+    
+    def display_root_scans(self, scans: List[RootScan]) -> None:
+        """Show how long each downloads root took when several were scanned"""
+        if len(scans) < 2 and not any(scan.error for scan in scans):
+            return
+        
+        table = Table(title="Downloads roots", show_header=True)
+        table.add_column("Root")
+        table.add_column("Files", justify="right")
+        table.add_column("Time", justify="right")
+        for scan in scans:
+            if scan.error:
+                table.add_row(str(scan.root), "", f"[red]{scan.error}[/red]")
+            else:
+                table.add_row(str(scan.root), str(scan.files), f"{scan.elapsed:.2f}s")
+        console.print(table)
+    
+    def display_top_folders(self, folders: List[tuple]) -> None:
+        """Show the largest folders from a rollup's (folder, bytes, files) rows"""
+        if not folders:
+            return
+        
+        table = Table(title="Top space consumers", show_header=True)
+        table.add_column("Folder")
+        table.add_column("Size", justify="right")
+        table.add_column("Files", justify="right")
+        for folder, size, files in folders:
+            table.add_row(folder, format_size(size / BYTES_PER_MB), str(files))
+        console.print(table)
+    
+    @profiler.timed('render_results')
+    def display_scan_results(self, files: FileTable) -> None:
+        """Display scan results as a paged, collapsible folder tree"""
+        if not len(files):
+            console.print("[yellow]No files found matching the criteria[/yellow]")
+            return
+        
+        ResultsView(files).show()
     
-    def display_clean_confirmation(self, files: List[Dict[str, Any]]) -> bool:
+    @profiler.timed('render_confirmation')
+    def display_clean_confirmation(self, files: Union[FileTable, List[Dict[str, Any]]]) -> bool:
         console.clear()
         console.print(Panel(f"🧹 Found {len(files)} files to clean"))
         
@@ -97,19 +180,50 @@ class MainMenu:
         table.add_column("Age (days)")
         table.add_column("Location")
         
-        total_size = 0
-        for file in files[:10]:  # Show first 10 files
+        # Preview the largest files; the total covers every file
+        if isinstance(files, FileTable):
+            preview = files.top(10)
+            total_size = files.total_size()
+        else:
+            preview = heapq.nlargest(10, files, key=lambda file: file['size'])
+            total_size = sum(file['size'] for file in files)
+        for file in preview:
             table.add_row(
                 file['name'],
                 f"{file['size']:.1f} MB",
                 str(file['age']),
                 str(file['relative_path'].parent)
             )
-            total_size += file['size']
         
+        console.print(table)
         if len(files) > 10:
             console.print(f"... and {len(files) - 10} more files")
-        
-        console.print(table)
         console.print(f"\nTotal size to be cleaned: {total_size:.1f} MB")
-        return Confirm.ask("Do you want to proceed with cleaning?") 
\ No newline at end of file
+        return Confirm.ask("Do you want to proceed with cleaning?") 
+    
+    def display_duplicates(self, groups: List[List[Dict[str, Any]]], redundant: List[Dict[str, Any]]) -> bool:
+        """Show duplicate groups and ask whether to delete the redundant copies"""
+        console.clear()
+        wasted = sum(file['size'] for file in redundant)
+        console.print(Panel(
+            f"🧬 Found {len(groups)} sets of duplicates "
+            f"({len(redundant)} redundant copies, {wasted:.1f} MB)"
+        ))
+        
+        tree = Tree("[bold]📁 Downloads[/bold]")
+        for group in groups[:20]:  # Show the 20 most wasteful sets
+            keeper = group[0]
+            group_node = tree.add(
+                f"[bold]{keeper['name']}[/bold] - {keeper['size']:.1f} MB x {len(group)}"
+            )
+            group_node.add(f"[green]keep  {keeper['relative_path']}[/green]")
+            for file in group[1:]:
+                group_node.add(f"[red]copy  {file['relative_path']}[/red]")
+        
+        if len(groups) > 20:
+            console.print(f"... and {len(groups) - 20} more sets")
+        
+        console.print(tree)
+        if not redundant:
+            return False
+        return Confirm.ask("Delete redundant copies, keeping the oldest file of each set?")
@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from rich.console import Console
+from rich.panel import Panel
+from rich.prompt import Prompt
+from rich.tree import Tree
+from ..utils.file_table import FileTable, BYTES_PER_MB
+
+console = Console()
+
+class ResultsView:
+    """
+    Paged folder view over a FileTable
+
+    Per-folder counts and sizes are computed once, with a single grouped
+    reduction, and the overall totals come from those aggregates. A page
+    only renders the folders it shows, and a folder's files are selected
+    (its ``top_n`` largest, never a full sort) only when it is expanded.
+    """
+
+    def __init__(self, files: FileTable, page_size: int = 25, top_n: int = 10):
+        self.files = files
+        self.page_size = page_size
+        self.top_n = top_n
+        self.order, self.offsets, self.counts = files.folder_rows()
+        self.sizes = np.bincount(files.parent, weights=files.size, minlength=len(files.parents))
+
+        # Folders with matches, largest file count first
+        present = np.flatnonzero(self.counts)
+        self.folders: List[int] = present[np.argsort(-self.counts[present], kind='stable')].tolist()
+        self.total_files = int(self.counts.sum())
+        self.total_size = float(self.sizes.sum()) / BYTES_PER_MB
+
+        self.expanded: Set[int] = set()
+        self._top: Dict[int, FileTable] = {}
+        self._ages: Dict[int, np.ndarray] = {}
+        # Small results are shown fully expanded on one page, as before
+        if self.total_files + len(self.folders) <= page_size:
+            self.expanded.update(self.folders)
+
+    def top_files(self, parent_id: int) -> FileTable:
+        """Largest files of one folder, selected on first use"""
+        if parent_id not in self._top:
+            start = self.offsets[parent_id]
+            rows = self.order[start:start + self.counts[parent_id]]
+            self._top[parent_id] = self.files.take(rows).top(self.top_n)
+            self._ages[parent_id] = self._top[parent_id].ages()
+        return self._top[parent_id]
+
+    def _lines(self) -> List[Tuple[int, Optional[int]]]:
+        """Visible lines as (folder position, file position or None for the folder line)"""
+        lines = []
+        for position, parent_id in enumerate(self.folders):
+            lines.append((position, None))
+            if parent_id in self.expanded:
+                shown = min(self.top_n, int(self.counts[parent_id]))
+                lines.extend((position, i) for i in range(shown))
+                if self.counts[parent_id] > shown:
+                    lines.append((position, -1))  # "... and N more" marker
+        return lines
+
+    def page_count(self) -> int:
+        return max(1, -(-len(self._lines()) // self.page_size))
+
+    def render(self, page: int) -> Tree:
+        """Build the tree for one page of visible lines"""
+        tree = Tree("[bold]📁 Downloads[/bold]")
+        folder_node = None
+        for position, file_position in self._lines()[page * self.page_size:(page + 1) * self.page_size]:
+            parent_id = self.folders[position]
+            if folder_node is None or file_position is None:
+                marker = "▾" if parent_id in self.expanded else "▸"
+                folder_node = tree.add(
+                    f"[dim]\\[{position + 1}][/dim] {marker} [bold blue]📁 {self.files.folder_label(parent_id)}[/bold blue] "
+                    f"({self.counts[parent_id]} files, {self.sizes[parent_id] / BYTES_PER_MB:.1f} MB)"
+                )
+                if file_position is None:
+                    continue
+            if file_position == -1:
+                folder_node.add(f"[dim]... and {self.counts[parent_id] - self.top_n} smaller files[/dim]")
+                continue
+            top = self.top_files(parent_id)
+            age = int(self._ages[parent_id][file_position])
+            age_color = "red" if age > 90 else "yellow" if age > 30 else "green"
+            folder_node.add(
+                f"[{age_color}]📄 {top.names[top.name_id[file_position]]}[/{age_color}] - "
+                f"{top.size[file_position] / BYTES_PER_MB:.1f}MB ({age} days old)"
+            )
+        return tree
+
+    def toggle(self, position: int) -> None:
+        parent_id = self.folders[position]
+        if parent_id in self.expanded:
+            self.expanded.remove(parent_id)
+        else:
+            self.expanded.add(parent_id)
+
+    def show(self) -> None:
+        """Print the summary and page through the folders until the user quits"""
+        summary = Panel(
+            f"Found {self.total_files} files in {len(self.folders)} folders "
+            f"(Total size: {self.total_size:.1f} MB)"
+        )
+        if self.page_count() == 1 and len(self.expanded) == len(self.folders):
+            console.print(summary)
+            console.print(self.render(0))
+            return
+
+        page = 0
+        while True:
+            console.clear()
+            console.print(summary)
+            console.print(self.render(page))
+            console.print(f"[dim]Page {page + 1} of {self.page_count()}[/dim]")
+            choice = Prompt.ask(
+                "\\[n]ext, \\[p]revious, folder number to expand/collapse, \\[q]uit",
+                default="q"
+            ).strip().lower()
+
+            if choice == "q":
+                break
+            elif choice == "n":
+                page = min(page + 1, self.page_count() - 1)
+            elif choice == "p":
+                page = max(page - 1, 0)
+            elif choice.isdigit() and 1 <= int(choice) <= len(self.folders):
+                self.toggle(int(choice) - 1)
+                page = min(page, self.page_count() - 1)
@@ -1,5 +1,25 @@
-from .scanner import FileScanner
-from .cleaner import FileCleaner
-from .archiver import FileArchiver
+from importlib import import_module
 
-__all__ = ['FileScanner', 'FileCleaner', 'FileArchiver'] 
\ No newline at end of file
+# Exports are resolved on first access, so a command only loads the core
+# modules it uses
+_EXPORTS = {
+    'FileScanner': '.scanner',
+    'FileCleaner': '.cleaner',
+    'CleanResult': '.cleaner',
+    'FileArchiver': '.archiver',
+    'DuplicateFinder': '.duplicates',
+    'FolderWatcher': '.watcher',
+    'TrashStore': '.trash',
+    'SpaceReclaimer': '.reclaim',
+    'AsyncFileScanner': '.aio',
+    'AsyncFileCleaner': '.aio',
+    'AsyncFileArchiver': '.aio',
+}
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
+
+__all__ = ['FileScanner', 'FileCleaner', 'CleanResult', 'FileArchiver', 'DuplicateFinder', 'FolderWatcher', 'TrashStore',
+           'SpaceReclaimer', 'AsyncFileScanner', 'AsyncFileCleaner', 'AsyncFileArchiver']
@@ -0,0 +1,259 @@
+"""
+Asyncio API for embedding the scanner, cleaner and archiver in services
+
+Blocking filesystem work runs on a bounded thread pool, either one the
+caller shares between instances or one owned by the instance. Results are
+produced in chunks: the next chunk is only read once the consumer has taken
+the previous one, which bounds memory and lets a slow consumer hold back the
+walk. Cancelling the consuming task, or closing the iterator early (e.g.
+with ``contextlib.aclosing``), stops the work at the next chunk boundary.
+Nothing here writes to the console.
+"""
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from ..utils.file_utils import RootScan, downloads_roots, shares_device
+from .archiver import FileArchiver
+from .cleaner import CleanResult, FileCleaner, _delete_batch, _planned
+from .containers import ContainerResult, ContainerWriter
+from .integrity import ArchiveManifest, manifest_for
+from .scanner import FileScanner
+from .transfer import TransferEngine
+from .trash import TrashStore
+from ..utils import profiler
+
+# Items produced per executor hop; also how far production runs ahead of
+# the consumer
+CHUNK_SIZE = 256
+
+class TransferOutcome(NamedTuple):
+    """One archived file, or the error that kept it in place"""
+    source: str
+    target: str
+    size: int
+    error: Optional[Exception]
+
+def _take(iterator: Iterator[Any], count: int) -> List[Any]:
+    return list(islice(iterator, count))
+
+def _close_when_done(executor: Executor, pending: Optional[Future], iterator: Iterator[Any]) -> None:
+    """Close ``iterator`` on a worker once no chunk of it is being produced"""
+    close = getattr(iterator, 'close', None)
+    if close is None:
+        return
+
+    def submit_close(_: Any = None) -> None:
+        try:
+            executor.submit(close)
+        except RuntimeError:
+            close()  # Executor already shut down
+    if pending is None:
+        submit_close()
+    else:
+        pending.add_done_callback(submit_close)
+
+async def iterate_in_executor(executor: Executor, iterator: Iterator[Any],
+                              chunk_size: int = CHUNK_SIZE) -> AsyncIterator[Any]:
+    """
+    Drive a blocking iterator on ``executor`` and yield its items
+
+    At most one chunk is produced ahead of the consumer, and the iterator
+    is closed on a worker thread when iteration ends, fails or is cancelled.
+    """
+    pending: Optional[Future] = None
+    try:
+        while True:
+            pending = executor.submit(_take, iterator, chunk_size)
+            chunk = await asyncio.wrap_future(pending)
+            if not chunk:
+                return
+            for item in chunk:
+                yield item
+    finally:
+        _close_when_done(executor, pending, iterator)
+
+class _AsyncComponent:
+    """Shared executor handling; usable as an async context manager"""
+
+    def __init__(self, executor: Optional[Executor] = None, max_workers: int = 4):
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dropclear')
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.wrap_future(self.executor.submit(func, *args))
+
+    def close(self) -> None:
+        """Shut down the executor if this instance created it"""
+        if self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+class AsyncFileScanner(_AsyncComponent):
+    """Asynchronous counterpart of FileScanner"""
+
+    def __init__(self, config: Dict[str, Any], index_file: Optional[str] = None,
+                 executor: Optional[Executor] = None, max_workers: int = 4):
+        super().__init__(executor, max_workers)
+        self.scanner = FileScanner(config, index_file)
+
+    @property
+    def root_scans(self) -> List[RootScan]:
+        """Per-root timings of the most recent scan"""
+        return self.scanner.root_scans
+
+    def iter_files(self, min_age: int = None, min_size: float = None, pattern: str = "",
+                   include_hidden: bool = False, limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield matching files as the walk finds them (see FileScanner.iter_files)"""
+        return iterate_in_executor(
+            self.executor,
+            self.scanner.iter_files(min_age, min_size, pattern, include_hidden, limit)
+        )
+
+    async def scan_files(self, min_age: int = None, min_size: float = None, pattern: str = "",
+                         include_hidden: bool = False) -> List[Dict[str, Any]]:
+        return [info async for info in self.iter_files(min_age, min_size, pattern, include_hidden)]
+
+class AsyncFileCleaner(_AsyncComponent):
+    """Asynchronous counterpart of FileCleaner"""
+
+    def __init__(self, config: Dict[str, Any], index_file: Optional[str] = None,
+                 executor: Optional[Executor] = None, max_workers: int = 4):
+        super().__init__(executor, max_workers)
+        self.config = config
+        self.cleaner = FileCleaner(config, index_file)
+
+    def iter_files_to_clean(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the files the rules and settings select for cleaning"""
+        return iterate_in_executor(self.executor, self.cleaner.iter_files_to_clean())
+
+    def partition_actions(self, files: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+        return self.cleaner.partition_actions(files)
+
+    async def iter_clean(self, files_to_clean: Iterable[Dict[str, Any]]) -> AsyncIterator[CleanResult]:
+        """
+        Delete files one folder batch per task and yield each batch's result
+
+        Batches are queued on the executor, so at most its worker count run
+        at once. Batches that have not started when the consumer stops or is
+        cancelled are never run. In trash mode the whole set is staged as
+        one trash batch.
+        """
+        if self.config.get('delete_mode', 'delete') == 'trash':
+            files = [_planned(info) for info in files_to_clean]
+            yield await self._run(lambda: TrashStore(downloads_roots(self.config)).stage(files))
+            return
+
+        futures = [self.executor.submit(_delete_batch, batch) for batch in self.cleaner._batches(files_to_clean)]
+        try:
+            for next_done in asyncio.as_completed([asyncio.wrap_future(future) for future in futures]):
+                batch_result = await next_done
+                profiler.count('files_deleted', len(batch_result.deleted))
+                profiler.count('bytes_freed', batch_result.bytes_freed)
+                yield batch_result
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def clean_files(self, files_to_clean: Iterable[Dict[str, Any]]) -> CleanResult:
+        """Delete files and return the combined result"""
+        result = CleanResult()
+        started = asyncio.get_running_loop().time()
+        async for batch_result in self.iter_clean(files_to_clean):
+            result.deleted.extend(batch_result.deleted)
+            result.errors.extend(batch_result.errors)
+            result.changed.extend(batch_result.changed)
+            result.bytes_freed += batch_result.bytes_freed
+            result.trash_batch = batch_result.trash_batch
+        result.elapsed = asyncio.get_running_loop().time() - started
+        return result
+
+def _transfer_chunks(engine: TransferEngine, moves: Iterator[Tuple[str, str, int]],
+                     same_device: bool, chunk_size: int,
+                     manifest: Optional[ArchiveManifest] = None) -> Iterator[TransferOutcome]:
+    """Transfer moves a chunk at a time, yielding each chunk's outcomes"""
+    while True:
+        chunk = _take(moves, chunk_size)
+        if not chunk:
+            return
+        outcomes: List[TransferOutcome] = []
+        engine.transfer(chunk, same_device, lambda *outcome: outcomes.append(TransferOutcome(*outcome)), manifest)
+        yield from outcomes
+
+class AsyncFileArchiver(_AsyncComponent):
+    """Asynchronous counterpart of FileArchiver"""
+
+    def __init__(self, config: Dict[str, Any], index_file: Optional[str] = None,
+                 executor: Optional[Executor] = None, max_workers: int = 4):
+        super().__init__(executor, max_workers)
+        self.config = config
+        self.archiver = FileArchiver(config, index_file)
+
+    async def iter_archive(self, extensions: List[str] = None, target_dir: str = None) -> AsyncIterator[TransferOutcome]:
+        """
+        Move files with the given extensions into the archive, yielding each outcome
+
+        Files are moved as the walk finds them, a chunk at a time, so
+        stopping early leaves the remaining files where they are.
+        """
+        archive_path = Path(target_dir) if target_dir else Path(self.config['archive_path'])
+        extensions = extensions or ['pdf', 'docx', 'xlsx']
+        await self._run(lambda: archive_path.mkdir(parents=True, exist_ok=True))
+        same_device = await self._run(shares_device, downloads_roots(self.config), archive_path)
+
+        engine = TransferEngine(max_workers=self.config.get('archive_workers', 4))
+        outcomes = _transfer_chunks(
+            engine, self.archiver.iter_moves(extensions, archive_path), same_device, CHUNK_SIZE,
+            manifest_for(self.config, str(archive_path))
+        )
+        async for outcome in iterate_in_executor(self.executor, outcomes):
+            if outcome.error is None:
+                profiler.count('files_archived')
+                profiler.count('bytes_moved', outcome.size)
+            yield outcome
+
+    async def archive_files(self, extensions: List[str] = None, target_dir: str = None) -> List[TransferOutcome]:
+        return [outcome async for outcome in self.iter_archive(extensions, target_dir)]
+
+    async def archive_to_containers(self, extensions: List[str] = None, target_dir: str = None,
+                                    container_format: str = None,
+                                    on_file: Optional[Callable[[str, str, int, Optional[Exception]], None]] = None) -> ContainerResult:
+        """
+        Stream files into rolling compressed containers (see FileArchiver.archive_to_containers)
+
+        When cancelled, no further files are fed to the writer; the open
+        containers are closed with the files they already hold, and only
+        those files are removed from the downloads folder.
+
+        Args:
+            on_file: Called from a worker thread as ``on_file(source, arcname, size, error)``
+        """
+        archive_path = Path(target_dir) if target_dir else Path(self.config['archive_path'])
+        extensions = extensions or ['pdf', 'docx', 'xlsx']
+        writer = ContainerWriter(
+            str(archive_path),
+            container_format or self.config.get('archive_format', 'zip'),
+            container_size=int(self.config.get('container_size_mb', 1024) * 1024 * 1024),
+            max_workers=self.config.get('archive_workers', 4)
+        )
+        stop = threading.Event()
+
+        def files() -> Iterator[Tuple[str, str, int, float]]:
+            for item in self.archiver.iter_container_files(extensions):
+                if stop.is_set():
+                    return
+                yield item
+
+        future = self.executor.submit(writer.write, files(), on_file or (lambda *_: None))
+        try:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            stop.set()
+            raise
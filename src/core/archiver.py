@@ -1,25 +1,127 @@
-import shutil
+import os
+import threading
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeRemainingColumn, TimeElapsedColumn
-from rich.console import Console
-from ..utils.file_utils import get_file_info, scan_directory
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Tuple
+from ..utils.file_utils import downloads_roots, mark_index_stale, root_labels, root_of, shares_device, walk_roots
+from ..utils.rollup import FolderRollup
+from ..utils.sniffer import CHUNK_SIZE, ContentSniffer, needs_sniffing
+from .transfer import TransferEngine
+from .integrity import manifest_for
+from .checkpoint import CHANGED_ERROR, RunCheckpoint, unchanged
+from .containers import ContainerWriter, ContainerResult
+from ..utils import profiler, reporter
 
-console = Console()
+def _stat_or_none(entry: os.DirEntry) -> Optional[os.stat_result]:
+    try:
+        return entry.stat()
+    except OSError:
+        return None
 
 class FileArchiver:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], index_file: Optional[str] = None,
+                 rollup_file: Optional[str] = None, checkpoint_dir: Optional[str] = None):
         self.config = config
+        self.index_file = index_file
+        self.rollup_file = rollup_file
+        # Where archive runs log their progress for resume_archive
+        self.checkpoint_dir = checkpoint_dir
+        # Container workers update the saved rollup from several threads
+        self._rollup_lock = threading.Lock()
     
+    def _update_rollup(self, moved: Iterable[Tuple[str, int]]) -> None:
+        """Take moved (path, size) files out of the cached folder totals"""
+        if self.rollup_file:
+            with self._rollup_lock:
+                FolderRollup.update_saved(self.rollup_file, downloads_roots(self.config), moved)
+    
+    def _iter_matching(self, extensions: List[str],
+                       on_entry: Optional[Callable[[], None]] = None) -> Iterator[Tuple[Path, os.DirEntry]]:
+        """
+        Yield walk_roots' (root, entry) pairs for files with one of ``extensions``
+        
+        With ``sniff_content`` on, files with no extension or a generic one
+        (.bin, .dat, .php, ...) are also yielded when their sniffed content
+        type is listed; those are classified a chunk at a time on the
+        sniffer's pool, keyed by the walker's cached stats. Partial
+        downloads (.crdownload, .part, ...) are never sniffed.
+        """
+        entries = walk_roots(downloads_roots(self.config), self.config['exclude_folders'], self.index_file,
+                             max_workers=self.config.get('scan_workers', 4))
+        if not self.config.get('sniff_content', True):
+            for root, entry in entries:
+                if on_entry:
+                    on_entry()
+                # Filter by extension on the entry name so only candidates
+                # are ever stat'ed
+                if Path(entry.name).suffix.lower()[1:] in extensions:
+                    yield root, entry
+            return
+        
+        sniffer = ContentSniffer()
+        try:
+            while True:
+                chunk = list(islice(entries, CHUNK_SIZE))
+                if not chunk:
+                    return
+                if on_entry:
+                    for _ in chunk:
+                        on_entry()
+                listed = []
+                generic = []
+                for i, (_, entry) in enumerate(chunk):
+                    if Path(entry.name).suffix.lower()[1:] in extensions:
+                        listed.append(i)
+                    elif needs_sniffing(entry.name):
+                        generic.append(i)
+                types = sniffer.classify(
+                    [chunk[i][1].path for i in generic],
+                    [_stat_or_none(chunk[i][1]) for i in generic]
+                ) if generic else []
+                matched = set(listed)
+                matched.update(i for i, file_type in zip(generic, types) if file_type in extensions)
+                for i, pair in enumerate(chunk):
+                    if i in matched:
+                        yield pair
+        finally:
+            sniffer.close()
+    
+    def iter_moves(self, extensions: List[str], archive_path: Path,
+                   on_entry: Optional[Callable[[], None]] = None) -> Iterator[Tuple[str, str, int]]:
+        """
+        Yield a (source, target, size) move for every file with one of ``extensions``,
+        by name or by content (see _iter_matching)
+        
+        Files keep their folders below their downloads root; with several
+        roots, each root's files go into their own subfolder.
+        
+        Args:
+            on_entry: Called for every file the walk reaches
+        """
+        for source, target, size, _ in self._iter_planned_moves(extensions, archive_path, on_entry):
+            yield source, target, size
+    
+    def _iter_planned_moves(self, extensions: List[str], archive_path: Path,
+                            on_entry: Optional[Callable[[], None]] = None) -> Iterator[Tuple[str, str, int, float]]:
+        """iter_moves' moves with each source's mtime, as checkpoint plans record them"""
+        labels = root_labels(downloads_roots(self.config))
+        for root, entry in self._iter_matching(extensions, on_entry):
+            stats = entry.stat()
+            relative_path = Path(labels[root]) / Path(entry.path).relative_to(root)
+            yield entry.path, str(archive_path / relative_path), stats.st_size, stats.st_mtime
+    
+    @profiler.timed('archive_files')
     def archive_files(self, extensions: List[str] = None, target_dir: str = None) -> List[str]:
         """
         Archive files with specified extensions to target directory
         
+        With a checkpoint_dir, the planned moves and each completed one are
+        logged, so resume_archive can finish an interrupted run.
+        
         Args:
             extensions: List of file extensions to archive (without dots)
             target_dir: Target directory for archived files
         """
-        downloads_path = Path(self.config['downloads_path'])
         archive_path = Path(target_dir) if target_dir else Path(self.config['archive_path'])
         extensions = extensions or ['pdf', 'docx', 'xlsx']
         
@@ -27,80 +129,211 @@ class FileArchiver:
         archive_path.mkdir(parents=True, exist_ok=True)
         
         # First, scan for files recursively with progress
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-            TimeRemainingColumn(),
-            TimeElapsedColumn(),
-            console=console,
-            transient=True
-        ) as progress:
-            scan_task = progress.add_task("[cyan]Scanning for files to archive...", total=None)
-            
-            # Scan directory recursively
-            all_files = scan_directory(downloads_path, progress)
-            
-            # Filter files by extension
-            files_to_archive = [
-                f for f in all_files 
-                if f.suffix.lower()[1:] in extensions
-            ]
-            
-            if not files_to_archive:
-                return []
-            
-            # Update progress for archiving phase
-            archive_task = progress.add_task(
-                "[green]Archiving files...",
-                total=len(files_to_archive),
-                start=False
-            )
-            
-            # Calculate total size for progress
-            total_size = sum(f.stat().st_size for f in files_to_archive)
-            size_task = progress.add_task(
-                "[blue]Total size processed...",
-                total=total_size,
-                start=False
+        with reporter.task("[cyan]Scanning for files to archive...") as scan_task, profiler.span('archive_scan'):
+            planned = list(self._iter_planned_moves(extensions, archive_path, scan_task.advance))
+        
+        if not planned:
+            return []
+        
+        checkpoint = None
+        if self.checkpoint_dir:
+            checkpoint = RunCheckpoint.create(
+                self.checkpoint_dir, 'archive', {'archive_path': str(archive_path)},
+                [list(move) for move in planned]
             )
+        return self._archive_moves(planned, range(len(planned)), archive_path, checkpoint)
+    
+    def resume_archive(self) -> Optional[Tuple[Path, List[str]]]:
+        """
+        Finish the interrupted archive run from its checkpoint, without rescanning
+        
+        Sources whose size or mtime no longer match the plan were replaced
+        since the run began; they are left in place with a warning.
+        
+        Returns:
+            The run's archive folder and the paths archived into it, including
+            files moved after the last flushed batch, or None if no run was
+            interrupted
+        """
+        state = RunCheckpoint.load(self.checkpoint_dir, 'archive') if self.checkpoint_dir else None
+        if state is None:
+            return None
+        archive_path = Path(state.params['archive_path'])
+        archive_path.mkdir(parents=True, exist_ok=True)
+        moves, indices, already = [], [], []
+        for i in state.remaining:
+            source, target, size, mtime = state.items[i]
+            if os.path.lexists(source):
+                moves.append((source, target, size, mtime))
+                indices.append(i)
+            elif os.path.lexists(target):
+                # Moved after the last flushed batch
+                already.append(str(Path(target).relative_to(archive_path)))
+        
+        return archive_path, already + self._archive_moves(
+            moves, indices, archive_path,
+            RunCheckpoint(RunCheckpoint.checkpoint_path(self.checkpoint_dir, 'archive'))
+        )
+    
+    def _current_moves(self, moves: Iterable[Tuple[str, str, int, float]],
+                       changed: List[str]) -> Iterator[Tuple[str, str, int]]:
+        """
+        Yield (source, target, size) for each planned move as its turn comes
+        
+        Each source is re-checked against the size and mtime it was planned
+        with, since a scan served from the index may hold stale stats.
+        Sources modified since are left in place, warned about and added to
+        ``changed``; vanished ones are passed on for the transfer to report.
+        """
+        for source, target, size, mtime in moves:
+            if unchanged(source, size, mtime) or not os.path.lexists(source):
+                yield source, target, size
+                continue
+            changed.append(source)
+            profiler.count('errors')
+            reporter.warning(f"[yellow]Skipped {source}: {CHANGED_ERROR}[/yellow]")
+    
+    def _archive_moves(self, moves: List[Tuple[str, str, int, float]], indices: Iterable[int], archive_path: Path,
+                       checkpoint: Optional[RunCheckpoint]) -> List[str]:
+        """
+        Transfer planned (source, target, size, mtime) moves, marking each done in ``checkpoint``
+        
+        Sources that changed since they were planned count as done, so a
+        resumed run does not retry them.
+        """
+        archived_files = []
+        moved = []
+        changed: List[str] = []
+        failed = 0
+        index = {source: i for (source, _, _, _), i in zip(moves, indices)}
+        
+        # One device check per root decides between renames and verified
+        # copies; roots on other devices fall back to copies on EXDEV
+        same_device = shares_device(downloads_roots(self.config), archive_path)
+        
+        def on_done(source: str, target: str, size: int, error: Optional[Exception]) -> None:
+            nonlocal failed
+            if error is not None:
+                failed += 1
+                profiler.count('errors')
+                reporter.warning(f"[red]Error archiving {Path(source).name}: {error}[/red]")
+                return
+            profiler.count('files_archived')
+            profiler.count('bytes_moved', size)
+            if checkpoint is not None:
+                checkpoint.mark_done(index[source])
             
-            archived_files = []
-            current_size = 0
+            # Archived files are reported by their place in the archive
+            rel_path = Path(target).relative_to(archive_path)
+            archived_files.append(str(rel_path))
+            moved.append((source, size))
             
-            # Start archiving phase
-            progress.start_task(archive_task)
-            progress.start_task(size_task)
+            # Sizes were captured before the move; the latest file is shown
+            # at the next refresh instead of printing a line per file
+            archive_task.advance()
+            size_task.advance(size)
+            archive_task.note(str(rel_path))
+        
+        engine = TransferEngine(max_workers=self.config.get('archive_workers', 4))
+        try:
+            with reporter.task("[green]Archiving files...", total=len(moves)) as archive_task, \
+                    reporter.task("[blue]Total size processed...", total=sum(move[2] for move in moves)) as size_task, \
+                    profiler.span('archive_transfer'):
+                engine.transfer(self._current_moves(moves, changed), same_device, on_done,
+                                manifest_for(self.config, str(archive_path)))
+        except BaseException:
+            if checkpoint is not None:
+                checkpoint.flush()
+            raise
+        finally:
+            self._update_rollup(moved)
+            mark_index_stale(self.index_file, changed)
+        if checkpoint is not None:
+            for source in changed:
+                checkpoint.mark_done(index[source])
+            checkpoint.settle(not failed)
+        return archived_files
+    
+    def move_files(self, files: Iterable[Dict[str, Any]], target_dir: str) -> List[str]:
+        """
+        Move already selected files into ``target_dir``, keeping their folders
+        
+        Returns:
+            Paths of the moved files relative to their downloads root
+        """
+        roots = downloads_roots(self.config)
+        labels = root_labels(roots)
+        archive_path = Path(target_dir)
+        archive_path.mkdir(parents=True, exist_ok=True)
+        same_device = shares_device(roots, archive_path)
+        moves = []
+        relative_paths = {}
+        for info in files:
+            label = labels.get(root_of(info['path'], roots), '')
+            relative_paths[str(info['path'])] = str(info['relative_path'])
+            moves.append((str(info['path']), str(archive_path / label / info['relative_path']),
+                          round(info['size'] * 1024 * 1024), info['modified'].timestamp()))
+        
+        archived = []
+        moved = []
+        changed: List[str] = []
+        def on_done(source: str, target: str, size: int, error: Optional[Exception]) -> None:
+            if error is not None:
+                profiler.count('errors')
+                reporter.warning(f"[red]Error archiving {Path(source).name}: {error}[/red]")
+                return
+            profiler.count('files_archived')
+            profiler.count('bytes_moved', size)
+            archived.append(relative_paths[source])
+            moved.append((source, size))
+        
+        TransferEngine(max_workers=self.config.get('archive_workers', 4)).transfer(
+            self._current_moves(moves, changed), same_device, on_done, manifest_for(self.config, str(archive_path))
+        )
+        self._update_rollup(moved)
+        mark_index_stale(self.index_file, changed)
+        return archived
+    
+    def iter_container_files(self, extensions: List[str]) -> Iterator[Tuple[str, str, int, float]]:
+        """Yield the (path, arcname, size, mtime) of every file with one of ``extensions``"""
+        labels = root_labels(downloads_roots(self.config))
+        for root, entry in self._iter_matching(extensions):
+            stats = entry.stat()
+            arcname = (Path(labels[root]) / Path(entry.path).relative_to(root)).as_posix()
+            yield entry.path, arcname, stats.st_size, stats.st_mtime
+    
+    @profiler.timed('archive_containers')
+    def archive_to_containers(self, extensions: List[str] = None, target_dir: str = None,
+                              container_format: str = None) -> ContainerResult:
+        """
+        Stream files with specified extensions into rolling compressed containers
+        
+        Files are fed to the container writer as the walk finds them, and
+        the cached folder totals are updated in batches as each container's
+        sources are removed, so memory does not grow with the number of
+        files archived. Sources that could not be removed stay counted.
+        
+        Args:
+            extensions: List of file extensions to archive (without dots)
+            target_dir: Directory the containers are written to
+            container_format: 'zip' or 'tar.zst' (defaults to config's archive_format)
+        """
+        archive_path = Path(target_dir) if target_dir else Path(self.config['archive_path'])
+        extensions = extensions or ['pdf', 'docx', 'xlsx']
+        writer = ContainerWriter(
+            str(archive_path),
+            container_format or self.config.get('archive_format', 'zip'),
+            container_size=int(self.config.get('container_size_mb', 1024) * 1024 * 1024),
+            max_workers=self.config.get('archive_workers', 4)
+        )
+        
+        with reporter.task("[green]Archiving into containers...") as task:
+            def on_file(source: str, arcname: str, size: int, error: Optional[Exception]) -> None:
+                if error is not None:
+                    profiler.count('errors')
+                    reporter.warning(f"[red]Error archiving {arcname}: {error}[/red]")
+                    return
+                task.advance()
+                task.note(arcname)
             
-            for file_path in files_to_archive:
-                try:
-                    # Get relative path to maintain folder structure
-                    rel_path = file_path.relative_to(downloads_path)
-                    target_path = archive_path / rel_path
-                    
-                    # Create parent directories if needed
-                    target_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Move file
-                    shutil.move(str(file_path), str(target_path))
-                    archived_files.append(str(rel_path))
-                    
-                    # Update progress
-                    file_size = file_path.stat().st_size
-                    current_size += file_size
-                    progress.update(size_task, completed=current_size)
-                    progress.update(archive_task, advance=1)
-                    
-                    # Show current file being processed
-                    progress.console.print(
-                        f"[dim]Archived: {rel_path}[/dim]",
-                        overflow="ellipsis"
-                    )
-                    
-                except Exception as e:
-                    progress.console.print(
-                        f"[red]Error archiving {file_path.name}: {e}[/red]"
-                    )
-        
-        return archived_files 
\ No newline at end of file
+            return writer.write(self.iter_container_files(extensions), on_file, self._update_rollup)
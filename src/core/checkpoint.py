@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from ..utils import profiler
+
+# Plan items written per line
+PLAN_CHUNK = 1024
+# Completed items, or seconds, between flushes of the done log
+FLUSH_ITEMS = 512
+FLUSH_SECONDS = 1.0
+# Seconds a planned mtime may differ from the file's; clean plans take
+# theirs from a datetime, which keeps only microseconds
+MTIME_SLACK = 1e-3
+
+# Reported for planned files found modified when their turn came
+CHANGED_ERROR = "changed since it was scanned; left in place"
+
+def matches(stats: os.stat_result, size: int, mtime: float) -> bool:
+    """Whether ``stats`` still describe the planned file, judged by its size and mtime"""
+    return stats.st_size == size and abs(stats.st_mtime - mtime) <= MTIME_SLACK
+
+def unchanged(path: str, size: int, mtime: float) -> bool:
+    """Whether ``path`` still holds the planned file, judged by its size and mtime"""
+    try:
+        stats = os.lstat(path)
+    except OSError:
+        return False
+    profiler.count('stat_calls')
+    return matches(stats, size, mtime)
+
+@dataclass
+class CheckpointState:
+    """An interrupted run as read back from its checkpoint"""
+    operation: str
+    created: float
+    params: Dict[str, Any]
+    items: List[List[Any]] = field(default_factory=list)
+    done: Set[int] = field(default_factory=set)
+
+    @property
+    def remaining(self) -> List[int]:
+        """Indices of the planned items not yet committed as done"""
+        return [i for i in range(len(self.items)) if i not in self.done]
+
+class RunCheckpoint:
+    """
+    Log of one archive or clean run's planned work and completed items
+
+    The plan is written and synced before the first item is touched: one
+    header line, then the items in chunks. Completed item indices are
+    buffered and appended in batches, so an interrupted run can be resumed
+    from the last flushed batch without rescanning. Items done after that
+    batch are found again on resume by checking the filesystem. Items carry
+    the size and mtime they were planned with, so a resumed run can leave
+    alone a file that was replaced in the meantime (see ``unchanged``).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._done: List[int] = []
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def checkpoint_path(cls, checkpoint_dir: str, operation: str) -> str:
+        return os.path.join(checkpoint_dir, f"{operation}.jsonl")
+
+    @classmethod
+    @profiler.timed('checkpoint_plan')
+    def create(cls, checkpoint_dir: str, operation: str, params: Dict[str, Any],
+               items: List[List[Any]]) -> 'RunCheckpoint':
+        """Write the plan of a new run, replacing any earlier checkpoint of ``operation``"""
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        path = cls.checkpoint_path(checkpoint_dir, operation)
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            f.write(json.dumps({'operation': operation, 'created': time.time(),
+                                'params': params, 'count': len(items)}) + '\n')
+            for start in range(0, len(items), PLAN_CHUNK):
+                f.write(json.dumps({'plan': items[start:start + PLAN_CHUNK]}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+        return cls(path)
+
+    @classmethod
+    def load(cls, checkpoint_dir: str, operation: str) -> Optional[CheckpointState]:
+        """The interrupted run of ``operation``, or None if there is none"""
+        path = cls.checkpoint_path(checkpoint_dir, operation)
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None
+        if not lines:
+            return None
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return None
+        state = CheckpointState(header['operation'], header['created'], header.get('params', {}))
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line torn by a crash mid-append
+            if 'plan' in record:
+                state.items.extend(record['plan'])
+            elif 'done' in record:
+                state.done.update(record['done'])
+        if len(state.items) != header.get('count'):
+            return None  # The plan itself was never completely written
+        return state
+
+    def mark_done(self, index: int) -> None:
+        """Record a completed item; written out with the next batch"""
+        with self._lock:
+            self._done.append(index)
+            due = len(self._done) >= FLUSH_ITEMS or time.monotonic() - self._flushed_at >= FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            done, self._done = self._done, []
+            self._flushed_at = time.monotonic()
+            if not done:
+                return
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({'done': done}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def finish(self) -> None:
+        """The run completed; nothing is left to resume"""
+        with self._lock:
+            self._done = []
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def settle(self, complete: bool) -> None:
+        """
+        End the run: remove the checkpoint when every item succeeded, or
+        keep it so a resumed run retries the failed ones
+        """
+        if complete:
+            self.finish()
+        else:
+            self.flush()
+
+    @classmethod
+    def pending(cls, checkpoint_dir: Optional[str], operation: str) -> bool:
+        """Whether an interrupted run of ``operation`` left a checkpoint"""
+        return bool(checkpoint_dir) and os.path.exists(cls.checkpoint_path(checkpoint_dir, operation))
+
+    @classmethod
+    def discard(cls, checkpoint_dir: str, operation: str) -> None:
+        try:
+            os.unlink(cls.checkpoint_path(checkpoint_dir, operation))
+        except FileNotFoundError:
+            pass
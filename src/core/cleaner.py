@@ -1,43 +1,302 @@
-from pathlib import Path
-from typing import List, Dict, Any
-from rich.progress import Progress
-from ..utils.file_utils import get_file_info
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from ..utils.file_utils import downloads_roots, mark_index_stale, scan_root_infos
+from ..utils.rules import RuleSet
+from ..utils.rollup import FolderRollup
+from ..utils import profiler, reporter
+from .checkpoint import CHANGED_ERROR, RunCheckpoint, unchanged
+
+# Upper bound on files per deletion task, so one huge folder still spreads
+# across workers
+BATCH_SIZE = 256
+
+@dataclass
+class CleanResult:
+    """Outcome of a clean run"""
+    deleted: List[str] = field(default_factory=list)
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+    bytes_freed: int = 0
+    elapsed: float = 0.0
+    # Set when the files were moved to the trash rather than unlinked
+    trash_batch: Optional[str] = None
+    # Files left in place because they changed since they were scanned;
+    # each is also listed in errors
+    changed: List[str] = field(default_factory=list)
+    
+    def __len__(self) -> int:
+        return len(self.deleted)
+    
+    @property
+    def files_per_second(self) -> float:
+        return len(self.deleted) / self.elapsed if self.elapsed else 0.0
+    
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_freed / self.elapsed if self.elapsed else 0.0
+
+def _planned(info: Dict[str, Any]) -> Tuple[str, int, float]:
+    """The (path, size, mtime) a file was selected with, re-checked before it is removed"""
+    return str(info['path']), round(info['size'] * 1024 * 1024), info['modified'].timestamp()
+
+@profiler.timed('unlink_batch')
+def _delete_batch(batch: List[Tuple[str, int, float]]) -> CleanResult:
+    """
+    Unlink one batch of (path, size, mtime) files from the same folder
+
+    Each file is re-checked first: a scan served from the index may hold
+    stale stats, and a file modified since it was selected is left alone.
+    """
+    result = CleanResult()
+    for path, size, mtime in batch:
+        if not unchanged(path, size, mtime) and os.path.lexists(path):
+            result.errors.append((path, CHANGED_ERROR))
+            result.changed.append(path)
+            continue
+        try:
+            os.unlink(path)
+            result.deleted.append(path)
+            result.bytes_freed += size
+        except OSError as e:
+            result.errors.append((path, str(e)))
+    return result
 
 class FileCleaner:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], index_file: Optional[str] = None,
+                 rollup_file: Optional[str] = None, checkpoint_dir: Optional[str] = None):
         self.config = config
+        self.index_file = index_file
+        self.rollup_file = rollup_file
+        # Where clean runs log their progress for resume_clean
+        self.checkpoint_dir = checkpoint_dir
+    
+    def _update_rollup(self, removed: Iterable[Tuple[str, int]]) -> None:
+        """Take removed (path, size) files out of the cached folder totals"""
+        if self.rollup_file:
+            FolderRollup.update_saved(self.rollup_file, downloads_roots(self.config), removed)
+    
+    def iter_files_to_clean(self) -> Iterator[Dict[str, Any]]:
+        """Lazily yield the files a rule or the global settings select for cleaning"""
+        rules = RuleSet.from_config(self.config)
+        yield from rules.iter_actionable(scan_root_infos(
+            downloads_roots(self.config), self.config['exclude_folders'], self.index_file, rules,
+            self.config.get('scan_workers', 4)
+        ))
     
     def identify_files_to_clean(self) -> List[Dict[str, Any]]:
-        downloads_path = Path(self.config['downloads_path'])
         files_to_clean = []
         
-        files = list(downloads_path.glob('*'))
-        with Progress() as progress:
-            task = progress.add_task("[cyan]Identifying files to clean...", total=len(files))
-            
-            for file_path in files:
-                if file_path.is_file():
-                    info = get_file_info(file_path)
-                    if (info['age'] >= self.config['max_age_days'] and 
-                        info['size'] >= self.config['min_size_mb'] and
-                        info['extension'] not in self.config['exclude_extensions']):
-                        files_to_clean.append(info)
-                progress.update(task, advance=1)
+        with reporter.task("[cyan]Identifying files to clean...") as task:
+            for info in self.iter_files_to_clean():
+                files_to_clean.append(info)
+                task.advance()
         
         return files_to_clean
     
-    def clean_files(self, files_to_clean: List[Dict[str, Any]]) -> List[str]:
-        deleted_files = []
+    def partition_actions(self, files: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+        """
+        Split files selected for cleaning by the action their rule asks for
+        
+        Returns:
+            (files to delete, files to archive keyed by target folder)
+        """
+        rules = RuleSet.from_config(self.config)
+        if rules.is_default:
+            return list(files), {}
+        
+        to_delete = []
+        to_archive: Dict[str, List[Dict[str, Any]]] = {}
+        now = time.time()
+        for info, content_type in rules.iter_typed(files, lambda info: str(info['path'])):
+            action, archive_to = info.get('action'), info.get('archive_to')
+            if action is None:
+                decision = rules.decide(
+                    str(info['relative_path']),
+                    round(info['size'] * 1024 * 1024),
+                    info['modified'].timestamp(),
+                    now,
+                    content_type
+                )
+                action, archive_to = decision.action, decision.archive_to
+            if action == 'delete':
+                to_delete.append(info)
+            elif action == 'archive':
+                to_archive.setdefault(archive_to, []).append(info)
+        return to_delete, to_archive
+    
+    def identify_duplicates_to_clean(self, duplicate_groups: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Pick the redundant copies from DuplicateFinder groups
+        
+        The first (oldest) file of each group is kept. Hidden copies and
+        copies a keep rule protects, including the exclude_extensions and
+        exclude_types settings, are never selected; the age and size
+        thresholds do not apply to copies.
+        """
+        rules = RuleSet.from_config(self.config, min_age=0, min_size=0)
+        copies = (info for group in duplicate_groups for info in group[1:] if not info['is_hidden'])
+        now = time.time()
+        return [
+            info
+            for info, content_type in rules.iter_typed(copies, lambda info: str(info['path']))
+            if rules.decide(
+                str(info['relative_path']),
+                round(info['size'] * 1024 * 1024),
+                info['modified'].timestamp(),
+                now,
+                content_type
+            ).action != 'keep'
+        ]
+    
+    def _batches(self, files_to_clean: Iterable[Dict[str, Any]]) -> List[List[Tuple[str, int, float]]]:
+        """Group files by parent folder and split each group into bounded batches"""
+        return self._batch_planned(_planned(file_info) for file_info in files_to_clean)
+    
+    @staticmethod
+    def _batch_planned(files: Iterable[Tuple[str, int, float]]) -> List[List[Tuple[str, int, float]]]:
+        by_folder: Dict[str, List[Tuple[str, int, float]]] = {}
+        for planned in files:
+            by_folder.setdefault(os.path.dirname(planned[0]), []).append(planned)
+        
+        return [
+            files[i:i + BATCH_SIZE]
+            for files in by_folder.values()
+            for i in range(0, len(files), BATCH_SIZE)
+        ]
+    
+    def trash_files(self, files_to_clean: Iterable[Dict[str, Any]]) -> CleanResult:
+        """
+        Move files into the trash as one restorable batch
+        
+        Each file is a single rename into its device's staging folder, so
+        this takes about as long as listing the files. Space is reclaimed
+        when the batch is purged.
+        """
+        return self._trash_planned([_planned(info) for info in files_to_clean])
+    
+    def _trash_planned(self, files: List[Tuple[str, int, float]]) -> CleanResult:
+        from .trash import TrashStore
+        
+        with reporter.task("[red]Moving files to the trash..."):
+            result = TrashStore(downloads_roots(self.config)).stage(files)
+        
+        staged = set(result.deleted)
+        self._update_rollup((path, size) for path, size, _ in files if path in staged)
+        mark_index_stale(self.index_file, result.changed)
+        profiler.count('errors', len(result.errors))
+        return result
+    
+    @profiler.timed('clean_files')
+    def clean_files(self, files_to_clean: Iterable[Dict[str, Any]], max_workers: Optional[int] = None,
+                    delete_mode: Optional[str] = None) -> CleanResult:
+        """
+        Delete files from a bounded thread pool, one folder batch per task
+        
+        Just before its removal, each file's size and mtime are compared
+        with the ones it was scanned with; a file modified since then is
+        left in place and reported, and the scan index relists its folder.
+        With a checkpoint_dir, the planned files and each completed batch
+        are logged, so resume_clean can finish an interrupted run.
+        
+        Args:
+            files_to_clean: File information dictionaries to delete
+            max_workers: Concurrent unlink workers (defaults to config's delete_workers)
+            delete_mode: 'delete' or 'trash' (defaults to config's delete_mode)
+        """
+        files = [_planned(info) for info in files_to_clean]
+        delete_mode = delete_mode or self.config.get('delete_mode', 'delete')
+        checkpoint = None
+        if self.checkpoint_dir and files:
+            checkpoint = RunCheckpoint.create(
+                self.checkpoint_dir, 'clean', {'delete_mode': delete_mode}, [list(item) for item in files]
+            )
+        return self._clean(files, range(len(files)), delete_mode, max_workers, checkpoint)
+    
+    def resume_clean(self, max_workers: Optional[int] = None) -> Optional[CleanResult]:
+        """
+        Finish the interrupted clean run from its checkpoint, without rescanning
+        
+        Files whose size or mtime no longer match the plan were replaced
+        since the run began; they are left in place and reported as errors.
+        
+        Returns:
+            The result for the files that were still left, or None if no
+            run was interrupted
+        """
+        state = RunCheckpoint.load(self.checkpoint_dir, 'clean') if self.checkpoint_dir else None
+        if state is None:
+            return None
+        # Files already gone were cleaned after the last flushed batch
+        pending = [(i, tuple(state.items[i])) for i in state.remaining if os.path.lexists(state.items[i][0])]
+        return self._clean(
+            [planned for _, planned in pending],
+            [i for i, _ in pending],
+            state.params.get('delete_mode', 'delete'),
+            max_workers,
+            RunCheckpoint(RunCheckpoint.checkpoint_path(self.checkpoint_dir, 'clean'))
+        )
+    
+    def _clean(self, files: List[Tuple[str, int, float]], indices: Iterable[int], delete_mode: str,
+               max_workers: Optional[int], checkpoint: Optional[RunCheckpoint]) -> CleanResult:
+        """
+        Delete or trash (path, size, mtime) files, marking each done in ``checkpoint``
+        
+        Files that changed since they were planned are left in place and
+        count as done, so a resumed run does not retry them.
+        """
+        index = dict(zip((path for path, _, _ in files), indices))
+        
+        def mark_done(paths: Iterable[str]) -> None:
+            if checkpoint is not None:
+                for path in paths:
+                    checkpoint.mark_done(index[path])
+        
+        try:
+            if delete_mode == 'trash':
+                result = self._trash_planned(files)
+                mark_done(result.deleted + result.changed)
+            else:
+                result = self._delete_planned(files, max_workers, mark_done)
+        except BaseException:
+            if checkpoint is not None:
+                checkpoint.flush()
+            raise
+        if checkpoint is not None:
+            checkpoint.settle(len(result.errors) == len(result.changed))
+        return result
+    
+    def _delete_planned(self, files: List[Tuple[str, int, float]], max_workers: Optional[int],
+                        on_batch: Callable[[List[str]], None]) -> CleanResult:
+        max_workers = max_workers or self.config.get('delete_workers', 8)
+        batches = self._batch_planned(files)
+        result = CleanResult()
+        started = time.perf_counter()
         
-        with Progress() as progress:
-            task = progress.add_task("[red]Deleting files...", total=len(files_to_clean))
-            
-            for file_info in files_to_clean:
+        with reporter.task("[red]Deleting files...", total=len(files)) as task:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_delete_batch, batch) for batch in batches]
                 try:
-                    Path(file_info['path']).unlink()
-                    deleted_files.append(file_info['name'])
-                except Exception as e:
-                    print(f"Error deleting {file_info['name']}: {e}")
-                progress.update(task, advance=1)
+                    for future in as_completed(futures):
+                        batch_result = future.result()
+                        on_batch(batch_result.deleted + batch_result.changed)
+                        result.deleted.extend(batch_result.deleted)
+                        result.errors.extend(batch_result.errors)
+                        result.changed.extend(batch_result.changed)
+                        result.bytes_freed += batch_result.bytes_freed
+                        task.advance(len(batch_result.deleted) + len(batch_result.errors))
+                except BaseException:
+                    # Leave batches that have not started for the resumed run
+                    for future in futures:
+                        future.cancel()
+                    raise
         
-        return deleted_files 
\ No newline at end of file
+        result.elapsed = time.perf_counter() - started
+        sizes = {path: size for batch in batches for path, size, _ in batch}
+        self._update_rollup((path, sizes[path]) for path in result.deleted)
+        mark_index_stale(self.index_file, result.changed)
+        profiler.count('files_deleted', len(result.deleted))
+        profiler.count('bytes_freed', result.bytes_freed)
+        profiler.count('errors', len(result.errors))
+        return result
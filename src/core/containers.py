@@ -0,0 +1,473 @@
+import json
+import os
+import queue
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from ..utils import profiler
+from .checkpoint import CHANGED_ERROR, matches
+
+CONTAINER_FORMATS = ('zip', 'tar.zst')
+CHUNK_SIZE = 1024 * 1024
+# ZIP timestamps cannot predate 1980-01-01
+ZIP_EPOCH = 315532800
+# Seconds between checks that the workers are still alive while the queue is full
+PUT_TIMEOUT = 0.5
+# Removed sources reported to on_removed at a time
+REMOVED_BATCH = 1000
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("tar.zst containers need the zstandard package (pip install zstandard)") from None
+    return zstandard
+
+def manifest_path(container: str) -> str:
+    """Sidecar manifest stored next to ``container``"""
+    return container + '.manifest.jsonl'
+
+def read_manifest(container: str) -> Iterator[Dict[str, Any]]:
+    """Yield the manifest records of ``container`` one at a time"""
+    with open(manifest_path(container)) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _open_source(source: str, size: int, mtime: float):
+    """
+    Open ``source`` for reading once it is confirmed to be the scanned file
+
+    A scan served from the index may hold stale stats, so the open file's
+    size and mtime are compared with the ones it was queued with.
+    """
+    fsrc = open(source, 'rb')
+    if not matches(os.fstat(fsrc.fileno()), size, mtime):
+        fsrc.close()
+        raise OSError(CHANGED_ERROR)
+    return fsrc
+
+def _copy_chunks(fsrc, write: Callable[[bytes], Any], size: int) -> int:
+    """Copy at most ``size`` bytes from ``fsrc`` and return how many were copied"""
+    copied = 0
+    while copied < size:
+        chunk = fsrc.read(min(CHUNK_SIZE, size - copied))
+        if not chunk:
+            break
+        write(chunk)
+        copied += len(chunk)
+    return copied
+
+class _ZipContainer:
+    extension = 'zip'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'x', compression=zipfile.ZIP_DEFLATED, compresslevel=6, allowZip64=True)
+
+    def add(self, source: str, arcname: str, size: int, mtime: float) -> Tuple[int, int]:
+        info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(mtime, ZIP_EPOCH))[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.file_size = size
+        with _open_source(source, size, mtime) as fsrc, \
+                self._zip.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as fdst:
+            copied = _copy_chunks(fsrc, fdst.write, size)
+        if copied != size:
+            raise OSError(f"file changed while archiving ({copied} of {size} bytes read)")
+        return info.header_offset, info.compress_size
+
+    def close(self) -> None:
+        self._zip.close()
+
+class _TarZstContainer:
+    """
+    A tar stream compressed as one zstd frame per member
+
+    Decompressing the whole file gives an ordinary tar archive, while the
+    frame offsets in the manifest let a single member be decompressed on
+    its own.
+    """
+    extension = 'tar.zst'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._compressor = _zstd().ZstdCompressor(level=3)
+        self._file = open(path, 'xb')
+
+    def _frame(self, write_member: Callable[[Callable[[bytes], Any]], None]) -> Tuple[int, int]:
+        offset = self._file.tell()
+        compressor = self._compressor.compressobj()
+        write_member(lambda data: self._file.write(compressor.compress(data)))
+        self._file.write(compressor.flush())
+        return offset, self._file.tell() - offset
+
+    def add(self, source: str, arcname: str, size: int, mtime: float) -> Tuple[int, int]:
+        info = tarfile.TarInfo(arcname)
+        info.size = size
+        info.mtime = int(mtime)
+        copied = 0
+
+        def write_member(write: Callable[[bytes], Any]) -> None:
+            nonlocal copied
+            write(info.tobuf(format=tarfile.PAX_FORMAT))
+            copied = _copy_chunks(fsrc, write, size)
+            # Keep the tar stream well-formed even if the file shrank
+            padding = (size - copied) + (-size % tarfile.BLOCKSIZE)
+            if padding:
+                write(tarfile.NUL * padding)
+
+        # Open the source before starting the frame, so an unreadable file
+        # leaves no partial member behind
+        with _open_source(source, size, mtime) as fsrc:
+            location = self._frame(write_member)
+        if copied != size:
+            raise OSError(f"file changed while archiving ({copied} of {size} bytes read)")
+        return location
+
+    def close(self) -> None:
+        self._frame(lambda write: write(tarfile.NUL * (2 * tarfile.BLOCKSIZE)))
+        self._file.close()
+
+_CONTAINER_TYPES = {'zip': _ZipContainer, 'tar.zst': _TarZstContainer}
+
+def extract_member(container: str, name: str, target_dir: str) -> str:
+    """
+    Extract one file from a container without decompressing the rest
+
+    Args:
+        container: Path of a .zip or .tar.zst container
+        name: Archived name as listed in the container's manifest
+        target_dir: Directory to extract into, keeping the archived folders
+
+    Returns:
+        Path of the extracted file
+    """
+    record = next((record for record in read_manifest(container) if record['name'] == name), None)
+    if record is None:
+        raise KeyError(f"{name} is not in {container}")
+
+    target = os.path.join(target_dir, *name.split('/'))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if container.endswith('.zip'):
+        with zipfile.ZipFile(container) as zf, zf.open(name) as fsrc, open(target, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+    else:
+        with open(container, 'rb') as f:
+            f.seek(record['offset'])
+            # The reader stops at the end of the member's frame
+            reader = _zstd().ZstdDecompressor().stream_reader(f, read_across_frames=False)
+            with tarfile.open(fileobj=reader, mode='r|') as tar:
+                member = tar.next()
+                fsrc = tar.extractfile(member)
+                with open(target, 'wb') as fdst:
+                    shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+    os.utime(target, (record['mtime'], record['mtime']))
+    return target
+
+class _OpenContainer:
+    """A container being written, with its manifest and the input added so far"""
+    __slots__ = ('container', 'manifest', 'files', 'size')
+
+    def __init__(self, container, manifest):
+        self.container = container
+        self.manifest = manifest
+        self.files = 0
+        self.size = 0
+
+@dataclass
+class ContainerResult:
+    """Outcome of archiving into containers"""
+    containers: List[str] = field(default_factory=list)
+    files: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def __len__(self) -> int:
+        return self.files
+
+class ContainerWriter:
+    """
+    Streams files into rolling compressed containers of bounded size
+
+    Worker threads pull files from a bounded queue and add each one to an
+    open container no other worker is writing to. Another container is
+    only opened when none is free and files are backing up in the queue,
+    so several containers are compressed at once (zlib and zstd release
+    the GIL) only when the input keeps the workers busy, and small runs
+    fill a single container. A container rolls over once the next file
+    would take its input past ``container_size`` bytes. Every container gets a
+    JSON-lines sidecar manifest; sources are removed only after their
+    container is closed, by reading them back from that manifest, so memory
+    stays flat however many files are archived.
+    """
+
+    def __init__(self, target_dir: str, container_format: str = 'zip',
+                 container_size: int = 1024 * 1024 * 1024, max_workers: int = 4,
+                 remove_sources: bool = True):
+        if container_format not in CONTAINER_FORMATS:
+            raise ValueError(f"Unknown container format: {container_format}")
+        if container_format == 'tar.zst':
+            _zstd()  # Fail before any file is read
+        self.target_dir = target_dir
+        self.container_type = _CONTAINER_TYPES[container_format]
+        self.container_size = container_size
+        self.max_workers = max_workers
+        self.remove_sources = remove_sources
+        self._prefix = time.strftime('dropclear-%Y%m%d-%H%M%S')
+        self._sequence = 0
+        self._lock = threading.Lock()
+        # Open containers no worker is writing to, and how many are open
+        self._available = threading.Condition()
+        self._idle: List[_OpenContainer] = []
+        self._open_count = 0
+        # Set once every file is queued; the sentinels are no backlog
+        self._draining = False
+
+    def _next_path(self) -> str:
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        return os.path.join(self.target_dir, f"{self._prefix}-{sequence:04d}.{self.container_type.extension}")
+
+    def _finish(self, container, manifest, result: ContainerResult, files: int, bytes_in: int,
+                on_removed: Optional[Callable[[List[Tuple[str, int]]], None]]) -> None:
+        """
+        Close a container and its manifest, then remove the archived sources
+
+        A container that cannot be closed is abandoned with its sources
+        left in place. Sources that were unlinked are passed to
+        ``on_removed`` as (source, size) pairs, at most REMOVED_BATCH at a time.
+        """
+        try:
+            container.close()
+            manifest.close()
+            bytes_out = os.path.getsize(container.path)
+        except Exception as e:
+            self._abandon(container, manifest, result, e)
+            return
+        with self._lock:
+            result.containers.append(container.path)
+            result.files += files
+            result.bytes_in += bytes_in
+            result.bytes_out += bytes_out
+        if not self.remove_sources:
+            return
+        removed: List[Tuple[str, int]] = []
+        try:
+            for record in read_manifest(container.path):
+                try:
+                    os.unlink(record['source'])
+                except OSError as e:
+                    with self._lock:
+                        result.errors.append((record['source'], str(e)))
+                    continue
+                removed.append((record['source'], record['size']))
+                if on_removed and len(removed) >= REMOVED_BATCH:
+                    on_removed(removed)
+                    removed = []
+        except (OSError, ValueError) as e:
+            with self._lock:
+                result.errors.append((manifest_path(container.path), str(e)))
+        if on_removed and removed:
+            on_removed(removed)
+
+    def _abandon(self, container, manifest, result: ContainerResult, error: Exception) -> None:
+        """
+        Give up on a container that could not be written or closed
+
+        Its sources were never removed, so the partial container and its
+        manifest are deleted and the failure is reported against it.
+        """
+        for handle in (manifest, container):
+            try:
+                handle.close()
+            except Exception:
+                pass
+        for leftover in (container.path, manifest_path(container.path)):
+            try:
+                os.unlink(leftover)
+            except OSError:
+                pass
+        with self._lock:
+            result.errors.append((container.path, str(error)))
+
+    def _open(self) -> Tuple[Any, Any]:
+        """A new container and its manifest; nothing is left behind if either fails to open"""
+        while True:
+            try:
+                # Containers are created exclusively; a name taken by an
+                # earlier run in the same second moves on to the next number
+                container = self.container_type(self._next_path())
+                break
+            except FileExistsError:
+                continue
+        try:
+            manifest = open(manifest_path(container.path), 'x')
+        except Exception:
+            try:
+                container.close()
+                os.unlink(container.path)
+            except Exception:
+                pass
+            raise
+        return container, manifest
+
+    def _acquire(self, pending: 'queue.Queue') -> Optional[_OpenContainer]:
+        """
+        Take a free open container, or return None once the caller may open a new one
+
+        A new container is allowed when none is open yet or when at least
+        ``max_workers`` files are waiting while the input is still being
+        queued; otherwise the worker waits for one of the open containers
+        to be released.
+        """
+        with self._available:
+            while not self._idle:
+                if not self._open_count or (not self._draining and pending.qsize() >= self.max_workers):
+                    self._open_count += 1
+                    return None
+                # The queue does not signal, so its backlog is re-checked
+                self._available.wait(PUT_TIMEOUT)
+            return self._idle.pop()
+
+    def _release(self, current: _OpenContainer) -> None:
+        with self._available:
+            self._idle.append(current)
+            self._available.notify()
+
+    def _retire(self) -> None:
+        """Give up the slot of a container that was closed, abandoned or never opened"""
+        with self._available:
+            self._open_count -= 1
+            self._available.notify()
+
+    def _work(self, files: 'queue.Queue', result: ContainerResult,
+              on_file: Optional[Callable[[str, str, int, Optional[Exception]], None]],
+              on_removed: Optional[Callable[[List[Tuple[str, int]]], None]]) -> None:
+        """
+        Archive queued files until the None sentinel arrives
+
+        Failures are contained to one file or one container: a container
+        that cannot be opened, written or closed is reported in
+        ``result.errors`` and the worker carries on with a fresh one, so
+        it never exits early and leaves the producer blocked. Containers
+        still open at the end are closed by write().
+        """
+        while True:
+            item = files.get()
+            if item is None:
+                break
+            source, arcname, size, mtime = item
+            current = self._acquire(files)
+            if current is not None and current.size and current.size + size > self.container_size:
+                # The new container takes over the slot of the full one
+                self._finish(current.container, current.manifest, result, current.files, current.size, on_removed)
+                current = None
+            if current is None:
+                try:
+                    current = _OpenContainer(*self._open())
+                except Exception as e:
+                    # A full or read-only target; the next file tries again
+                    self._retire()
+                    with self._lock:
+                        result.errors.append((source, str(e)))
+                    if on_file:
+                        on_file(source, arcname, size, e)
+                    continue
+
+            try:
+                offset, length = current.container.add(source, arcname, size, mtime)
+            except OSError as e:
+                self._release(current)
+                with self._lock:
+                    result.errors.append((source, str(e)))
+                if on_file:
+                    on_file(source, arcname, size, e)
+                continue
+            except Exception as e:
+                # The container may be left half-written; other workers
+                # waiting for it must not wait forever
+                self._abandon(current.container, current.manifest, result, e)
+                self._retire()
+                if on_file:
+                    on_file(source, arcname, size, e)
+                continue
+            try:
+                current.manifest.write(json.dumps({
+                    'name': arcname, 'source': source, 'size': size,
+                    'mtime': mtime, 'offset': offset, 'length': length,
+                }) + '\n')
+            except Exception as e:
+                self._abandon(current.container, current.manifest, result, e)
+                self._retire()
+                if on_file:
+                    on_file(source, arcname, size, e)
+                continue
+            current.files += 1
+            current.size += size
+            self._release(current)
+            if on_file:
+                on_file(source, arcname, size, None)
+
+    @staticmethod
+    def _put(pending: 'queue.Queue', item: Any, workers: List[threading.Thread]) -> bool:
+        """Queue ``item``, or return False once no worker is left to take it"""
+        while True:
+            try:
+                pending.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                if not any(worker.is_alive() for worker in workers):
+                    return False
+
+    @profiler.timed('write_containers')
+    def write(self, files: Iterable[Tuple[str, str, int, float]],
+              on_file: Optional[Callable[[str, str, int, Optional[Exception]], None]] = None,
+              on_removed: Optional[Callable[[List[Tuple[str, int]]], None]] = None) -> ContainerResult:
+        """
+        Archive every (source, arcname, size, mtime) tuple
+
+        Args:
+            files: Files to archive, consumed lazily
+            on_file: Called from worker threads as ``on_file(source, arcname, size, error)``
+                once a file is added to a container, or failed to be
+            on_removed: Called with batches of the (source, size) pairs
+                actually removed after their container was closed
+        """
+        os.makedirs(self.target_dir, exist_ok=True)
+        result = ContainerResult()
+        self._idle = []
+        self._open_count = 0
+        self._draining = False
+        started = time.perf_counter()
+        pending: 'queue.Queue' = queue.Queue(maxsize=self.max_workers * 4)
+        workers = [
+            threading.Thread(target=self._work, args=(pending, result, on_file, on_removed), daemon=True)
+            for _ in range(self.max_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for item in files:
+                if not self._put(pending, item, workers):
+                    raise RuntimeError("Every container worker stopped; archiving was aborted")
+        finally:
+            self._draining = True
+            for _ in workers:
+                if not self._put(pending, None, workers):
+                    break
+            for worker in workers:
+                worker.join()
+            for current in self._idle:
+                self._finish(current.container, current.manifest, result, current.files, current.size, on_removed)
+            self._idle = []
+        result.elapsed = time.perf_counter() - started
+        profiler.count('files_archived', result.files)
+        profiler.count('bytes_moved', result.bytes_in)
+        return result
@@ -0,0 +1,177 @@
+import hashlib
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from ..utils.file_utils import downloads_roots, get_file_info, walk_roots
+from ..utils.hash_cache import HashCache, FileKey
+from ..utils import profiler, reporter
+
+# Bytes hashed from each end of a file in the partial stage
+PARTIAL_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+# Files handed to a worker process per task
+HASH_BATCH_SIZE = 64
+
+def hash_file(path: str, size: int, full: bool) -> Optional[str]:
+    """
+    BLAKE2 digest of a file read through mmap
+
+    A partial hash covers the first and last 64 KiB; files small enough to
+    fit in those two windows are always hashed whole.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                if full or size <= 2 * PARTIAL_SIZE:
+                    for offset in range(0, len(view), HASH_CHUNK_SIZE):
+                        digest.update(view[offset:offset + HASH_CHUNK_SIZE])
+                else:
+                    digest.update(view[:PARTIAL_SIZE])
+                    digest.update(view[-PARTIAL_SIZE:])
+    except (OSError, ValueError):
+        return None
+    return digest.hexdigest()
+
+def _hash_batch(batch: List[Tuple[str, int, bool]]) -> List[Optional[str]]:
+    return [hash_file(path, size, full) for path, size, full in batch]
+
+class DuplicateFinder:
+    """Finds files with identical content using size buckets and tiered hashing"""
+
+    def __init__(self, config: Dict[str, Any], cache_file: Optional[str] = None,
+                 index_file: Optional[str] = None, max_workers: Optional[int] = None):
+        self.config = config
+        self.cache_file = cache_file
+        self.index_file = index_file
+        self.max_workers = max_workers
+
+    def _hash_all(self, executor: ProcessPoolExecutor, jobs: List[Tuple[str, int, bool]]) -> List[Optional[str]]:
+        batches = [jobs[i:i + HASH_BATCH_SIZE] for i in range(0, len(jobs), HASH_BATCH_SIZE)]
+        return [digest for digests in executor.map(_hash_batch, batches) for digest in digests]
+
+    @profiler.timed('hash_stage')
+    def _stage(self, executor: ProcessPoolExecutor, cache: Optional[HashCache],
+               files: List[Tuple[str, FileKey]], full: bool) -> Dict[str, str]:
+        """Hash ``files`` (partially or fully), serving what it can from the cache"""
+        digests = {}
+        jobs = []
+        job_keys = []
+        for path, key in files:
+            # Without an inode the key does not identify the file
+            cached = cache.get(key)[1 if full else 0] if cache and key[1] else None
+            if cached:
+                digests[path] = cached
+            else:
+                jobs.append((path, key[2], full))
+                job_keys.append(key)
+
+        computed = self._hash_all(executor, jobs) if jobs else []
+        fresh = []
+        for (path, _, _), key, digest in zip(jobs, job_keys, computed):
+            if digest is None:
+                continue  # Unreadable or vanished
+            digests[path] = digest
+            if key[1]:
+                fresh.append((key, digest))
+
+        if cache and fresh:
+            if full:
+                cache.put_full(fresh)
+            else:
+                cache.put_partial(fresh)
+        return digests
+
+    @profiler.timed('find_duplicates')
+    def find_duplicates(self) -> List[List[Dict[str, Any]]]:
+        """
+        Find groups of files with identical content in the downloads directory
+
+        Files are bucketed by size, then by a hash of their first and last
+        64 KiB, and only files that still collide are hashed in full. Each
+        group is ordered oldest first, and groups are ordered by the space
+        their redundant copies waste. Hidden files are skipped.
+        """
+        cache = HashCache(self.cache_file) if self.cache_file else None
+
+        try:
+            with reporter.task("[cyan]Bucketing files by size...") as task:
+
+                by_size: Dict[int, List[Tuple[str, os.stat_result, Path]]] = {}
+                for root, entry in walk_roots(downloads_roots(self.config), self.config['exclude_folders'],
+                                              self.index_file, max_workers=self.config.get('scan_workers', 4)):
+                    if entry.name.startswith('.'):
+                        continue  # Hidden files are never offered for cleaning
+                    try:
+                        stats = entry.stat()
+                    except OSError:
+                        continue
+                    if stats.st_size:
+                        by_size.setdefault(stats.st_size, []).append((entry.path, stats, root))
+                    task.advance()
+
+                # Only sizes shared by several files can hold duplicates
+                candidates: List[Tuple[str, FileKey]] = []
+                stats_by_path: Dict[str, os.stat_result] = {}
+                root_by_path: Dict[str, Path] = {}
+                for entries in by_size.values():
+                    if len(entries) < 2:
+                        continue
+                    seen_inodes = set()
+                    for path, stats, root in entries:
+                        if not stats.st_ino:
+                            # Cached entry stats may omit device and inode
+                            try:
+                                stats = os.stat(path)
+                            except OSError:
+                                continue
+                            profiler.count('stat_calls')
+                        if stats.st_ino and (stats.st_dev, stats.st_ino) in seen_inodes:
+                            continue  # Another hard link to a file already listed
+                        seen_inodes.add((stats.st_dev, stats.st_ino))
+                        stats_by_path[path] = stats
+                        root_by_path[path] = root
+                        candidates.append((path, (stats.st_dev, stats.st_ino, stats.st_size, stats.st_mtime_ns)))
+
+                groups: Dict[Tuple[int, str], List[str]] = {}
+                if candidates:
+                    with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                        task.describe("[cyan]Hashing file heads and tails...")
+                        partial = self._stage(executor, cache, candidates, full=False)
+
+                        buckets: Dict[Tuple[int, str], List[Tuple[str, FileKey]]] = {}
+                        for path, key in candidates:
+                            if path in partial:
+                                buckets.setdefault((key[2], partial[path]), []).append((path, key))
+
+                        # Small files were hashed whole in the partial stage
+                        needs_full = []
+                        for (size, digest), members in buckets.items():
+                            if len(members) < 2:
+                                continue
+                            if size <= 2 * PARTIAL_SIZE:
+                                groups[(size, digest)] = [path for path, _ in members]
+                            else:
+                                needs_full.extend(members)
+
+                        task.describe("[cyan]Hashing colliding files in full...")
+                        full = self._stage(executor, cache, needs_full, full=True)
+                        for path, key in needs_full:
+                            if path in full:
+                                groups.setdefault((key[2], full[path]), []).append(path)
+        finally:
+            if cache:
+                cache.close()
+
+        duplicates = []
+        for paths in groups.values():
+            if len(paths) < 2:
+                continue
+            infos = [get_file_info(Path(path), root_by_path[path], stats_by_path[path]) for path in paths]
+            infos.sort(key=lambda info: (stats_by_path[str(info['path'])].st_mtime, len(info['name'])))
+            duplicates.append(infos)
+
+        duplicates.sort(key=lambda infos: infos[0]['size'] * (len(infos) - 1), reverse=True)
+        return duplicates
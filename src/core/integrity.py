@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from ..utils import profiler
+
+MANIFEST_NAME = '.dropclear-manifest.jsonl'
+DIGEST_ALGORITHM = 'blake2b'
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+
+def new_digest():
+    return hashlib.blake2b(digest_size=32)
+
+def file_digest(path: str) -> str:
+    """BLAKE2b of a file's content, read through one reused buffer"""
+    digest = new_digest()
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+class ArchiveManifest:
+    """
+    Append-only record of the files moved into one archive folder
+
+    Each line holds a file's path relative to the archive folder, its size
+    and mtime after the move and, for copies, the digest computed while the
+    bytes streamed through. Later lines for the same path replace earlier
+    ones. Records are buffered and written by ``flush``.
+    """
+
+    def __init__(self, archive_path: str):
+        self.archive_path = os.fspath(archive_path)
+        self.path = os.path.join(self.archive_path, MANIFEST_NAME)
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def record(self, source: str, target: str, stats: os.stat_result, digest: Optional[str]) -> None:
+        """Queue the record of one moved file (safe to call from worker threads)"""
+        entry = {
+            'path': os.path.relpath(target, self.archive_path).replace(os.sep, '/'),
+            'source': source,
+            'size': stats.st_size,
+            'mtime_ns': stats.st_mtime_ns,
+            'digest': digest,
+            'algorithm': DIGEST_ALGORITHM if digest else None,
+            'time': time.time(),
+        }
+        with self._lock:
+            self._pending.append(entry)
+
+    def flush(self) -> None:
+        """Append the queued records and sync them to disk"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            os.makedirs(self.archive_path, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in pending)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """The latest record of every archived path"""
+        entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A line torn by a crash mid-append
+                    entries[entry['path']] = entry
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def rewrite(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Replace the manifest with ``entries``, one line per path"""
+        with self._lock:
+            temp = self.path + '.tmp'
+            with open(temp, 'w') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in entries)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self.path)
+
+def manifest_for(config: Dict[str, Any], archive_path: str) -> Optional[ArchiveManifest]:
+    """The manifest moves into ``archive_path`` record to, or None with archive_checksums off"""
+    if not config.get('archive_checksums', True):
+        return None
+    return ArchiveManifest(archive_path)
+
+@dataclass
+class VerifyResult:
+    """Outcome of checking an archive folder against its manifest"""
+    # Paths relative to the archive folder
+    verified: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    corrupt: List[Tuple[str, str]] = field(default_factory=list)
+    # Changed since archiving, with no digest to check them against
+    unverifiable: List[str] = field(default_factory=list)
+    bytes_read: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.corrupt
+
+def _check(archive_path: str, entry: Dict[str, Any], full: bool) -> Tuple[str, Optional[str], Optional[os.stat_result]]:
+    """
+    Check one manifest entry
+
+    Returns:
+        (status, detail, stats) with status one of 'skipped', 'verified',
+        'missing', 'corrupt', 'unverifiable' or 'hash mismatch'
+    """
+    path = os.path.join(archive_path, *entry['path'].split('/'))
+    try:
+        stats = os.stat(path)
+    except FileNotFoundError:
+        return 'missing', None, None
+    except OSError as e:
+        return 'corrupt', str(e), None
+    if stats.st_size != entry['size']:
+        return 'corrupt', f"size {stats.st_size} != {entry['size']} bytes", stats
+    if not full and stats.st_mtime_ns == entry['mtime_ns']:
+        return 'skipped', None, stats
+    if not entry.get('digest'):
+        return 'unverifiable', None, stats
+    try:
+        digest = file_digest(path)
+    except OSError as e:
+        return 'corrupt', str(e), stats
+    if digest != entry['digest']:
+        return 'hash mismatch', f"{DIGEST_ALGORITHM} mismatch", stats
+    return 'verified', None, stats
+
+@profiler.timed('verify_archive')
+def verify_archive(archive_path: str, full: bool = False, max_workers: int = 4) -> VerifyResult:
+    """
+    Re-check the files recorded in an archive folder's manifest
+
+    Files whose size and mtime still match their record are skipped
+    without being read, unless ``full`` is set. The rest are hashed in
+    parallel and compared with the recorded digest; files that check out
+    get their new mtime recorded, so the next run skips them.
+    """
+    manifest = ArchiveManifest(archive_path)
+    entries = manifest.entries()
+    result = VerifyResult()
+    started = time.perf_counter()
+    refreshed = False
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        checks = executor.map(lambda entry: _check(manifest.archive_path, entry, full), entries.values())
+        for entry, (status, detail, stats) in zip(list(entries.values()), checks):
+            if status in ('verified', 'hash mismatch'):
+                result.bytes_read += stats.st_size
+            if status == 'skipped':
+                result.skipped.append(entry['path'])
+            elif status == 'verified':
+                result.verified.append(entry['path'])
+                if stats.st_mtime_ns != entry['mtime_ns']:
+                    entry['mtime_ns'] = stats.st_mtime_ns
+                    refreshed = True
+            elif status == 'missing':
+                result.missing.append(entry['path'])
+            elif status in ('corrupt', 'hash mismatch'):
+                result.corrupt.append((entry['path'], detail))
+            else:
+                result.unverifiable.append(entry['path'])
+    if refreshed:
+        manifest.rewrite(entries.values())
+    result.elapsed = time.perf_counter() - started
+    profiler.count('bytes_verified', result.bytes_read)
+    return result
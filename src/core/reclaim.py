@@ -0,0 +1,198 @@
+import heapq
+import math
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from itertools import count
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from ..utils.file_utils import downloads_roots, iter_filter_files, root_of, scan_root_infos
+from ..utils.rules import RuleSet
+from ..utils import profiler
+
+BYTES_PER_MB = 1024 * 1024
+SECONDS_PER_DAY = 86400
+# Days of staleness that double a file's score
+STALENESS_DAYS = 30
+
+@dataclass
+class SpaceTarget:
+    """How much space to free on one volume"""
+    device: Optional[int]
+    # A downloads root on the volume, for messages
+    root: str
+    total: int
+    free: int
+    need: int
+
+@dataclass
+class ReclaimPlan:
+    """Files picked to meet the space targets, best first"""
+    targets: List[SpaceTarget]
+    files: List[Dict[str, Any]] = field(default_factory=list)
+    # Files the walk offered to the selection
+    considered: int = 0
+
+    @property
+    def need(self) -> int:
+        return sum(target.need for target in self.targets)
+
+    @property
+    def planned(self) -> int:
+        return sum(round(info['size'] * BYTES_PER_MB) for info in self.files)
+
+    @property
+    def shortfall(self) -> int:
+        """Bytes still missing after every selected file is gone"""
+        return max(0, self.need - self.planned)
+
+def space_targets(roots: Iterable[Union[str, Path]], reclaim: Optional[int] = None,
+                  min_free_percent: Optional[float] = None) -> List[SpaceTarget]:
+    """
+    Work out how much to free from ``shutil.disk_usage`` of the roots' volumes
+
+    Args:
+        reclaim: Bytes to free across all roots together
+        min_free_percent: Free space every root's volume should end up with
+    """
+    volumes: Dict[int, Tuple[str, Any]] = {}
+    for root in roots:
+        try:
+            volumes.setdefault(os.stat(root).st_dev, (os.fspath(root), shutil.disk_usage(root)))
+        except OSError:
+            continue
+    if reclaim is not None:
+        # One pool: any volume's files count towards the total
+        total = sum(usage.total for _, usage in volumes.values())
+        free = sum(usage.free for _, usage in volumes.values())
+        root = next(iter(volumes.values()))[0] if volumes else ''
+        return [SpaceTarget(None, root, total, free, max(0, reclaim))]
+
+    return [
+        SpaceTarget(device, root, usage.total, usage.free,
+                    max(0, math.ceil(usage.total * min_free_percent / 100) - usage.free))
+        for device, (root, usage) in volumes.items()
+    ]
+
+def reclaim_score(info: Dict[str, Any], now: float) -> float:
+    """
+    How much deleting a file helps, higher first
+
+    Size dominates so the target is met with few deletions; staleness
+    scales it, measured from the more recent of the last modification and
+    the last access, so files still being opened rank below forgotten ones.
+    """
+    last_used = max(info['modified'].timestamp(), info['last_access'].timestamp())
+    idle_days = max(0.0, (now - last_used) / SECONDS_PER_DAY)
+    return info['size'] * BYTES_PER_MB * (1 + idle_days / STALENESS_DAYS)
+
+class CandidateHeap:
+    """
+    Streaming selection of the best-scoring files that together cover ``need`` bytes
+
+    A min-heap on score holds the current selection. Each offered file is
+    pushed, then the lowest-scoring files are dropped for as long as the
+    rest still cover the target, so the heap is bounded by the target
+    rather than by the number of files walked.
+    """
+
+    def __init__(self, need: int):
+        self.need = need
+        self.bytes = 0
+        self._heap: List[Tuple[float, int, int, Dict[str, Any]]] = []
+        self._order = count()
+
+    @property
+    def covered(self) -> bool:
+        return self.bytes >= self.need
+
+    def offer(self, info: Dict[str, Any], score: float, size: int) -> None:
+        if self.need <= 0 or size <= 0:
+            return
+        # Once covered, a file scoring below the weakest pick cannot enter
+        if self.covered and score <= self._heap[0][0]:
+            return
+        heapq.heappush(self._heap, (score, next(self._order), size, info))
+        self.bytes += size
+        while self._heap and self.bytes - self._heap[0][2] >= self.need:
+            self.bytes -= heapq.heappop(self._heap)[2]
+
+    def selected(self) -> List[Dict[str, Any]]:
+        """The picked files, best first"""
+        return [info for *_, info in sorted(self._heap, reverse=True)]
+
+def _device_of(path: str) -> Optional[int]:
+    """Device of ``path``, or of its closest existing parent"""
+    path = os.path.abspath(path)
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+class SpaceReclaimer:
+    """Select the files to clean to reach a free-space target instead of fixed thresholds"""
+
+    def __init__(self, config: Dict[str, Any], index_file: Optional[str] = None):
+        self.config = config
+        self.index_file = index_file
+
+    def iter_candidates(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every file a rule would clean regardless of age and size
+
+        Rules with their own thresholds keep them; the global age and size
+        limits are what the space target replaces. Excluded folders and
+        extensions and hidden files are still never picked.
+        """
+        rules = RuleSet.from_config(self.config, 0, 0)
+        yield from iter_filter_files(rules.iter_actionable(scan_root_infos(
+            downloads_roots(self.config), self.config['exclude_folders'], self.index_file, rules,
+            self.config.get('scan_workers', 4)
+        )))
+
+    @profiler.timed('reclaim_plan')
+    def plan(self, reclaim: Optional[int] = None, min_free_percent: Optional[float] = None) -> ReclaimPlan:
+        """
+        Pick the fewest, stalest files whose removal meets the target
+
+        Args:
+            reclaim: Bytes to free
+            min_free_percent: Free space, in percent of each volume, to reach
+        """
+        if (reclaim is None) == (min_free_percent is None):
+            raise ValueError("Give exactly one of reclaim and min_free_percent")
+        roots = downloads_roots(self.config)
+        plan = ReclaimPlan(space_targets(roots, reclaim, min_free_percent))
+        heaps = {target.device: CandidateHeap(target.need) for target in plan.targets}
+        if not any(target.need for target in plan.targets):
+            return plan
+
+        root_devices = {os.fspath(root): _device_of(os.fspath(root)) for root in roots}
+        # Archiving frees space only when the archive is on another volume
+        archive_devices: Dict[str, Optional[int]] = {}
+        now = time.time()
+        for info in self.iter_candidates():
+            plan.considered += 1
+            device = root_devices.get(os.fspath(root_of(info['path'], roots)))
+            if info.get('action') == 'archive':
+                target = info['archive_to']
+                if target not in archive_devices:
+                    archive_devices[target] = _device_of(target)
+                if archive_devices[target] == device:
+                    continue
+            heap = heaps.get(None if reclaim is not None else device)
+            if heap is not None:
+                heap.offer(info, reclaim_score(info, now), round(info['size'] * BYTES_PER_MB))
+
+        plan.files = sorted(
+            (info for heap in heaps.values() for info in heap.selected()),
+            key=lambda info: reclaim_score(info, now),
+            reverse=True
+        )
+        profiler.count('reclaim_candidates', plan.considered)
+        return plan
@@ -1,50 +1,76 @@
+import os
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any
-from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn
-from rich.prompt import Confirm
-from ..utils.file_utils import get_file_info, scan_directory, filter_files
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Iterator, Optional, Union
+from ..utils.file_utils import RootScan, common_root, downloads_roots, get_file_info, iter_filter_files, scan_root_infos, walk_roots
+from ..utils.rules import RuleSet
+from ..utils.rollup import FolderRollup
+from ..utils.topk import TopK
+from ..utils import profiler, reporter
+
+if TYPE_CHECKING:
+    from ..utils.file_table import FileTable
+
+# Rankings for top-K queries: the key each file's stats rank it by, highest
+# first. Age and last access negate the timestamps, so the oldest rank first.
+TOP_ORDERS: Dict[str, Callable[[os.stat_result], float]] = {
+    'size': lambda stats: stats.st_size,
+    'age': lambda stats: -stats.st_mtime,
+    'access': lambda stats: -stats.st_atime,
+}
 
 class FileScanner:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], index_file: Optional[str] = None,
+                 rollup_file: Optional[str] = None):
         self.config = config
+        self.index_file = index_file
+        self.rollup_file = rollup_file
+        # Per-root timings and folder totals of the most recent scan
+        self.root_scans: List[RootScan] = []
+        self.rollup = FolderRollup(downloads_roots(config))
     
-    def scan_files(self, min_age: int = None, min_size: float = None, pattern: str = "", include_hidden: bool = False) -> List[Dict[str, Any]]:
+    def _save_rollup(self) -> None:
         """
-        Scan files recursively in downloads directory
+        Cache the folder totals once a walk has covered every folder
+        
+        Walks pruned by keep rules skip whole subtrees, so only unpruned
+        walks complete the rollup.
+        """
+        if self.rollup_file and self.rollup.complete:
+            self.rollup.save(self.rollup_file)
+    
+    def iter_files(self, min_age: int = None, min_size: float = None, pattern: str = "",
+                   include_hidden: bool = False, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield matching files as the recursive walk reaches them
+        
+        Nothing is materialized: each file flows from the walker through
+        get_file_info and the filters one at a time, so callers can render
+        matches as they arrive or stop early. A pattern is the exception:
+        the files passing the other filters are ranked through one trigram
+        index, so matches arrive once the walk has finished.
         
         Args:
             min_age: Minimum age of files in days
             min_size: Minimum size of files in MB
             pattern: Optional search pattern for fuzzy matching
             include_hidden: Whether to include hidden files
+            limit: Stop after this many matches
         """
-        downloads_path = Path(self.config['downloads_path'])
         min_age = min_age or self.config['max_age_days']
         min_size = min_size or self.config['min_size_mb']
+        rules = RuleSet.from_config(self.config, min_age, min_size)
         
-        # Create progress bar with spinner for scanning
-        with Progress(
-            SpinnerColumn(),
-            *Progress.get_default_columns(),
-            TimeElapsedColumn(),
-            transient=True
-        ) as progress:
-            scan_task = progress.add_task("[cyan]Scanning files...", total=None)
-            
-            # Scan directory recursively
-            files = scan_directory(downloads_path, progress)
-            
-            # Get file info for all files
-            file_infos = [
-                get_file_info(f, downloads_path) 
-                for f in files
-            ]
-            
-            # Update progress
-            progress.update(scan_task, total=len(file_infos))
-            
-            # Filter files based on criteria
-            matching_files = filter_files(
+        # Walk every root recursively, pruning excluded folders and building
+        # file info from the walker's cached stats
+        self.root_scans = []
+        self.rollup = FolderRollup(downloads_roots(self.config))
+        file_infos = self.rollup.observe(scan_root_infos(
+            downloads_roots(self.config), self.config['exclude_folders'], self.index_file, rules,
+            self.config.get('scan_workers', 4), self.root_scans
+        ), whole_tree=rules.is_default)
+        if rules.is_default:
+            matching_files = iter_filter_files(
                 file_infos,
                 min_age=min_age,
                 min_size=min_size,
@@ -53,19 +79,172 @@ class FileScanner:
                 exclude_folders=self.config['exclude_folders'],
                 include_hidden=include_hidden
             )
-            
-            progress.update(scan_task, completed=len(file_infos))
+        else:
+            # The rules decide on age, size and extension
+            matching_files = iter_filter_files(
+                rules.iter_actionable(file_infos),
+                pattern=pattern,
+                include_hidden=include_hidden
+            )
+        if limit is not None:
+            matching_files = islice(matching_files, limit)
+        yield from matching_files
+        self._save_rollup()
+    
+    @profiler.timed('scan_files')
+    def scan_files(self, min_age: int = None, min_size: float = None, pattern: str = "", include_hidden: bool = False) -> List[Dict[str, Any]]:
+        """
+        Scan files recursively in downloads directory
+        
+        Args:
+            min_age: Minimum age of files in days
+            min_size: Minimum size of files in MB
+            pattern: Optional search pattern for fuzzy matching
+            include_hidden: Whether to include hidden files
+        """
+        with reporter.task("[cyan]Scanning files...") as task:
+            matching_files = []
+            for file_info in self.iter_files(min_age, min_size, pattern, include_hidden):
+                matching_files.append(file_info)
+                task.advance()
         
         return matching_files
     
-    def group_files_by_folder(self, files: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    def scan_table(self, min_age: int = None, min_size: float = None, pattern: str = "", include_hidden: bool = False) -> 'FileTable':
+        """
+        Scan files into a columnar FileTable and filter them with vectorized masks
+        
+        Args:
+            min_age: Minimum age of files in days
+            min_size: Minimum size of files in MB
+            pattern: Optional search pattern for fuzzy matching
+            include_hidden: Whether to include hidden files
+        """
+        # numpy is only loaded by the table-based paths
+        from ..utils.file_table import FileTable
+        
+        roots = downloads_roots(self.config)
+        min_age = min_age or self.config['max_age_days']
+        min_size = min_size or self.config['min_size_mb']
+        rules = RuleSet.from_config(self.config, min_age, min_size)
+        
+        with reporter.task("[cyan]Scanning files..."):
+            self.root_scans = []
+            self.rollup = FolderRollup(roots)
+            tagged = self.rollup.observe_entries(walk_roots(
+                roots, self.config['exclude_folders'], self.index_file, rules,
+                self.config.get('scan_workers', 4), self.root_scans
+            ), whole_tree=rules.is_default)
+            if not rules.is_default:
+                with profiler.span('walk'):
+                    table = FileTable.from_entries(common_root(roots), rules.filter_entries(tagged))
+                self._save_rollup()
+                with profiler.span('filter'):
+                    return table.filter(pattern=pattern, include_hidden=include_hidden)
+            
+            with profiler.span('walk'):
+                table = FileTable.from_entries(common_root(roots), (entry for _, entry in tagged))
+            self._save_rollup()
+            with profiler.span('filter'):
+                return table.filter(
+                    min_age=min_age,
+                    min_size=min_size,
+                    pattern=pattern,
+                    exclude_extensions=self.config['exclude_extensions'],
+                    exclude_folders=self.config['exclude_folders'],
+                    include_hidden=include_hidden
+                )
+    
+    def _top_heaps(self, by: str, include_hidden: bool, heap_for: Callable[[str], TopK]) -> None:
+        """Stream the walk into the heap ``heap_for`` picks by folder"""
+        if by not in TOP_ORDERS:
+            raise ValueError(f"Unknown ranking {by!r}; use one of {', '.join(TOP_ORDERS)}")
+        key_of = TOP_ORDERS[by]
+        roots = downloads_roots(self.config)
+        self.root_scans = []
+        self.rollup = FolderRollup(roots)
+        with reporter.task("[cyan]Ranking files...") as task:
+            # Unpruned: rules do not apply, and the walk refreshes the rollup
+            for root, entry in self.rollup.observe_entries(walk_roots(
+                    roots, self.config['exclude_folders'], self.index_file, None,
+                    self.config.get('scan_workers', 4), self.root_scans)):
+                task.advance()
+                if not include_hidden and entry.name.startswith('.'):
+                    continue
+                stats = entry.stat()
+                key = key_of(stats)
+                heap = heap_for(os.path.dirname(entry.path))
+                # Only files that make the cut keep their path and stats
+                if heap.admits(key):
+                    heap.offer(key, (entry.path, root, stats))
+        self._save_rollup()
+    
+    @staticmethod
+    def _top_infos(heap: TopK) -> List[Dict[str, Any]]:
+        return [get_file_info(Path(path), root, stats) for path, root, stats in heap.items()]
+    
+    @profiler.timed('top_files')
+    def top_files(self, limit: int = 50, by: str = 'size', include_hidden: bool = False) -> List[Dict[str, Any]]:
+        """
+        The ``limit`` largest, oldest or least recently accessed files, best first
+        
+        The walk is streamed through a heap of ``limit`` entries, so memory
+        stays constant however many files the downloads folder holds, and
+        file information is built only for the files returned.
+        
+        Args:
+            limit: Number of files to return
+            by: 'size', 'age' (by modification time) or 'access' (by last access)
+            include_hidden: Whether to include hidden files
+        """
+        heap = TopK(limit)
+        self._top_heaps(by, include_hidden, lambda folder: heap)
+        return self._top_infos(heap)
+    
+    @profiler.timed('top_files')
+    def top_files_by_folder(self, limit: int = 10, by: str = 'size',
+                            include_hidden: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        The ``limit`` top files of every folder, as top_files ranks them
+        
+        Memory grows with the number of folders times ``limit``, not with
+        the number of files.
+        
+        Returns:
+            Folder path -> its top files, best first, with folders sorted by path
+        """
+        heaps: Dict[str, TopK] = {}
+        
+        def heap_for(folder: str) -> TopK:
+            heap = heaps.get(folder)
+            if heap is None:
+                heap = heaps[folder] = TopK(limit)
+            return heap
+        
+        self._top_heaps(by, include_hidden, heap_for)
+        return {folder: self._top_infos(heaps[folder]) for folder in sorted(heaps) if len(heaps[folder])}
+    
+    @profiler.timed('build_rollup')
+    def build_rollup(self) -> FolderRollup:
+        """
+        Walk every root just to total up folder sizes, and cache the result
+        
+        Keep rules do not prune this walk, so kept folders are counted too.
+        """
+        roots = downloads_roots(self.config)
+        self.root_scans = []
+        self.rollup = FolderRollup(roots)
+        for _ in self.rollup.observe_entries(walk_roots(
+                roots, self.config['exclude_folders'], self.index_file, None,
+                self.config.get('scan_workers', 4), self.root_scans)):
+            pass
+        self._save_rollup()
+        return self.rollup
+    
+    def group_files_by_folder(self, files: Union['FileTable', List[Dict[str, Any]]]) -> Dict[str, 'FileTable']:
         """Group files by their parent folder"""
-        grouped = {}
-        for file in files:
-            parent = str(file['relative_path'].parent)
-            if parent == '.':
-                parent = 'Root'
-            if parent not in grouped:
-                grouped[parent] = []
-            grouped[parent].append(file)
-        return grouped 
\ No newline at end of file
+        from ..utils.file_table import FileTable
+        
+        if not isinstance(files, FileTable):
+            files = FileTable.from_infos(common_root(downloads_roots(self.config)), files)
+        return files.group_by_folder() 
\ No newline at end of file
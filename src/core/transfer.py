@@ -0,0 +1,238 @@
+import errno
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Set, Tuple
+from ..utils import profiler
+
+if TYPE_CHECKING:
+    from .integrity import ArchiveManifest
+
+# Copy in large chunks; cross-device moves are dominated by I/O round trips
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+# Verified copies whose manifest records are synced before their sources go
+RELEASE_BATCH = 64
+
+def _copy_range(source_fd: int, target_fd: int, size: int) -> None:
+    """Copy ``size`` bytes between descriptors inside the kernel when possible"""
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        while copied < size:
+            count = os.copy_file_range(source_fd, target_fd, min(COPY_BUFFER_SIZE, size - copied))
+            if count == 0:
+                break
+            copied += count
+    elif hasattr(os, 'sendfile'):
+        while copied < size:
+            count = os.sendfile(target_fd, source_fd, copied, min(COPY_BUFFER_SIZE, size - copied))
+            if count == 0:
+                break
+            copied += count
+    else:
+        raise OSError(errno.ENOTSUP, "no kernel copy available")
+    if copied != size:
+        raise OSError(errno.EIO, f"copied {copied} of {size} bytes")
+
+def _copy_hashed(fsrc, fdst) -> str:
+    """Copy through one reused buffer, hashing each chunk on its way to the target"""
+    from .integrity import new_digest
+
+    digest = new_digest()
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    while True:
+        count = fsrc.readinto(buffer)
+        if not count:
+            break
+        chunk = view[:count]
+        digest.update(chunk)
+        fdst.write(chunk)
+    return digest.hexdigest()
+
+def copy_file(source: str, target: str, size: int, checksum: bool = False) -> Tuple[Optional[str], os.stat_result]:
+    """
+    Copy a file with metadata and confirm the target matches ``size`` and mtime
+
+    Uses copy_file_range or sendfile where the platform has them and falls
+    back to buffered reads and writes otherwise. With ``checksum``, the
+    bytes are read into userspace once and hashed as they are written, so
+    the digest costs no second read.
+
+    A copy that fails or does not verify leaves no partial target behind.
+    An existing ``target`` is never overwritten: the copy fails with
+    FileExistsError instead.
+
+    Returns:
+        (digest of the copied bytes or None, the target's stat)
+    """
+    digest = None
+    with open(source, 'rb', buffering=0 if checksum else -1) as fsrc:
+        fdst = open(target, 'xb')
+        try:
+            with fdst:
+                if checksum:
+                    digest = _copy_hashed(fsrc, fdst)
+                else:
+                    try:
+                        _copy_range(fsrc.fileno(), fdst.fileno(), size)
+                    except OSError:
+                        # Start over with a plain buffered copy
+                        fsrc.seek(0)
+                        fdst.seek(0)
+                        fdst.truncate()
+                        shutil.copyfileobj(fsrc, fdst, COPY_BUFFER_SIZE)
+            shutil.copystat(source, target)
+
+            stats = os.stat(target)
+            if stats.st_size != size:
+                raise OSError(errno.EIO, f"size mismatch after copy ({stats.st_size} != {size} bytes)")
+            # Filesystems such as FAT store mtimes in 2 second steps
+            if abs(stats.st_mtime - os.stat(source).st_mtime) > 2:
+                raise OSError(errno.EIO, "modification time was not preserved by the copy")
+        except BaseException:
+            try:
+                os.unlink(target)
+            except OSError:
+                pass
+            raise
+    return digest, stats
+
+class TransferEngine:
+    """
+    Moves files into a target tree
+
+    Same-device moves are single renames; cross-device moves are copied,
+    verified and only then removed from the source, several at a time.
+    Target directories are created once and remembered. Given a manifest,
+    copies are checksummed while they stream and every move is recorded;
+    a copied source is removed only once its record has been synced to
+    disk, in batches of RELEASE_BATCH. A move whose target already exists
+    fails with FileExistsError, leaving both files as they are.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._created_dirs: Set[str] = set()
+
+    def ensure_dir(self, path: str) -> None:
+        """Create ``path`` and its parents unless already created by this engine"""
+        if path in self._created_dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        self._created_dirs.add(path)
+
+    def _prepare(self, target: str) -> None:
+        self.ensure_dir(os.path.dirname(target))
+
+    def rename(self, source: str, target: str, manifest: Optional['ArchiveManifest'] = None) -> None:
+        self._prepare(target)
+        # os.rename would silently replace an archived file of the same name
+        if os.path.lexists(target):
+            raise FileExistsError(errno.EEXIST, "already exists in the archive", target)
+        os.rename(source, target)
+        if manifest is not None:
+            # A rename moves no bytes, so there is nothing to hash
+            manifest.record(source, target, os.stat(target), None)
+
+    @profiler.timed('copy_file')
+    def copy(self, source: str, target: str, size: int, manifest: Optional['ArchiveManifest'] = None,
+             remove_source: bool = True) -> None:
+        """
+        Copy and verify one file, then remove the source unless ``remove_source`` is False
+
+        Without a manifest flush between them, a crash after the unlink
+        would lose the file's only record; ``transfer`` therefore removes
+        manifest-recorded sources itself, after flushing.
+        """
+        self._prepare(target)
+        digest, stats = copy_file(source, target, size, checksum=manifest is not None)
+        if manifest is not None:
+            manifest.record(source, target, stats, digest)
+        if remove_source:
+            os.unlink(source)
+
+    @staticmethod
+    def _release(copied: List[Tuple[str, str, int]], manifest: 'ArchiveManifest',
+                 on_done: Callable[[str, str, int, Optional[Exception]], None]) -> None:
+        """Sync the manifest, then remove the sources of the verified copies"""
+        try:
+            manifest.flush()
+        except OSError as e:
+            # The copies stay unrecorded, so their targets are not kept
+            for source, target, size in copied:
+                try:
+                    os.unlink(target)
+                except OSError:
+                    pass
+                on_done(source, target, size, e)
+            return
+        for source, target, size in copied:
+            try:
+                os.unlink(source)
+            except OSError as e:
+                on_done(source, target, size, e)
+                continue
+            on_done(source, target, size, None)
+
+    def transfer(self, moves: Iterable[Tuple[str, str, int]], same_device: bool,
+                 on_done: Callable[[str, str, int, Optional[Exception]], None],
+                 manifest: Optional['ArchiveManifest'] = None) -> None:
+        """
+        Move every (source, target, size) triple
+
+        Args:
+            moves: Source path, target path and size captured before the move
+            same_device: Whether source and target trees share a device
+            on_done: Called from the calling thread as
+                ``on_done(source, target, size, error)`` after each move
+            manifest: Records each completed move, flushed before returning
+        """
+        try:
+            self._transfer(moves, same_device, on_done, manifest)
+        finally:
+            if manifest is not None:
+                manifest.flush()
+
+    def _transfer(self, moves: Iterable[Tuple[str, str, int]], same_device: bool,
+                  on_done: Callable[[str, str, int, Optional[Exception]], None],
+                  manifest: Optional['ArchiveManifest']) -> None:
+        cross_device = []
+        for source, target, size in moves:
+            if not same_device:
+                cross_device.append((source, target, size))
+                continue
+            try:
+                self.rename(source, target, manifest)
+            except OSError as e:
+                if e.errno == errno.EXDEV:
+                    # A nested mount inside the source tree
+                    cross_device.append((source, target, size))
+                    continue
+                on_done(source, target, size, e)
+                continue
+            on_done(source, target, size, None)
+
+        if not cross_device:
+            return
+
+        # Copies whose source waits for their manifest record to be synced
+        copied: List[Tuple[str, str, int]] = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.copy, source, target, size, manifest, manifest is None): (source, target, size)
+                for source, target, size in cross_device
+            }
+            try:
+                for future in as_completed(futures):
+                    source, target, size = futures[future]
+                    error = future.exception()
+                    if error is not None or manifest is None:
+                        on_done(source, target, size, error)
+                        continue
+                    copied.append((source, target, size))
+                    if len(copied) >= RELEASE_BATCH:
+                        batch, copied = copied, []
+                        self._release(batch, manifest, on_done)
+            finally:
+                if copied:
+                    self._release(copied, manifest, on_done)
@@ -0,0 +1,348 @@
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from ..utils.file_utils import TRASH_DIR_NAME
+from ..utils import profiler
+from .checkpoint import CHANGED_ERROR, matches
+from .cleaner import CleanResult
+
+JOURNAL_NAME = 'journal.jsonl'
+# Move records are synced to the journal before each chunk of renames
+STAGE_CHUNK = 256
+SECONDS_PER_DAY = 86400
+
+# Batch states, in the order a batch passes through them
+STAGING, STAGED, PURGING, PURGED, RESTORING, RESTORED = (
+    'staging', 'staged', 'purging', 'purged', 'restoring', 'restored'
+)
+_STATE_AFTER = {
+    'begin': STAGING, 'commit': STAGED,
+    'purge': PURGING, 'purged': PURGED,
+    'restore': RESTORING, 'restored': RESTORED,
+}
+FINISHED = (PURGED, RESTORED)
+
+@dataclass
+class TrashBatch:
+    """One clean run's files as recorded in the journals"""
+    batch_id: str
+    created: float
+    state: str
+    # (original path, staged path, size in bytes)
+    files: List[Tuple[str, str, int]] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return sum(size for _, _, size in self.files)
+
+@dataclass
+class TrashResult:
+    """Outcome of restoring or purging a batch"""
+    batch_id: str
+    files: List[str] = field(default_factory=list)
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+    bytes: int = 0
+
+class _Journal:
+    """
+    Append-only journal of the batches staged in one staging directory
+
+    Each line is a JSON record; replaying them in order gives every batch's
+    state and files. Appends are flushed and fsynced before the operation
+    they announce, so a crash never leaves a staged file the journal does not
+    know about.
+    """
+
+    def __init__(self, staging_dir: str):
+        self.staging_dir = staging_dir
+        self.path = os.path.join(staging_dir, JOURNAL_NAME)
+        self._lock = threading.Lock()
+
+    def append(self, records: Iterable[Dict]) -> None:
+        lines = ''.join(json.dumps(record) + '\n' for record in records).encode()
+        with self._lock:
+            os.makedirs(self.staging_dir, exist_ok=True)
+            with open(self.path, 'ab+') as f:
+                # Start past a line torn by a crash mid-append
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        lines = b'\n' + lines
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read(self) -> List[str]:
+        try:
+            with open(self.path) as f:
+                return f.readlines()
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _parse(lines: Iterable[str]) -> Dict[str, TrashBatch]:
+        batches: Dict[str, TrashBatch] = {}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line torn by a crash mid-append
+            op, batch_id = record.get('op'), record.get('batch')
+            if op == 'begin':
+                batches[batch_id] = TrashBatch(batch_id, record['time'], STAGING)
+                continue
+            batch = batches.get(batch_id)
+            if batch is None:
+                continue
+            if op == 'move':
+                batch.files.append((record['source'], record['staged'], record['size']))
+            elif op in _STATE_AFTER:
+                batch.state = _STATE_AFTER[op]
+        return batches
+
+    def replay(self) -> Dict[str, TrashBatch]:
+        with self._lock:
+            lines = self._read()
+        return self._parse(lines)
+
+    def compact(self) -> None:
+        """Drop finished batches' records, removing the journal once none are left"""
+        with self._lock:
+            lines = self._read()
+            finished = {batch_id for batch_id, batch in self._parse(lines).items() if batch.state in FINISHED}
+            if not finished:
+                return
+            kept = []
+            for line in lines:
+                try:
+                    if json.loads(line).get('batch') in finished:
+                        continue
+                except ValueError:
+                    continue
+                kept.append(line)
+            if not kept:
+                os.unlink(self.path)
+                return
+            temp = self.path + '.tmp'
+            with open(temp, 'w') as f:
+                f.writelines(kept)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self.path)
+
+class TrashStore:
+    """
+    Same-device trash for cleaned files
+
+    Cleaning moves each file with a single rename into a hidden
+    ``.dropclear-trash`` directory under the first downloads root on the
+    file's device, and records the batch in that directory's journal.
+    Purging deletes expired batches for real, restoring renames a batch
+    back. Batches a crash interrupted are settled from the journals when
+    the store is opened.
+    """
+
+    def __init__(self, roots: Iterable[Union[str, Path]]):
+        self.staging_dirs: Dict[int, str] = {}
+        for root in roots:
+            try:
+                device = os.stat(root).st_dev
+            except OSError:
+                continue
+            self.staging_dirs.setdefault(device, os.path.join(os.fspath(root), TRASH_DIR_NAME))
+        self.journals = {device: _Journal(staging_dir) for device, staging_dir in self.staging_dirs.items()}
+        self.recover()
+
+    @staticmethod
+    def new_batch_id() -> str:
+        return time.strftime('%Y%m%d-%H%M%S-') + os.urandom(2).hex()
+
+    def batches(self) -> List[TrashBatch]:
+        """Every batch still in the trash, oldest first, merged across devices"""
+        merged: Dict[str, TrashBatch] = {}
+        for journal in self.journals.values():
+            for batch in journal.replay().values():
+                if batch.state in FINISHED:
+                    continue
+                existing = merged.get(batch.batch_id)
+                if existing is None:
+                    merged[batch.batch_id] = batch
+                else:
+                    existing.files.extend(batch.files)
+                    existing.created = min(existing.created, batch.created)
+        return sorted(merged.values(), key=lambda batch: batch.created)
+
+    def recover(self) -> None:
+        """Settle batches left behind by an interrupted run"""
+        for journal in self.journals.values():
+            for batch in journal.replay().values():
+                if batch.state == STAGING:
+                    # Files whose rename never happened are still in place;
+                    # the rest are in the trash and stay restorable
+                    journal.append([{'op': 'commit', 'batch': batch.batch_id, 'recovered': True}])
+                elif batch.state == RESTORING:
+                    self._restore_in(journal, batch)
+        # Interrupted purges are finished by the next purge pass
+
+    @profiler.timed('trash_stage')
+    def stage(self, files: Iterable[Tuple[str, int, float]]) -> CleanResult:
+        """
+        Move (path, size, mtime) files into the trash as one batch
+
+        The result lists the staged files as deleted; their space is freed
+        when the batch is purged. Files whose size or mtime no longer match
+        are left in place and listed as changed.
+        """
+        batch_id = self.new_batch_id()
+        result = CleanResult(trash_batch=batch_id)
+        started = time.perf_counter()
+        by_device: Dict[int, List[Tuple[str, int]]] = {}
+        for path, size, mtime in files:
+            try:
+                stats = os.lstat(path)
+            except OSError as e:
+                result.errors.append((path, str(e)))
+                continue
+            device = stats.st_dev
+            if not matches(stats, size, mtime):
+                result.errors.append((path, CHANGED_ERROR))
+                result.changed.append(path)
+                continue
+            if device not in self.journals:
+                result.errors.append((path, "no trash on this device; not a downloads root's device"))
+                continue
+            by_device.setdefault(device, []).append((path, size))
+
+        for device, device_files in by_device.items():
+            journal = self.journals[device]
+            batch_dir = os.path.join(journal.staging_dir, batch_id)
+            os.makedirs(batch_dir, exist_ok=True)
+            journal.append([{'op': 'begin', 'batch': batch_id, 'time': time.time()}])
+            for start in range(0, len(device_files), STAGE_CHUNK):
+                chunk = [
+                    (path, os.path.join(batch_dir, f"{start + i}-{os.path.basename(path)}"), size)
+                    for i, (path, size) in enumerate(device_files[start:start + STAGE_CHUNK])
+                ]
+                journal.append(
+                    {'op': 'move', 'batch': batch_id, 'source': path, 'staged': staged, 'size': size}
+                    for path, staged, size in chunk
+                )
+                for path, staged, size in chunk:
+                    try:
+                        os.rename(path, staged)
+                    except OSError as e:
+                        result.errors.append((path, str(e)))
+                        continue
+                    result.deleted.append(path)
+                    result.bytes_freed += size
+            journal.append([{'op': 'commit', 'batch': batch_id, 'time': time.time()}])
+
+        result.elapsed = time.perf_counter() - started
+        profiler.count('files_trashed', len(result.deleted))
+        return result
+
+    def _restore_in(self, journal: _Journal, batch: TrashBatch, result: Optional[TrashResult] = None) -> TrashResult:
+        result = result or TrashResult(batch.batch_id)
+        errors = len(result.errors)
+        journal.append([{'op': 'restore', 'batch': batch.batch_id}])
+        for source, staged, size in batch.files:
+            if not os.path.lexists(staged):
+                continue  # Never moved, or already restored
+            if os.path.lexists(source):
+                result.errors.append((source, "a file with this name already exists"))
+                continue
+            try:
+                os.makedirs(os.path.dirname(source), exist_ok=True)
+                os.rename(staged, source)
+            except OSError as e:
+                result.errors.append((source, str(e)))
+                continue
+            result.files.append(source)
+            result.bytes += size
+        # With conflicts the batch stays in the trash so it can be retried
+        if len(result.errors) == errors:
+            journal.append([{'op': 'restored', 'batch': batch.batch_id}])
+            shutil.rmtree(os.path.join(journal.staging_dir, batch.batch_id), ignore_errors=True)
+            journal.compact()
+        return result
+
+    @profiler.timed('trash_restore')
+    def restore(self, batch_id: str) -> TrashResult:
+        """Rename every file of a batch back to where it was cleaned from"""
+        result = TrashResult(batch_id)
+        found = False
+        for journal in self.journals.values():
+            batch = journal.replay().get(batch_id)
+            if batch is None or batch.state in FINISHED:
+                continue
+            if batch.state == PURGING:
+                raise ValueError(f"Batch {batch_id} is being purged and cannot be restored")
+            found = True
+            self._restore_in(journal, batch, result)
+        if not found:
+            raise ValueError(f"No batch {batch_id} in the trash")
+        return result
+
+    def _purge_in(self, journal: _Journal, batch: TrashBatch) -> TrashResult:
+        result = TrashResult(batch.batch_id)
+        journal.append([{'op': 'purge', 'batch': batch.batch_id}])
+        for source, staged, size in batch.files:
+            try:
+                os.unlink(staged)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                result.errors.append((source, str(e)))
+                continue
+            result.files.append(source)
+            result.bytes += size
+        shutil.rmtree(os.path.join(journal.staging_dir, batch.batch_id), ignore_errors=True)
+        journal.append([{'op': 'purged', 'batch': batch.batch_id}])
+        journal.compact()
+        return result
+
+    @profiler.timed('trash_purge')
+    def purge(self, older_than_days: Optional[float] = None, batch_id: Optional[str] = None) -> List[TrashResult]:
+        """
+        Delete staged files for good
+
+        Args:
+            older_than_days: Only purge batches staged at least this long ago
+                (all batches when None); interrupted purges always finish
+            batch_id: Only purge this batch
+        """
+        cutoff = None if older_than_days is None else time.time() - older_than_days * SECONDS_PER_DAY
+        results = []
+        for journal in self.journals.values():
+            for batch in journal.replay().values():
+                if batch.state not in (STAGED, PURGING):
+                    continue
+                if batch_id is not None and batch.batch_id != batch_id:
+                    continue
+                if batch.state == STAGED and cutoff is not None and batch.created > cutoff:
+                    continue
+                results.append(self._purge_in(journal, batch))
+        profiler.count('bytes_freed', sum(result.bytes for result in results))
+        return results
+
+    def start_background_purge(self, older_than_days: float) -> threading.Thread:
+        """Purge expired batches from a low-priority daemon thread"""
+        def run() -> None:
+            try:
+                # Linux schedules threads individually, so this only lowers
+                # the purge thread's priority
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+            except (AttributeError, OSError):
+                pass
+            try:
+                self.purge(older_than_days)
+            except OSError:
+                pass  # Retried by the next pass
+        thread = threading.Thread(target=run, name='trash_purge', daemon=True)
+        thread.start()
+        return thread
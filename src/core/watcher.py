@@ -0,0 +1,337 @@
+import ctypes
+import ctypes.util
+import errno
+import heapq
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple
+from rich.console import Console
+from ..utils.file_utils import downloads_roots, get_file_info, root_labels, root_of, shares_device, walk_directory, TRASH_DIR_NAME
+from .cleaner import FileCleaner
+from .transfer import TransferEngine
+from .integrity import manifest_for
+
+console = Console()
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+    IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct('iIII')
+SECONDS_PER_DAY = 86400
+
+class Inotify:
+    """Minimal ctypes binding to Linux inotify"""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.paths: Dict[int, str] = {}
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.paths[wd] = path
+        return wd
+
+    def read_events(self, timeout: float) -> List[Tuple[str, int]]:
+        """Wait up to ``timeout`` seconds and return (path, mask) pairs"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append(('', mask))
+                continue
+            directory = self.paths.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.paths[wd]
+                continue
+            events.append((os.path.join(directory, name) if name else directory, mask))
+        return events
+
+class FolderWatcher:
+    """
+    Long-running watch mode that enforces the cleaning policy incrementally
+
+    The file set is kept current from inotify events, and each policy pass
+    only looks at files that changed since the last pass or whose age has
+    just crossed ``max_age_days``. When inotify is unavailable or runs out
+    of watches, every pass walks the roots again and compares the result
+    with the previous walk, so only new or modified files count as changed.
+    An overflowing event queue triggers one full rescan.
+    """
+
+    ACTIONS = ('report', 'clean', 'archive')
+
+    def __init__(self, config: Dict[str, Any], action: str = 'report', interval: float = 60):
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unknown watch action: {action}")
+        self.config = config
+        self.action = action
+        self.interval = interval
+        self.roots = downloads_roots(config)
+        self.labels = root_labels(self.roots)
+        self.files: Dict[str, os.stat_result] = {}
+        self.changed: Set[str] = set()
+        # (size, mtime_ns) of every file at the previous walk, when polling
+        self.snapshot: Dict[str, Tuple[int, int]] = {}
+        # (time the file becomes old enough, path, mtime it was queued for)
+        self.pending: List[Tuple[float, str, float]] = []
+        self.inotify: Optional[Inotify] = None
+        self.use_inotify = True
+        self.cleaner = FileCleaner(config)
+        self.transfer = TransferEngine(max_workers=config.get('archive_workers', 4))
+
+    def _excluded(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return name in self.config['exclude_folders'] or name == TRASH_DIR_NAME
+
+    def _watch_tree(self, directory: str) -> None:
+        """Watch ``directory`` and every non-excluded folder beneath it"""
+        if self.inotify is None:
+            return
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                self.inotify.add_watch(current)
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False) and not self._excluded(entry.path):
+                            stack.append(entry.path)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    console.print("[yellow]Out of inotify watches; falling back to periodic rescans[/yellow]")
+                    self.inotify.close()
+                    self.inotify = None
+                    self.use_inotify = False
+                    return
+
+    def _track(self, path: str) -> None:
+        try:
+            stats = os.stat(path)
+        except OSError:
+            self._forget(path)
+            return
+        self.files[path] = stats
+        self.changed.add(path)
+
+    def _forget(self, path: str) -> None:
+        self.files.pop(path, None)
+        self.changed.discard(path)
+
+    def _forget_tree(self, directory: str) -> None:
+        prefix = os.path.join(directory, '')
+        for path in [path for path in self.files if path.startswith(prefix)]:
+            self._forget(path)
+
+    def _scan_tree(self, directory: str) -> None:
+        for entry in walk_directory(Path(directory), self.config['exclude_folders']):
+            try:
+                self.files[entry.path] = entry.stat()
+            except OSError:
+                continue
+            self.changed.add(entry.path)
+
+    def full_rescan(self) -> None:
+        """Rebuild the file set and watches from scratch"""
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+        if self.use_inotify:
+            try:
+                self.inotify = Inotify()
+            except OSError:
+                self.use_inotify = False
+        self.files.clear()
+        self.changed.clear()
+        self.pending.clear()
+        for root in self.roots:
+            self._watch_tree(str(root))
+            self._scan_tree(str(root))
+        # Without inotify, the next poll compares against this walk
+        self.snapshot = {
+            path: (stats.st_size, stats.st_mtime_ns) for path, stats in self.files.items()
+        } if self.inotify is None else {}
+
+    def poll(self) -> None:
+        """
+        Walk every root again, marking only new or modified files as changed
+
+        Used in place of events when inotify is unavailable. Unchanged
+        files keep their place in the age queue, so a file is reported
+        once rather than on every pass.
+        """
+        previous, self.snapshot = self.snapshot, {}
+        self.files.clear()
+        for root in self.roots:
+            for entry in walk_directory(Path(root), self.config['exclude_folders']):
+                try:
+                    stats = entry.stat()
+                except OSError:
+                    continue
+                self.files[entry.path] = stats
+                signature = (stats.st_size, stats.st_mtime_ns)
+                self.snapshot[entry.path] = signature
+                if previous.get(entry.path) != signature:
+                    self.changed.add(entry.path)
+
+    def apply_events(self, events: List[Tuple[str, int]]) -> None:
+        for path, mask in events:
+            if mask & IN_Q_OVERFLOW:
+                console.print("[yellow]Event queue overflowed; rescanning[/yellow]")
+                self.full_rescan()
+                return
+            if mask & IN_ISDIR:
+                if self._excluded(path):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                    self._scan_tree(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._forget_tree(path)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if path in {str(root) for root in self.roots}:
+                    self.full_rescan()
+                    return
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                self._forget(path)
+            else:
+                self._track(path)
+
+    def _is_candidate(self, stats: os.stat_result, path: str) -> bool:
+        name = os.path.basename(path)
+        extension = Path(name).suffix.lower()[1:]
+        # Hidden files are never cleaned, as in a scan
+        return (not name.startswith('.') and
+                stats.st_size / (1024 * 1024) >= self.config['min_size_mb'] and
+                extension not in self.config['exclude_extensions'])
+
+    def due_files(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Files that changed or crossed the age threshold and now match the policy"""
+        now = time.time() if now is None else now
+        max_age = self.config['max_age_days'] * SECONDS_PER_DAY
+        due = {}
+
+        for path in self.changed:
+            stats = self.files.get(path)
+            if stats is None or not self._is_candidate(stats, path):
+                continue
+            ripe_at = stats.st_mtime + max_age
+            if ripe_at <= now:
+                due[path] = stats
+            else:
+                heapq.heappush(self.pending, (ripe_at, path, stats.st_mtime))
+        self.changed.clear()
+
+        while self.pending and self.pending[0][0] <= now:
+            _, path, mtime = heapq.heappop(self.pending)
+            stats = self.files.get(path)
+            # Skip entries superseded by a later change to the same file
+            if stats is not None and stats.st_mtime == mtime and self._is_candidate(stats, path):
+                due[path] = stats
+
+        return [get_file_info(Path(path), root_of(path, self.roots), stats) for path, stats in due.items()]
+
+    def enforce(self) -> None:
+        """Apply the configured action to every file due this pass"""
+        due = self.due_files()
+        if not due:
+            return
+
+        if self.action == 'report':
+            for info in due:
+                console.print(f"[yellow]Matches policy: {info['relative_path']} ({info['size']:.1f} MB, {info['age']} days)[/yellow]")
+        elif self.action == 'clean':
+            result = self.cleaner.clean_files(due)
+            console.print(f"[green]Deleted {len(result.deleted)} files[/green]")
+            for path, error in result.errors:
+                console.print(f"[red]Error deleting {path}: {error}[/red]")
+        else:
+            archive_path = Path(self.config['archive_path'])
+            archive_path.mkdir(parents=True, exist_ok=True)
+            same_device = shares_device(self.roots, archive_path)
+            moves = [
+                (str(info['path']),
+                 str(archive_path / self.labels[root_of(info['path'], self.roots)] / info['relative_path']),
+                 round(info['size'] * 1024 * 1024))
+                for info in due
+            ]
+
+            def on_done(source: str, target: str, size: int, error: Optional[Exception]) -> None:
+                if error is not None:
+                    console.print(f"[red]Error archiving {source}: {error}[/red]")
+                else:
+                    console.print(f"[dim]Archived: {Path(source).relative_to(root_of(source, self.roots))}[/dim]")
+
+            self.transfer.transfer(moves, same_device, on_done, manifest_for(self.config, str(archive_path)))
+
+        for info in due:
+            self._forget(str(info['path']))
+
+    def run(self) -> None:
+        """Watch until interrupted, enforcing the policy every ``interval`` seconds"""
+        console.print(f"[cyan]Watching {', '.join(map(str, self.roots))} (action: {self.action}, every {self.interval:g}s)[/cyan]")
+        self.full_rescan()
+        if self.inotify is None:
+            console.print("[yellow]inotify unavailable; rescanning the whole folder every pass[/yellow]")
+        next_pass = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= next_pass:
+                    self.enforce()
+                    next_pass = now + self.interval
+                if self.inotify is None:
+                    # Without events the next pass needs a fresh walk
+                    time.sleep(max(0.0, next_pass - time.monotonic()))
+                    self.poll()
+                    continue
+                self.apply_events(self.inotify.read_events(max(0.0, next_pass - time.monotonic())))
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
@@ -1,4 +1,25 @@
-from .config import Config
-from .file_utils import get_file_info, format_size
+from importlib import import_module
 
-__all__ = ['Config', 'get_file_info', 'format_size'] 
\ No newline at end of file
+# Exports are resolved on first access so that importing one utility does
+# not pull in numpy, thefuzz and rich for all the others
+_EXPORTS = {
+    'Config': '.config',
+    'get_file_info': '.file_utils',
+    'format_size': '.file_utils',
+    'ScanIndex': '.scan_index',
+    'FileTable': '.file_table',
+    'HashCache': '.hash_cache',
+    'RuleSet': '.rules',
+    'FolderRollup': '.rollup',
+    'TopK': '.topk',
+    'RichSink': '.reporter',
+    'NullSink': '.reporter',
+}
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
+
+__all__ = ['Config', 'get_file_info', 'format_size', 'ScanIndex', 'FileTable', 'HashCache', 'RuleSet', 'FolderRollup',
+           'TopK', 'RichSink', 'NullSink']
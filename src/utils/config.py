@@ -1,3 +1,4 @@
+import copy
 import json
 import os
 from pathlib import Path
@@ -39,17 +40,50 @@ class Config:
         archive_path = Path.home() / "Documents" / "Arsip"
         return str(archive_path)
     
-    DEFAULT_CONFIG = {
-        "downloads_path": get_default_downloads_path.__func__(),
+    # Defaults that do not depend on the machine; the two path defaults
+    # probe the filesystem and are resolved only when a key is missing
+    DEFAULT_SETTINGS: Dict[str, Any] = {
         "min_size_mb": 50,
         "max_age_days": 30,
         "exclude_extensions": ["zip", "mp4", "exe"],
         "exclude_folders": ["node_modules", ".git", "venv"],  # Default folders to exclude
-        "archive_path": get_default_archive_path.__func__()
+        "delete_workers": 8,  # Concurrent unlink workers when cleaning
+        "archive_workers": 4,  # Concurrent copies for cross-device archiving
+        "archive_format": "files",  # "files", or "zip"/"tar.zst" containers
+        "container_size_mb": 1024,  # Input size at which a container rolls over
+        "rules": [],  # Per-folder policy rules, evaluated before the settings above
+        "scan_workers": 4,  # Concurrent root walkers, split evenly between devices
+        "delete_mode": "delete",  # "delete", or "trash" to stage cleaned files for restore
+        "trash_retention_days": 7,  # Age at which trashed batches are purged
+        "exclude_types": [],  # Content types never cleaned, whatever the extension
+        "sniff_content": True,  # Archive files whose content matches when the extension does not
+        "archive_checksums": True  # Hash cross-device copies and keep an archive manifest for verify
     }
+    PATH_KEYS = ("downloads_path", "archive_path")
+    
+    @classmethod
+    def default_value(cls, key: str) -> Any:
+        """Get the default of a single setting"""
+        if key == "downloads_path":
+            return cls.get_default_downloads_path()
+        if key == "archive_path":
+            return cls.get_default_archive_path()
+        return copy.deepcopy(cls.DEFAULT_SETTINGS[key])
+    
+    @classmethod
+    def default_config(cls) -> Dict[str, Any]:
+        """Build the default configuration"""
+        return {key: cls.default_value(key) for key in (*cls.PATH_KEYS, *cls.DEFAULT_SETTINGS)}
     
     def __init__(self, config_file: str = "config.json"):
         self.config_file = config_file
+        # The incremental scan index, hash and content-type caches, folder
+        # rollup and run checkpoints live next to the config file
+        self.index_file = str(Path(config_file).with_name("scan_index.db"))
+        self.hash_cache_file = str(Path(config_file).with_name("hash_cache.db"))
+        self.rollup_file = str(Path(config_file).with_name("folder_rollup.json"))
+        self.type_cache_file = str(Path(config_file).with_name("content_types.db"))
+        self.checkpoint_dir = str(Path(config_file).with_name("checkpoints"))
         self.config = self._load_config()
         
         # Validate paths
@@ -57,9 +91,15 @@ class Config:
     
     def _validate_paths(self) -> None:
         """Validate that the configured paths exist or can be created"""
-        # Check downloads path
-        downloads_path = Path(self.config['downloads_path'])
-        if not downloads_path.exists():
+        # Check downloads path; with several roots, missing ones are only reported
+        if isinstance(self.config['downloads_path'], list):
+            for root in self.config['downloads_path']:
+                if not Path(os.path.expanduser(root)).exists():
+                    console.print(f"[yellow]Warning: Downloads path '{root}' not found. It will be skipped.[/yellow]")
+            downloads_path = None
+        else:
+            downloads_path = Path(self.config['downloads_path'])
+        if downloads_path is not None and not downloads_path.exists():
             # Try to find the Downloads folder
             default_path = self.get_default_downloads_path()
             if default_path != self.config['downloads_path']:
@@ -86,20 +126,24 @@ class Config:
         try:
             with open(self.config_file, 'r') as f:
                 config = json.load(f)
-                # Validate config structure
-                for key in self.DEFAULT_CONFIG:
-                    if key not in config:
-                        console.print(f"[yellow]Warning: Missing '{key}' in config file. Using default value.[/yellow]")
-                        config[key] = self.DEFAULT_CONFIG[key]
+                # Fill in any setting the file predates and save the result
+                # once, so upgrades do not warn or probe paths on every run
+                missing = [key for key in (*self.PATH_KEYS, *self.DEFAULT_SETTINGS) if key not in config]
+                for key in missing:
+                    config[key] = self.default_value(key)
+                if missing:
+                    self._save_config(config)
                 return config
         except FileNotFoundError:
             console.print(f"[yellow]Config file not found. Creating new config file: {self.config_file}[/yellow]")
-            self._save_config(self.DEFAULT_CONFIG)
-            return self.DEFAULT_CONFIG
+            config = self.default_config()
+            self._save_config(config)
+            return config
         except json.JSONDecodeError:
             console.print(f"[red]Error: Invalid JSON in config file. Using default configuration.[/red]")
-            self._save_config(self.DEFAULT_CONFIG)
-            return self.DEFAULT_CONFIG
+            config = self.default_config()
+            self._save_config(config)
+            return config
     
     def _save_config(self, config: Dict[str, Any]) -> None:
         try:
@@ -0,0 +1,336 @@
+import os
+import time
+from array import array
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from .fuzzy_index import TrigramIndex
+from . import profiler
+
+BYTES_PER_MB = 1024 * 1024
+SECONDS_PER_DAY = 86400
+
+ROW_KEYS = (
+    'path', 'name', 'relative_path', 'size', 'age', 'last_access',
+    'modified', 'extension', 'is_hidden', 'parent_folder'
+)
+
+class FileRow(Mapping):
+    """Read-only dict view of one FileTable row, matching get_file_info's keys"""
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'FileTable', index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        table, i = self._table, self._index
+        if key == 'name':
+            return table.names[table.name_id[i]]
+        if key == 'relative_path':
+            return Path(table.relative_path(i))
+        if key == 'path':
+            return table.root / table.relative_path(i)
+        if key == 'size':
+            return float(table.size[i]) / BYTES_PER_MB
+        if key == 'age':
+            return int((time.time() - table.mtime[i]) // SECONDS_PER_DAY)
+        if key == 'last_access':
+            return datetime.fromtimestamp(table.atime[i])
+        if key == 'modified':
+            return datetime.fromtimestamp(table.mtime[i])
+        if key == 'extension':
+            return table.extensions[table.extension[i]]
+        if key == 'is_hidden':
+            return bool(table.hidden[i])
+        if key == 'parent_folder':
+            parent = table.parents[table.parent[i]]
+            return Path(parent).name if parent else table.root.name
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(ROW_KEYS)
+
+    def __len__(self) -> int:
+        return len(ROW_KEYS)
+
+class FileTableBuilder:
+    """Accumulates file records into compact typed buffers for a FileTable"""
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self._prefix = os.path.join(os.fspath(root), '')
+        self.names: List[str] = []
+        self.parents: List[str] = []
+        self.extensions: List[str] = []
+        self._parent_ids: Dict[str, int] = {}
+        self._extension_ids: Dict[str, int] = {}
+        self.size = array('q')
+        self.mtime = array('d')
+        self.atime = array('d')
+        self.parent = array('l')
+        self.extension = array('l')
+        self.hidden = array('b')
+
+    def _intern(self, value: str, values: List[str], ids: Dict[str, int]) -> int:
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = ids[value] = len(values)
+            values.append(value)
+        return value_id
+
+    def append(self, relative_path: str, size: int, mtime: float, atime: float) -> None:
+        """Add one file given its path relative to the table root and raw stats"""
+        parent, _, name = relative_path.rpartition(os.sep)
+        self.names.append(name)
+        self.parent.append(self._intern(parent, self.parents, self._parent_ids))
+        extension = os.path.splitext(name)[1].lower()[1:]
+        self.extension.append(self._intern(extension, self.extensions, self._extension_ids))
+        self.hidden.append(name.startswith('.'))
+        self.size.append(size)
+        self.mtime.append(mtime)
+        self.atime.append(atime)
+
+    def append_entry(self, entry: os.DirEntry, prefix: str) -> None:
+        """Add a walker entry, taking size and times from its cached stat"""
+        stats = entry.stat()
+        path = entry.path
+        relative_path = path[len(prefix):] if path.startswith(prefix) else path
+        self.append(relative_path, stats.st_size, stats.st_mtime, stats.st_atime)
+
+    def append_info(self, info: Dict[str, Any]) -> None:
+        """Add a get_file_info dictionary, placed relative to the table root"""
+        path = str(info['path'])
+        self.append(
+            path[len(self._prefix):] if path.startswith(self._prefix) else path,
+            round(info['size'] * BYTES_PER_MB),
+            info['modified'].timestamp(),
+            info['last_access'].timestamp()
+        )
+
+    def build(self) -> 'FileTable':
+        return FileTable(
+            self.root,
+            self.names,
+            self.parents,
+            self.extensions,
+            name_id=np.arange(len(self.names), dtype=np.int64),
+            size=np.array(self.size, dtype=np.int64),
+            mtime=np.array(self.mtime, dtype=np.float64),
+            atime=np.array(self.atime, dtype=np.float64),
+            parent=np.array(self.parent, dtype=np.int64),
+            extension=np.array(self.extension, dtype=np.int64),
+            hidden=np.array(self.hidden, dtype=bool)
+        )
+
+class FileTable:
+    """
+    Columnar table of file records backed by NumPy arrays
+
+    Sizes, times, extension codes and parent folder ids live in parallel
+    arrays; names, parent folders and extensions are interned lists shared
+    between a table and every subset taken from it. Iterating or indexing
+    yields FileRow views that behave like get_file_info dictionaries.
+    """
+
+    COLUMNS = ('name_id', 'size', 'mtime', 'atime', 'parent', 'extension', 'hidden')
+
+    def __init__(self, root: Path, names: List[str], parents: List[str],
+                 extensions: List[str], **columns: np.ndarray):
+        self.root = root
+        self.names = names
+        self.parents = parents
+        self.extensions = extensions
+        self.name_id = columns['name_id']
+        self.size = columns['size']
+        self.mtime = columns['mtime']
+        self.atime = columns['atime']
+        self.parent = columns['parent']
+        self.extension = columns['extension']
+        self.hidden = columns['hidden']
+        # Built on the first pattern query and reused by later ones
+        self._index: Optional[TrigramIndex] = None
+
+    @classmethod
+    def from_entries(cls, root: Union[str, Path], entries: Iterable[os.DirEntry]) -> 'FileTable':
+        """Build a table straight from walker entries without per-file dictionaries"""
+        builder = FileTableBuilder(root)
+        prefix = os.path.join(os.fspath(root), '')
+        for entry in entries:
+            try:
+                builder.append_entry(entry, prefix)
+            except OSError:
+                continue
+        return builder.build()
+
+    @classmethod
+    def from_infos(cls, root: Union[str, Path], infos: Iterable[Dict[str, Any]]) -> 'FileTable':
+        """Build a table from get_file_info dictionaries"""
+        builder = FileTableBuilder(root)
+        for info in infos:
+            builder.append_info(info)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.name_id)
+
+    def __iter__(self) -> Iterator[FileRow]:
+        for i in range(len(self)):
+            yield FileRow(self, i)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[FileRow, 'FileTable']:
+        if isinstance(key, slice):
+            return self.take(np.arange(len(self))[key])
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return FileRow(self, key)
+
+    def relative_path(self, i: int) -> str:
+        parent = self.parents[self.parent[i]]
+        name = self.names[self.name_id[i]]
+        return os.path.join(parent, name) if parent else name
+
+    def take(self, indices: np.ndarray) -> 'FileTable':
+        """Return the subset of rows at ``indices`` (an index array or boolean mask)"""
+        return FileTable(
+            self.root,
+            self.names,
+            self.parents,
+            self.extensions,
+            **{column: getattr(self, column)[indices] for column in self.COLUMNS}
+        )
+
+    def ages(self, now: Optional[float] = None) -> np.ndarray:
+        """Age of every file in whole days"""
+        now = time.time() if now is None else now
+        return np.floor_divide(now - self.mtime, SECONDS_PER_DAY).astype(np.int64)
+
+    def mask(self, min_age: int = 0, min_size: float = 0,
+             exclude_extensions: List[str] = None,
+             exclude_folders: List[str] = None,
+             include_hidden: bool = False) -> np.ndarray:
+        """Evaluate the age, size, extension, folder and hidden-file rules as one boolean mask"""
+        keep = (self.ages() >= min_age) & (self.size >= min_size * BYTES_PER_MB)
+
+        if not include_hidden:
+            keep &= ~self.hidden
+
+        excluded_codes = [
+            i for i, extension in enumerate(self.extensions)
+            if extension in (exclude_extensions or [])
+        ]
+        if excluded_codes:
+            keep &= ~np.isin(self.extension, excluded_codes)
+
+        if exclude_folders:
+            # Decide once per interned parent folder, then broadcast to rows
+            excluded_parents = np.array([
+                any(folder in parent.split(os.sep) for folder in exclude_folders)
+                for parent in self.parents
+            ], dtype=bool)
+            keep &= ~excluded_parents[self.parent]
+
+        return keep
+
+    def filter(self, min_age: int = 0, min_size: float = 0, pattern: str = "",
+               exclude_extensions: List[str] = None,
+               exclude_folders: List[str] = None,
+               include_hidden: bool = False) -> 'FileTable':
+        """Vectorized counterpart of filter_files returning the matching rows"""
+        keep = self.mask(min_age, min_size, exclude_extensions, exclude_folders, include_hidden)
+        if not pattern:
+            return self.take(keep)
+        # Search this table's own index within the mask, so repeated
+        # filters reuse one index instead of indexing each subset
+        rows = sorted(row for row, _ in self._rank(pattern, among=keep))
+        return self.take(np.array(rows, dtype=np.int64))
+
+    def trigram_index(self) -> TrigramIndex:
+        """The trigram index over every row, built once per table"""
+        if self._index is None:
+            with profiler.span('trigram_index'):
+                index = TrigramIndex()
+                for i in range(len(self)):
+                    index.add(self.names[self.name_id[i]], self.relative_path(i))
+            self._index = index
+        return self._index
+
+    def _rank(self, pattern: str, limit: Optional[int] = None, threshold: int = 60,
+              among: Optional[np.ndarray] = None) -> List[Tuple[int, int]]:
+        return self.trigram_index().search(pattern, threshold=threshold, limit=limit, among=among)
+
+    def search(self, pattern: str, limit: Optional[int] = None, threshold: int = 60) -> List[Tuple[FileRow, int]]:
+        """
+        Rank rows by fuzzy similarity to ``pattern`` using a trigram index
+        
+        Args:
+            pattern: Search pattern
+            limit: Return only the best ``limit`` matches
+            threshold: Minimum score (0-100) for a row to match
+        
+        Returns:
+            (row, score) pairs, best first
+        """
+        return [(FileRow(self, row), score) for row, score in self._rank(pattern, limit, threshold)]
+
+    def sort_by(self, column: str, descending: bool = False) -> 'FileTable':
+        order = np.argsort(getattr(self, column), kind='stable')
+        return self.take(order[::-1] if descending else order)
+
+    def top(self, n: int, column: str = 'size') -> 'FileTable':
+        """
+        The ``n`` rows with the largest ``column`` values, largest first
+        
+        Uses a partial partition, so only the selected rows are ever sorted.
+        """
+        values = getattr(self, column)
+        if n <= 0:
+            return self.take(np.array([], dtype=np.int64))
+        if n < len(self):
+            candidates = np.argpartition(values, len(self) - n)[len(self) - n:]
+        else:
+            candidates = np.arange(len(self))
+        return self.take(candidates[np.argsort(values[candidates], kind='stable')[::-1]])
+
+    def folder_rows(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Row indices grouped by parent folder, as one sort of the parent column
+        
+        Returns:
+            (order, offsets, counts): the rows of parent ``p`` are
+            ``order[offsets[p]:offsets[p] + counts[p]]``
+        """
+        order = np.argsort(self.parent, kind='stable')
+        counts = np.bincount(self.parent, minlength=len(self.parents))
+        offsets = np.cumsum(counts) - counts
+        return order, offsets, counts
+
+    def total_size(self) -> float:
+        """Total size of all rows in MB"""
+        return float(self.size.sum()) / BYTES_PER_MB
+
+    def folder_label(self, parent_id: int) -> str:
+        return self.parents[parent_id] or 'Root'
+
+    def folder_totals(self) -> Dict[str, Tuple[int, float]]:
+        """File count and size in MB per parent folder, as one grouped reduction"""
+        counts = np.bincount(self.parent, minlength=len(self.parents))
+        sizes = np.bincount(self.parent, weights=self.size, minlength=len(self.parents))
+        return {
+            self.folder_label(parent_id): (int(counts[parent_id]), float(sizes[parent_id]) / BYTES_PER_MB)
+            for parent_id in np.flatnonzero(counts)
+        }
+
+    def group_by_folder(self) -> Dict[str, 'FileTable']:
+        """Split rows into one table per parent folder"""
+        order = np.argsort(self.parent, kind='stable')
+        parent_ids, starts = np.unique(self.parent[order], return_index=True)
+        bounds = list(starts[1:]) + [len(order)]
+        return {
+            self.folder_label(parent_id): self.take(order[start:end])
+            for parent_id, start, end in zip(parent_ids, starts, bounds)
+        }
@@ -1,13 +1,43 @@
 import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-from thefuzz import fuzz
-from rich.progress import Progress
+from typing import TYPE_CHECKING, Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+from .scan_index import ScanIndex, TRASH_DIR_NAME
+from . import profiler, reporter
 
-def get_file_info(file_path: Path, base_path: Optional[Path] = None) -> Dict[str, Any]:
-    """Get detailed file information"""
-    stats = os.stat(file_path)
+if TYPE_CHECKING:
+    from .rules import RuleSet
+
+# Entries buffered between the root walkers and the consumer; walkers block
+# once it is full, so a slow consumer holds back the scan instead of memory
+ROOT_QUEUE_SIZE = 1024
+_ROOT_DONE = object()
+# Files indexed and searched together when filtering by a pattern; matches
+# are yielded a chunk at a time, so a limit can stop the scan early
+PATTERN_CHUNK = 4096
+
+@dataclass
+class RootScan:
+    """Timing and outcome of walking one downloads root"""
+    root: Path
+    device: Optional[int] = None
+    files: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+def get_file_info(file_path: Path, base_path: Optional[Path] = None,
+                  stats: Optional[os.stat_result] = None) -> Dict[str, Any]:
+    """Get detailed file information, reusing ``stats`` when already known"""
+    if stats is None:
+        stats = os.stat(file_path)
+        profiler.count('stat_calls')
     
     # Calculate relative path from base_path if provided
     if base_path:
@@ -25,6 +55,7 @@ def get_file_info(file_path: Path, base_path: Optional[Path] = None) -> Dict[str
         'size': stats.st_size / (1024 * 1024),  # Size in MB
         'age': (datetime.now() - datetime.fromtimestamp(stats.st_mtime)).days,
         'last_access': datetime.fromtimestamp(stats.st_atime),
+        'modified': datetime.fromtimestamp(stats.st_mtime),
         'extension': file_path.suffix.lower()[1:] if file_path.suffix else '',
         'is_hidden': file_path.name.startswith('.'),
         'parent_folder': file_path.parent.name
@@ -36,17 +67,291 @@ def format_size(size_mb: float) -> str:
         return f"{size_mb/1024:.1f} GB"
     return f"{size_mb:.1f} MB"
 
-def scan_directory(path: Path, progress: Optional[Progress] = None) -> List[Path]:
+SIZE_UNITS = {'': 1024 ** 2, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2,
+              'g': 1024 ** 3, 'gb': 1024 ** 3, 't': 1024 ** 4, 'tb': 1024 ** 4}
+
+def parse_size(text: str) -> int:
+    """Bytes in a size such as '20GB', '512 MB' or '1.5T'; plain numbers are MB"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([a-zA-Z]*)\s*', text)
+    unit = match.group(2).lower() if match else None
+    if unit not in SIZE_UNITS:
+        raise ValueError(f"Invalid size {text!r}; use e.g. 20GB or 500MB")
+    try:
+        return round(float(match.group(1)) * SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size {text!r}; use e.g. 20GB or 500MB") from None
+
+def walk_directory(path: Path, exclude_folders: Optional[List[str]] = None,
+                   prune: Optional[Callable[[str], bool]] = None) -> Iterator[os.DirEntry]:
+    """
+    Recursively walk directory with os.scandir and yield file entries
+
+    Excluded folders are pruned before they are listed, so nothing beneath
+    them is ever read. File type comes from the directory listing itself and
+    ``entry.stat()`` caches its result, so callers that only use the yielded
+    entry's stat pay at most one stat syscall per file.
+
+    Args:
+        path: Root directory to walk
+        exclude_folders: Folder names to skip at any level of the tree, in
+            addition to the trash's staging folder
+        prune: Called with each subdirectory's path; subtrees it returns
+            True for are skipped
+    """
+    exclude_folders = set(exclude_folders or [])
+    exclude_folders.add(TRASH_DIR_NAME)
+    stack = [os.fspath(path)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                profiler.count('directories_listed')
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in exclude_folders and not (prune and prune(entry.path)):
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            yield entry
+                    except OSError:
+                        continue  # Entry vanished or is unreadable
+        except OSError:
+            continue  # Skip directories we can't access
+
+def iter_file_entries(path: Path, exclude_folders: Optional[List[str]] = None,
+                      index_file: Optional[str] = None,
+                      rules: Optional['RuleSet'] = None) -> Iterator[os.DirEntry]:
+    """
+    Yield file entries from the live walker or, when given, the persistent scan index
+    
+    With ``rules``, subtrees that no rule can act on are not walked.
+    Every yielded entry already holds its stat, so ``entry.stat()`` is free
+    to callers: live entries are stat'ed here, once, and counted in
+    ``stat_calls``; the index counts the stats it takes itself, and serves
+    unchanged folders' files without any.
+    """
+    if not index_file:
+        yield from _iter_entries(path, exclude_folders, None, rules)
+        return
+    index = ScanIndex(index_file)
+    try:
+        yield from _iter_entries(path, exclude_folders, index, rules)
+    finally:
+        index.close()
+
+def _iter_entries(path: Path, exclude_folders: Optional[List[str]], index: Optional[ScanIndex],
+                  rules: Optional['RuleSet']) -> Iterator[os.DirEntry]:
+    """iter_file_entries over an already open ``index``, which several roots may share"""
+    prune = rules.pruner(path) if rules and not rules.is_default else None
+    if index is None:
+        for entry in walk_directory(path, exclude_folders, prune):
+            try:
+                entry.stat()
+            except OSError:
+                continue  # Vanished since it was listed
+            profiler.count('stat_calls')
+            yield entry
+        return
+    yield from index.scan(path, exclude_folders, prune, rules.signature if prune else '')
+
+def mark_index_stale(index_file: Optional[str], paths: Iterable[str]) -> None:
+    """Have the scan index list the folders of ``paths`` again on the next scan"""
+    paths = list(paths)
+    if not index_file or not paths:
+        return
+    index = ScanIndex(index_file)
+    try:
+        index.mark_stale(paths)
+    finally:
+        index.close()
+
+def scan_file_infos(path: Path, exclude_folders: Optional[List[str]] = None,
+                    index_file: Optional[str] = None,
+                    rules: Optional['RuleSet'] = None) -> Iterator[Dict[str, Any]]:
+    """Walk directory and yield file information built from cached entry stats"""
+    for entry in iter_file_entries(path, exclude_folders, index_file, rules):
+        yield get_file_info(Path(entry.path), path, entry.stat())
+
+def downloads_roots(config: Dict[str, Any]) -> List[Path]:
+    """The configured downloads roots; ``downloads_path`` may be one path or a list"""
+    paths = config['downloads_path']
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    return [Path(os.path.expanduser(path)) for path in paths]
+
+def common_root(roots: Iterable[Union[str, Path]]) -> str:
+    """Deepest folder containing every root, or '' when they share none (different drives)"""
+    try:
+        return os.path.commonpath([os.fspath(root) for root in roots])
+    except ValueError:
+        return ''
+
+def root_labels(roots: Iterable[Union[str, Path]]) -> Dict[Path, str]:
+    """
+    Folder each root's files are archived under, keeping roots apart
+
+    A single root is archived straight into the archive folder. With several
+    roots, each gets a subfolder named after it, numbered when names repeat.
+    """
+    roots = [Path(root) for root in roots]
+    if len(roots) == 1:
+        return {roots[0]: ''}
+    labels: Dict[Path, str] = {}
+    used = set()
+    for root in roots:
+        base = root.name or root.anchor.strip(':\\/') or 'root'
+        label, number = base, 2
+        while label in used:
+            label, number = f"{base}-{number}", number + 1
+        used.add(label)
+        labels[root] = label
+    return labels
+
+def root_of(path: Union[str, Path], roots: Iterable[Union[str, Path]]) -> Optional[Path]:
+    """The root ``path`` lies under, preferring the deepest when roots nest"""
+    path = os.fspath(path)
+    found = None
+    for root in roots:
+        prefix = os.path.join(os.fspath(root), '')
+        if path.startswith(prefix) and (found is None or len(prefix) > len(os.fspath(found))):
+            found = Path(root)
+    return found
+
+def shares_device(roots: Iterable[Union[str, Path]], path: Union[str, Path]) -> bool:
+    """
+    Whether any root is on the same device as ``path``
+
+    Moves into ``path`` then try renames first; files from roots on other
+    devices fall back to copies when the rename fails with EXDEV.
+    """
+    device = os.stat(path).st_dev
+    for root in roots:
+        try:
+            if os.stat(root).st_dev == device:
+                return True
+        except OSError:
+            continue
+    return False
+
+def _put_entry(entries: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Queue ``item`` unless the consumer stopped; False once it has"""
+    while not stop.is_set():
+        try:
+            entries.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def walk_roots(roots: Iterable[Union[str, Path]], exclude_folders: Optional[List[str]] = None,
+               index_file: Optional[str] = None, rules: Optional['RuleSet'] = None,
+               max_workers: int = 4, scans: Optional[List[RootScan]] = None) -> Iterator[Tuple[Path, os.DirEntry]]:
+    """
+    Walk several downloads roots concurrently and yield (root, entry) pairs
+
+    Roots are grouped by ``st_dev`` and the worker budget is split evenly
+    between devices: a slow network share only ties up its own workers, and
+    roots on one disk are never walked by more threads than its share.
+    Entries are stat'ed on the walking thread and merged into one stream in
+    arrival order. A single root is walked on the calling thread.
+
+    Args:
+        roots: Root directories to walk
+        exclude_folders: Folder names to skip at any level of the tree
+        index_file: Persistent scan index, opened once and shared by all roots
+        rules: Compiled rules, consulted to prune subtrees per root
+        max_workers: Concurrent walkers across all devices
+        scans: Receives a RootScan per root, filled in as the walk finishes
+    """
+    scans = scans if scans is not None else []
+    by_device: Dict[int, List[RootScan]] = {}
+    for root in roots:
+        scan = RootScan(Path(root))
+        scans.append(scan)
+        try:
+            scan.device = os.stat(scan.root).st_dev
+        except OSError as e:
+            scan.error = str(e)
+            continue
+        profiler.count('stat_calls')
+        by_device.setdefault(scan.device, []).append(scan)
+    walkable = [scan for scans_on_device in by_device.values() for scan in scans_on_device]
+    if not walkable:
+        return
+    index = ScanIndex(index_file) if index_file else None
+    try:
+        yield from _walk_scans(by_device, walkable, exclude_folders, index, rules, max_workers)
+    finally:
+        if index is not None:
+            index.close()
+
+def _walk_scans(by_device: Dict[int, List[RootScan]], walkable: List[RootScan],
+                exclude_folders: Optional[List[str]], index: Optional[ScanIndex],
+                rules: Optional['RuleSet'], max_workers: int) -> Iterator[Tuple[Path, os.DirEntry]]:
+    """walk_roots' walk of the roots that could be stat'ed"""
+    if len(walkable) == 1:
+        scan = walkable[0]
+        started = time.perf_counter()
+        try:
+            for entry in _iter_entries(scan.root, exclude_folders, index, rules):
+                scan.files += 1
+                yield scan.root, entry
+        finally:
+            scan.elapsed = time.perf_counter() - started
+        return
+
+    share = max(1, max_workers // len(by_device))
+    slots = {device: threading.BoundedSemaphore(share) for device in by_device}
+    entries: queue.Queue = queue.Queue(maxsize=ROOT_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def walk(scan: RootScan) -> None:
+        try:
+            with slots[scan.device]:
+                started = time.perf_counter()
+                try:
+                    with profiler.span('walk_root'):
+                        for entry in _iter_entries(scan.root, exclude_folders, index, rules):
+                            if not _put_entry(entries, (scan.root, entry), stop):
+                                return
+                            scan.files += 1
+                except Exception as e:
+                    scan.error = str(e)
+                finally:
+                    scan.elapsed = time.perf_counter() - started
+        finally:
+            _put_entry(entries, _ROOT_DONE, stop)
+
+    executor = ThreadPoolExecutor(max_workers=len(walkable), thread_name_prefix='walk_root')
+    try:
+        for scan in walkable:
+            executor.submit(walk, scan)
+        remaining = len(walkable)
+        while remaining:
+            item = entries.get()
+            if item is _ROOT_DONE:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        # Release walkers blocked on a full queue when the consumer stops early
+        stop.set()
+        executor.shutdown(wait=True)
+
+def scan_root_infos(roots: Iterable[Union[str, Path]], exclude_folders: Optional[List[str]] = None,
+                    index_file: Optional[str] = None, rules: Optional['RuleSet'] = None,
+                    max_workers: int = 4, scans: Optional[List[RootScan]] = None) -> Iterator[Dict[str, Any]]:
+    """Walk roots concurrently and yield file information relative to each file's own root"""
+    for root, entry in walk_roots(roots, exclude_folders, index_file, rules, max_workers, scans):
+        yield get_file_info(Path(entry.path), root, entry.stat())
+
+def scan_directory(path: Path, exclude_folders: Optional[List[str]] = None) -> List[Path]:
     """Recursively scan directory and return all files"""
     files = []
-    try:
-        for item in path.rglob('*'):
-            if progress:
-                progress.advance(0)  # Update progress without incrementing
-            if item.is_file():
-                files.append(item)
-    except PermissionError:
-        pass  # Skip directories we can't access
+    with reporter.task("[cyan]Scanning files...") as task:
+        for entry in walk_directory(path, exclude_folders):
+            files.append(Path(entry.path))
+            task.advance()
     return files
 
 def fuzzy_match_file(file_info: Dict[str, Any], pattern: str, threshold: int = 60) -> bool:
@@ -62,29 +367,39 @@ def fuzzy_match_file(file_info: Dict[str, Any], pattern: str, threshold: int = 6
     if pattern in name:
         return True
     
+    # thefuzz is only loaded once a pattern needs fuzzy scoring
+    from thefuzz import fuzz
+    
     # Check fuzzy match on name
+    profiler.count('fuzzy_comparisons')
     if fuzz.partial_ratio(pattern, name) >= threshold:
         return True
     
     # Check fuzzy match on relative path
+    profiler.count('fuzzy_comparisons')
     rel_path = str(file_info['relative_path']).lower()
     if fuzz.partial_ratio(pattern, rel_path) >= threshold:
         return True
     
     return False
 
-def filter_files(files: List[Dict[str, Any]], 
-                min_age: int = 0, 
-                min_size: float = 0, 
-                pattern: str = "",
-                exclude_extensions: List[str] = None,
-                exclude_folders: List[str] = None,
-                include_hidden: bool = False) -> List[Dict[str, Any]]:
+def iter_filter_files(files: Iterable[Dict[str, Any]],
+                      min_age: int = 0,
+                      min_size: float = 0,
+                      pattern: str = "",
+                      exclude_extensions: List[str] = None,
+                      exclude_folders: List[str] = None,
+                      include_hidden: bool = False) -> Iterator[Dict[str, Any]]:
     """
-    Filter files based on various criteria
+    Lazily filter files based on various criteria, yielding matches as they arrive
+    
+    With a pattern, the files passing the other criteria are searched in
+    chunks of PATTERN_CHUNK through a TrigramIndex and yielded in their
+    original order, so fuzzy scoring only runs on files sharing trigrams
+    with the pattern (see TrigramIndex._min_shared).
     
     Args:
-        files: List of file information dictionaries
+        files: Iterable of file information dictionaries
         min_age: Minimum age of files in days
         min_size: Minimum size of files in MB
         pattern: Optional search pattern for fuzzy matching
@@ -92,9 +407,15 @@ def filter_files(files: List[Dict[str, Any]],
         exclude_folders: List of folder names to exclude
         include_hidden: Whether to include hidden files
     """
-    exclude_extensions = exclude_extensions or []
-    exclude_folders = exclude_folders or []
-    filtered = []
+    if pattern:
+        yield from _iter_pattern_matches(iter_filter_files(
+            files, min_age, min_size, "", exclude_extensions, exclude_folders, include_hidden
+        ), pattern)
+        return
+    exclude_extensions = set(exclude_extensions or [])
+    exclude_folders = set(exclude_folders or [])
+    # Folder exclusion is decided once per parent folder
+    excluded_parents: Dict[Any, bool] = {}
     
     for file_info in files:
         # Skip hidden files unless explicitly included
@@ -106,18 +427,52 @@ def filter_files(files: List[Dict[str, Any]],
             continue
             
         # Skip files in excluded folders
-        rel_path = str(file_info['relative_path'])
-        if any(folder in rel_path.split(os.sep) for folder in exclude_folders):
-            continue
+        if exclude_folders:
+            parent = file_info['relative_path'].parent
+            excluded = excluded_parents.get(parent)
+            if excluded is None:
+                excluded = not exclude_folders.isdisjoint(parent.parts)
+                excluded_parents[parent] = excluded
+            if excluded:
+                continue
             
         # Check age and size criteria
         if file_info['age'] < min_age or file_info['size'] < min_size:
             continue
             
-        # Apply fuzzy matching if pattern is provided
-        if pattern and not fuzzy_match_file(file_info, pattern):
-            continue
-            
-        filtered.append(file_info)
+        yield file_info
+
+def _iter_pattern_matches(files: Iterable[Dict[str, Any]], pattern: str, threshold: int = 60) -> Iterator[Dict[str, Any]]:
+    """Yield the files matching ``pattern``, in order, via a trigram index per chunk"""
+    # numpy and thefuzz are only loaded once a pattern is given
+    from .fuzzy_index import TrigramIndex
     
-    return filtered 
\ No newline at end of file
+    files = iter(files)
+    while True:
+        chunk = list(islice(files, PATTERN_CHUNK))
+        if not chunk:
+            return
+        with profiler.span('pattern_search'):
+            index = TrigramIndex.from_files(chunk)
+            matched = sorted(doc_id for doc_id, _ in index.search(pattern, threshold=threshold))
+        for doc_id in matched:
+            yield chunk[doc_id]
+
+def filter_files(files: Iterable[Dict[str, Any]], 
+                min_age: int = 0, 
+                min_size: float = 0, 
+                pattern: str = "",
+                exclude_extensions: List[str] = None,
+                exclude_folders: List[str] = None,
+                include_hidden: bool = False) -> List[Dict[str, Any]]:
+    """Filter files based on various criteria (see iter_filter_files)"""
+    with profiler.span('filter_files'):
+        return list(iter_filter_files(
+            files,
+            min_age=min_age,
+            min_size=min_size,
+            pattern=pattern,
+            exclude_extensions=exclude_extensions,
+            exclude_folders=exclude_folders,
+            include_hidden=include_hidden
+        ))
@@ -0,0 +1,144 @@
+import math
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import numpy as np
+from thefuzz import fuzz, process
+from . import profiler
+
+def normalize(text: str) -> str:
+    """Normalize a name or path for matching"""
+    return text.lower()
+
+def trigrams(text: str) -> Set[str]:
+    """Distinct character trigrams of ``text``"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to the files containing them
+
+    Each file is indexed by its normalized relative path, which also covers
+    its name. A query is narrowed to the files sharing enough trigrams with
+    the pattern before any fuzzy scoring runs, and the survivors are scored
+    in one batch with the same partial ratio as fuzzy_match_file.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.paths: List[str] = []
+        self._postings: Dict[str, array] = defaultdict(lambda: array('q'))
+
+    @classmethod
+    def from_files(cls, files: Iterable[Mapping[str, Any]]) -> 'TrigramIndex':
+        """Build an index whose document ids follow the order of ``files``"""
+        index = cls()
+        for file_info in files:
+            index.add(file_info['name'], str(file_info['relative_path']))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, relative_path: str) -> int:
+        """Index one file and return its document id"""
+        doc_id = len(self.names)
+        self.names.append(normalize(name))
+        path = normalize(relative_path)
+        self.paths.append(path)
+        for gram in trigrams(path):
+            self._postings[gram].append(doc_id)
+        return doc_id
+
+    def _min_shared(self, pattern: str, threshold: int) -> int:
+        """
+        Trigrams a candidate must share with the pattern (q-gram lemma)
+
+        A window scoring ``threshold`` against the pattern is at most
+        ``2 * (1 - threshold/100) * len(pattern)`` insertions or deletions
+        away from it, and each edit breaks at most three of its trigrams.
+        When that bound drops to zero, as it does for most patterns at the
+        default threshold of 60, a candidate must still share one trigram.
+        This is a deliberate narrowing: a name that only resembles the
+        pattern by scattered characters, with no three in a row in common,
+        is not matched, and in exchange the candidate set stays small.
+        Patterns shorter than three characters have no trigrams and are
+        scored against every file.
+        """
+        edits = math.floor(2 * (1 - threshold / 100) * len(pattern))
+        return max(1, len(trigrams(pattern)) - 3 * edits)
+
+    def candidates(self, pattern: str, threshold: int = 60, among: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Document ids worth scoring for ``pattern``
+
+        Args:
+            among: Boolean mask over document ids; ids it excludes are
+                never candidates
+        """
+        pattern = normalize(pattern)
+        if len(pattern) < 3:
+            # Too short to have trigrams: every document is a candidate
+            return np.arange(len(self)) if among is None else np.flatnonzero(among)
+        postings = [
+            np.frombuffer(self._postings[gram], dtype=np.int64)
+            for gram in trigrams(pattern) if gram in self._postings
+        ]
+        if not postings:
+            return np.array([], dtype=np.int64)
+        keep = np.bincount(np.concatenate(postings), minlength=len(self)) >= self._min_shared(pattern, threshold)
+        if among is not None:
+            keep &= among
+        return np.flatnonzero(keep)
+
+    def _score(self, pattern: str, texts: Dict[int, str], threshold: int) -> Dict[int, int]:
+        profiler.count('fuzzy_comparisons', len(texts))
+        return {
+            doc_id: score
+            for _, score, doc_id in process.extractWithoutOrder(
+                pattern, texts,
+                processor=None,
+                scorer=fuzz.partial_ratio,
+                score_cutoff=threshold
+            )
+        }
+
+    def search(self, pattern: str, threshold: int = 60, limit: Optional[int] = None,
+               among: Optional[np.ndarray] = None) -> List[Tuple[int, int]]:
+        """
+        Rank indexed files against ``pattern``
+
+        Args:
+            pattern: Search pattern
+            threshold: Minimum score (0-100) for a file to match
+            limit: Return only the best ``limit`` matches
+            among: Boolean mask over document ids to search within
+
+        Returns:
+            (document id, score) pairs, best first
+        """
+        pattern = normalize(pattern)
+        if not pattern:
+            doc_ids = range(len(self)) if among is None else np.flatnonzero(among).tolist()
+            return [(doc_id, 100) for doc_id in doc_ids][:limit]
+
+        doc_ids = self.candidates(pattern, threshold, among)
+        scores: Dict[int, int] = {}
+        remaining = []
+        for doc_id in doc_ids.tolist():
+            # Exact substring matches need no fuzzy scoring
+            if pattern in self.names[doc_id]:
+                scores[doc_id] = 100
+            else:
+                remaining.append(doc_id)
+
+        if remaining:
+            name_scores = self._score(pattern, {i: self.names[i] for i in remaining}, threshold)
+            path_scores = self._score(pattern, {i: self.paths[i] for i in remaining}, threshold)
+            for doc_id in remaining:
+                score = max(name_scores.get(doc_id, 0), path_scores.get(doc_id, 0))
+                if score >= threshold:
+                    scores[doc_id] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit is not None else ranked
@@ -0,0 +1,57 @@
+import sqlite3
+from typing import Iterable, Optional, Tuple
+
+# (device, inode, size, mtime in nanoseconds)
+FileKey = Tuple[int, int, int, int]
+
+class HashCache:
+    """
+    Persistent SQLite cache of partial and full content hashes
+
+    Entries are keyed by (device, inode, size, mtime), so any change to a
+    file's content or identity produces a new key and the stale hash is
+    simply never looked up again.
+    """
+
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self.conn = sqlite3.connect(cache_file)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    dev INTEGER,
+                    ino INTEGER,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    partial TEXT,
+                    full TEXT,
+                    PRIMARY KEY (dev, ino, size, mtime_ns)
+                )
+            """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, key: FileKey) -> Tuple[Optional[str], Optional[str]]:
+        """Cached (partial, full) hashes for ``key``, either of which may be None"""
+        row = self.conn.execute(
+            "SELECT partial, full FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+            key
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def put_partial(self, items: Iterable[Tuple[FileKey, str]]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO hashes (dev, ino, size, mtime_ns, partial) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (dev, ino, size, mtime_ns) DO UPDATE SET partial = excluded.partial""",
+                [key + (digest,) for key, digest in items]
+            )
+
+    def put_full(self, items: Iterable[Tuple[FileKey, str]]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO hashes (dev, ino, size, mtime_ns, full) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (dev, ino, size, mtime_ns) DO UPDATE SET full = excluded.full""",
+                [key + (digest,) for key, digest in items]
+            )
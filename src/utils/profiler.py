@@ -0,0 +1,122 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+# The profiler in effect, if any. Instrumented code only checks this for
+# None, so leaving profiling off costs a global lookup per call site.
+_active: Optional['Profiler'] = None
+_NULL_SPAN = nullcontext()
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+
+class Profiler:
+    """Collects timed phase spans and counters and exports them as a Chrome trace"""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+
+    def record(self, name: str, start_ns: int, end_ns: int) -> None:
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': (start_ns - self._origin) / 1000,
+            'dur': (end_ns - start_ns) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def trace(self) -> Dict[str, Any]:
+        """Chrome trace-event data, loadable in chrome://tracing or Perfetto"""
+        end = (time.perf_counter_ns() - self._origin) / 1000
+        counter_events = [
+            {'name': name, 'ph': 'C', 'ts': end, 'pid': os.getpid(), 'args': {name: value}}
+            for name, value in self.counters.items()
+        ]
+        return {'traceEvents': self.events + counter_events, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
+
+    def summary(self) -> Table:
+        """Per-phase totals and counters as a rich table"""
+        totals: Dict[str, List[float]] = {}
+        for event in self.events:
+            calls_and_time = totals.setdefault(event['name'], [0, 0.0])
+            calls_and_time[0] += 1
+            calls_and_time[1] += event['dur'] / 1000
+
+        table = Table(title="Profile", show_header=True)
+        table.add_column("Phase / Counter")
+        table.add_column("Calls", justify="right")
+        table.add_column("Total", justify="right")
+        for name, (calls, total_ms) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            table.add_row(name, str(calls), f"{total_ms:.1f} ms")
+        for name, value in sorted(self.counters.items()):
+            table.add_row(f"[dim]{name}[/dim]", "", f"{value:,}")
+        return table
+
+def enable(profiler: Optional[Profiler] = None) -> Profiler:
+    """Start collecting spans and counters"""
+    global _active
+    _active = profiler or Profiler()
+    return _active
+
+def disable() -> Optional[Profiler]:
+    """Stop collecting and return the profiler that was active"""
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+def span(name: str):
+    """Time the enclosed block as phase ``name`` (a no-op unless profiling)"""
+    if _active is None:
+        return _NULL_SPAN
+    return _Span(_active, name)
+
+def count(name: str, amount: int = 1) -> None:
+    """Add ``amount`` to counter ``name`` (a no-op unless profiling)"""
+    if _active is not None:
+        _active.count(name, amount)
+
+def timed(name: str):
+    """Decorator timing every call of the function as phase ``name``"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _Span(_active, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
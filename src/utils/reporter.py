@@ -0,0 +1,212 @@
+"""
+Progress reporting between the core and the UI
+
+Core code opens tasks with ``task()`` and advances them as it works; it
+never talks to the terminal itself. Each thread counts into its own cell,
+without a lock, and the installed sink reads the sums on its own schedule.
+The default NullSink drops progress entirely, which suits headless and
+benchmark runs. The menu installs a RichSink, which redraws the bars a few
+times per second from one refresher thread, however fast items complete.
+"""
+import threading
+from typing import Dict, List, Optional
+from rich.console import Console
+from rich.progress import (
+    BarColumn, Progress, SpinnerColumn, TaskID, TextColumn, TimeElapsedColumn, TimeRemainingColumn
+)
+
+# Redraws per second of the rich sink
+REFRESH_PER_SECOND = 8
+
+class Task:
+    """
+    One unit of reported work
+
+    ``advance`` adds to a cell owned by the calling thread, so workers
+    never contend on a shared counter; ``completed`` is the sum of all
+    cells. ``note`` keeps only the latest text, such as the file just
+    handled, for the sink to show at its next refresh.
+    """
+
+    def __init__(self, sink: 'Sink', description: str, total: Optional[float] = None):
+        self.sink = sink
+        self.description = description
+        self.total = total
+        self.latest_note = ''
+        self._cells: List[List[float]] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'Task':
+        self.sink.open(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.sink.close(self)
+
+    def advance(self, amount: float = 1) -> None:
+        cell = getattr(self._local, 'cell', None)
+        if cell is None:
+            cell = self._local.cell = [0]
+            # Taken once per thread, when it first reports
+            with self._lock:
+                self._cells.append(cell)
+        cell[0] += amount
+
+    @property
+    def completed(self) -> float:
+        with self._lock:
+            cells = list(self._cells)
+        return sum(cell[0] for cell in cells)
+
+    def describe(self, description: str) -> None:
+        self.description = description
+
+    def note(self, text: str) -> None:
+        self.latest_note = text
+
+class _NullTask:
+    """Task stand-in that ignores every update"""
+    __slots__ = ()
+    description = ''
+    total = None
+    completed = 0
+    latest_note = ''
+
+    def __enter__(self) -> '_NullTask':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def advance(self, amount: float = 1) -> None:
+        pass
+
+    def describe(self, description: str) -> None:
+        pass
+
+    def note(self, text: str) -> None:
+        pass
+
+_NULL_TASK = _NullTask()
+
+class Sink:
+    """Where tasks and warnings are reported; warnings go to stderr unless overridden"""
+
+    def __init__(self):
+        self._stderr = Console(stderr=True)
+
+    def task(self, description: str, total: Optional[float] = None) -> Task:
+        return Task(self, description, total)
+
+    def open(self, task: Task) -> None:
+        pass
+
+    def close(self, task: Task) -> None:
+        pass
+
+    def warning(self, text: str) -> None:
+        self._stderr.print(text)
+
+class NullSink(Sink):
+    """Discards all progress; warnings, such as per-file errors, still go to stderr"""
+
+    def task(self, description: str, total: Optional[float] = None) -> _NullTask:
+        return _NULL_TASK
+
+class RichSink(Sink):
+    """
+    Rich progress bars for the interactive menu
+
+    All open tasks share one transient Progress display. A refresher
+    thread copies each task's counters into it and redraws at
+    ``refresh_per_second``; workers never touch rich themselves.
+    """
+
+    def __init__(self, console: Optional[Console] = None, refresh_per_second: float = REFRESH_PER_SECOND):
+        super().__init__()
+        self.console = console or Console()
+        self.interval = 1 / refresh_per_second
+        self._progress: Optional[Progress] = None
+        self._tasks: Dict[Task, TaskID] = {}
+        self._lock = threading.Lock()
+        self._stop: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self, task: Task) -> None:
+        with self._lock:
+            if self._progress is None:
+                self._progress = Progress(
+                    SpinnerColumn(),
+                    TextColumn("[progress.description]{task.description}"),
+                    BarColumn(),
+                    TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+                    TimeRemainingColumn(),
+                    TimeElapsedColumn(),
+                    TextColumn("[dim]{task.fields[note]}[/dim]"),
+                    console=self.console,
+                    transient=True,
+                    auto_refresh=False
+                )
+                self._progress.start()
+                self._stop = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._stop,), name='progress-refresh', daemon=True
+                )
+                self._thread.start()
+            self._tasks[task] = self._progress.add_task(task.description, total=task.total, note='')
+
+    def close(self, task: Task) -> None:
+        with self._lock:
+            self._progress.remove_task(self._tasks.pop(task))
+            if self._tasks:
+                return
+            progress, self._progress = self._progress, None
+            thread, self._thread = self._thread, None
+            self._stop.set()
+        thread.join()
+        progress.stop()
+
+    def _run(self, stop: threading.Event) -> None:
+        while not stop.wait(self.interval):
+            self.refresh()
+
+    def refresh(self) -> None:
+        """Copy every open task's state into the display and redraw once"""
+        with self._lock:
+            if self._progress is None:
+                return
+            for task, task_id in self._tasks.items():
+                self._progress.update(
+                    task_id, description=task.description, total=task.total,
+                    completed=task.completed, note=task.latest_note
+                )
+            self._progress.refresh()
+
+    def warning(self, text: str) -> None:
+        with self._lock:
+            if self._progress is not None:
+                # Printed above the live bars
+                self._progress.console.print(text)
+                return
+        self.console.print(text)
+
+# The sink in effect; core code only reports through the module functions
+_active: Sink = NullSink()
+
+def use(sink: Optional[Sink]) -> Sink:
+    """Install ``sink`` (a NullSink for None) and return the one it replaces"""
+    global _active
+    previous, _active = _active, sink or NullSink()
+    return previous
+
+def active() -> Sink:
+    return _active
+
+def task(description: str, total: Optional[float] = None):
+    """Open a task on the active sink; use as a context manager"""
+    return _active.task(description, total)
+
+def warning(text: str) -> None:
+    """Report a problem the user should see even without progress bars"""
+    _active.warning(text)
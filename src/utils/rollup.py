@@ -0,0 +1,179 @@
+import heapq
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from . import profiler
+
+BYTES_PER_MB = 1024 * 1024
+
+class FolderRollup:
+    """
+    Cumulative size and file count of every folder under the downloads roots
+
+    Scans feed each file into its folder's direct totals, an O(1) update per
+    file. The cumulative totals are rolled up from those once, deepest
+    folder first, when first queried; after that, removing files adjusts
+    only the folders above them. The direct totals can be saved and loaded
+    again, so reports do not need a new walk.
+    """
+
+    def __init__(self, roots: Iterable[Union[str, Path]]):
+        self.roots = [os.fspath(root) for root in roots]
+        self._root_set = set(self.roots)
+        # folder -> [bytes, files] directly inside it
+        self._direct: Dict[str, List[int]] = {}
+        # folder -> [bytes, files] in its whole subtree, built on demand
+        self._totals: Optional[Dict[str, List[int]]] = None
+        # Whether the feeding walk ran to the end and skipped no subtree
+        self.complete = False
+
+    def add(self, path: str, size: int) -> None:
+        folder = os.path.dirname(path)
+        direct = self._direct.get(folder)
+        if direct is None:
+            direct = self._direct[folder] = [0, 0]
+        direct[0] += size
+        direct[1] += 1
+        if self._totals is not None:
+            self._propagate(folder, size, 1)
+
+    def remove(self, path: str, size: int) -> None:
+        """Take a deleted or moved file out of its folder and every folder above it"""
+        folder = os.path.dirname(path)
+        direct = self._direct.get(folder)
+        if direct is None:
+            return
+        direct[0] -= size
+        direct[1] -= 1
+        if self._totals is not None:
+            self._propagate(folder, -size, -1)
+
+    def _ancestors(self, folder: str) -> Iterator[str]:
+        """``folder`` and the folders above it, up to its root"""
+        while True:
+            yield folder
+            if folder in self._root_set:
+                return
+            parent = os.path.dirname(folder)
+            if parent == folder:
+                return
+            folder = parent
+
+    def _propagate(self, folder: str, size: int, files: int) -> None:
+        for ancestor in self._ancestors(folder):
+            totals = self._totals.get(ancestor)
+            if totals is None:
+                totals = self._totals[ancestor] = [0, 0]
+            totals[0] += size
+            totals[1] += files
+
+    def observe(self, infos: Iterable[Dict[str, Any]], whole_tree: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Pass get_file_info dictionaries through, adding each file on the way
+
+        A walk that pruned subtrees (``whole_tree`` False) never completes
+        the rollup, since the skipped folders' files were not counted.
+        """
+        self.complete = False
+        for info in infos:
+            self.add(str(info['path']), round(info['size'] * BYTES_PER_MB))
+            yield info
+        self.complete = whole_tree
+
+    def observe_entries(self, entries: Iterable[Tuple[Path, os.DirEntry]],
+                        whole_tree: bool = True) -> Iterator[Tuple[Path, os.DirEntry]]:
+        """Pass walk_roots' (root, entry) pairs through, adding each file on the way, as observe does"""
+        self.complete = False
+        for root, entry in entries:
+            try:
+                self.add(entry.path, entry.stat().st_size)
+            except OSError:
+                continue
+            yield root, entry
+        self.complete = whole_tree
+
+    @profiler.timed('rollup')
+    def _rollup(self) -> Dict[str, List[int]]:
+        if self._totals is None:
+            totals = {folder: list(direct) for folder, direct in self._direct.items()}
+            # Folders without files of their own still need a row
+            for folder in list(totals):
+                for ancestor in self._ancestors(folder):
+                    if ancestor not in totals:
+                        totals[ancestor] = [0, 0]
+            # Deepest first, so each folder is complete before it is added
+            # to its parent
+            for folder in sorted(totals, key=lambda folder: folder.count(os.sep), reverse=True):
+                if folder in self._root_set:
+                    continue
+                parent = os.path.dirname(folder)
+                if parent == folder or parent not in totals:
+                    continue
+                totals[parent][0] += totals[folder][0]
+                totals[parent][1] += totals[folder][1]
+            self._totals = totals
+        return self._totals
+
+    def totals(self, folder: Union[str, Path]) -> Tuple[int, int]:
+        """(bytes, files) in ``folder``'s whole subtree"""
+        size, files = self._rollup().get(os.fspath(folder), (0, 0))
+        return size, files
+
+    def _depth(self, folder: str) -> int:
+        for ancestor_depth, ancestor in enumerate(self._ancestors(folder)):
+            if ancestor in self._root_set:
+                return ancestor_depth
+        return 0
+
+    def top(self, count: int = 10, max_depth: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """
+        The largest folders below the roots as (folder, bytes, files)
+
+        Args:
+            count: Number of folders to return
+            max_depth: Only consider folders at most this many levels below
+                their root (1 = the roots' immediate subfolders)
+        """
+        candidates = (
+            (folder, size, files)
+            for folder, (size, files) in self._rollup().items()
+            if folder not in self._root_set and files > 0
+            and (max_depth is None or self._depth(folder) <= max_depth)
+        )
+        return heapq.nlargest(count, candidates, key=lambda row: row[1])
+
+    def save(self, path: str) -> None:
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump({'roots': self.roots, 'folders': self._direct}, f)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path: str, roots: Iterable[Union[str, Path]]) -> Optional['FolderRollup']:
+        """The rollup saved at ``path``, or None if missing or saved for other roots"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        rollup = cls(roots)
+        if data.get('roots') != rollup.roots:
+            return None
+        rollup._direct = {folder: list(direct) for folder, direct in data.get('folders', {}).items()}
+        rollup.complete = True
+        return rollup
+
+    @classmethod
+    def update_saved(cls, path: str, roots: Iterable[Union[str, Path]],
+                     removed: Iterable[Tuple[str, int]] = (),
+                     added: Iterable[Tuple[str, int]] = ()) -> None:
+        """Take (path, size) files out of, or put them back into, the rollup saved at ``path``"""
+        rollup = cls.load(path, roots)
+        if rollup is None:
+            return
+        for file_path, size in removed:
+            rollup.remove(file_path, size)
+        for file_path, size in added:
+            rollup.add(file_path, size)
+        rollup.save(path)
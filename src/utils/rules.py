@@ -0,0 +1,358 @@
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    from .sniffer import ContentSniffer
+
+ACTIONS = ('keep', 'delete', 'archive')
+SECONDS_PER_DAY = 86400
+BYTES_PER_MB = 1024 * 1024
+
+T = TypeVar('T')
+
+# Group references that would point at the wrong group, or clash, once a
+# rule's regex is combined with the others in its folder
+_GROUP_REFERENCE = re.compile(r'(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?P=|\(\?\()')
+
+def glob_to_regex(glob: str) -> str:
+    """
+    Translate a glob into an unanchored regex over '/'-separated paths
+
+    ``*`` and ``?`` stay within one path segment, ``**`` crosses segments.
+    """
+    out = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[' and glob.find(']', i + 2) != -1:
+            end = glob.find(']', i + 2)
+            body = glob[i + 1:end].replace('\\', '\\\\')
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            out.append(f'[{body}]')
+            i = end + 1
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    One policy rule from the ``rules`` list in config.json
+
+    A rule applies to files under ``path`` (the whole downloads folder when
+    empty) whose name matches one of the ``match`` globs, whose relative
+    path matches ``regex``, whose content is one of the sniffed ``type``s,
+    and which reach the age and size thresholds. Globs containing '/' are
+    matched against the path below ``path``.
+    """
+    action: str
+    path: str = ''
+    match: Tuple[str, ...] = ()
+    regex: Optional[str] = None
+    min_age_days: Optional[float] = None
+    min_size_mb: Optional[float] = None
+    archive_to: Optional[str] = None
+    types: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], number: int = 0) -> 'Rule':
+        unknown = set(data) - {'action', 'path', 'match', 'regex', 'type', 'min_age_days', 'min_size_mb', 'archive_to'}
+        if unknown:
+            raise ValueError(f"Rule {number}: unknown keys {', '.join(sorted(unknown))}")
+        action = data.get('action')
+        if action not in ACTIONS:
+            raise ValueError(f"Rule {number}: action must be one of {', '.join(ACTIONS)}")
+        match = data.get('match', ())
+        if isinstance(match, str):
+            match = (match,)
+        types = data.get('type', ())
+        if isinstance(types, str):
+            types = (types,)
+        regex = data.get('regex')
+        if regex is not None:
+            try:
+                compiled = re.compile(regex)
+            except re.error as e:
+                raise ValueError(f"Rule {number}: invalid regex: {e}") from None
+            if compiled.groupindex or _GROUP_REFERENCE.search(regex):
+                raise ValueError(f"Rule {number}: regex cannot use named groups or backreferences")
+        rule = cls(
+            action=action,
+            path=data.get('path', '').replace('\\', '/').strip('/'),
+            match=tuple(match),
+            regex=regex,
+            min_age_days=data.get('min_age_days'),
+            min_size_mb=data.get('min_size_mb'),
+            archive_to=data.get('archive_to'),
+            types=tuple(file_type.lower().lstrip('.') for file_type in types),
+        )
+        try:
+            # Flags like (?i) only compile at the start of a whole pattern
+            re.compile(rule.pattern())
+        except re.error as e:
+            raise ValueError(f"Rule {number}: invalid regex: {e}") from None
+        return rule
+
+    @property
+    def unconditional(self) -> bool:
+        """Whether the rule applies to every file in its subtree"""
+        return (not self.match and self.regex is None and not self.types
+                and not self.min_age_days and not self.min_size_mb)
+
+    def pattern(self) -> str:
+        """Regex matched from the start of a '/'-separated path relative to the downloads folder"""
+        parts = []
+        scope = re.escape(self.path + '/') if self.path else ''
+        for glob in self.match:
+            if '/' in glob:
+                parts.append(f"{scope}(?i:{glob_to_regex(glob.strip('/'))})\\Z")
+            else:
+                parts.append(f"(?:.*/)?(?i:{glob_to_regex(glob)})\\Z")
+        pattern = '|'.join(parts)
+        if self.regex is not None:
+            # Search semantics inside a match: the lookahead may start anywhere
+            search = f"(?=.*?(?:{self.regex}))"
+            pattern = f"(?=(?:{pattern}))(?:{search})" if pattern else search
+        return pattern
+
+    def reaches_thresholds(self, size: int, age_days: int, content_type: Optional[str] = None) -> bool:
+        if self.min_age_days and age_days < self.min_age_days:
+            return False
+        if self.min_size_mb and size < self.min_size_mb * BYTES_PER_MB:
+            return False
+        if self.types and content_type not in self.types:
+            return False
+        return True
+
+@dataclass(frozen=True)
+class Decision:
+    action: str
+    archive_to: Optional[str] = None
+    rule: Optional[Rule] = None  # The deciding rule, if any
+
+class _TrieNode:
+    __slots__ = ('children', 'rules')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.rules: List[Rule] = []
+
+class FolderPolicy:
+    """
+    The rules that apply inside one folder, compiled into a single regex
+
+    Rules are ordered deepest subtree first and in config order within a
+    subtree. The combined regex finds the first rule whose pattern matches;
+    only when that rule's thresholds are not reached are later rules tried.
+    """
+    __slots__ = ('rules', 'patterns', 'combined', 'prunable')
+
+    def __init__(self, rules: List[Rule], has_deeper_rules: bool):
+        self.rules = rules
+        self.patterns = [re.compile(rule.pattern(), re.S) for rule in rules]
+        self.combined = re.compile(
+            '|'.join(f"(?P<_r{i}>{rule.pattern()})" for i, rule in enumerate(rules)),
+            re.S
+        )
+        # Nothing below the folder can be acted on when it starts with an
+        # unconditional keep that no deeper rule overrides
+        self.prunable = bool(rules) and not has_deeper_rules and rules[0].unconditional and rules[0].action == 'keep'
+
+    def first_match(self, relative_path: str, size: int, age_days: int,
+                    content_type: Optional[str] = None) -> Optional[Rule]:
+        match = self.combined.match(relative_path)
+        if not match:
+            return None
+        start = int(match.lastgroup[2:])
+        for i in range(start, len(self.rules)):
+            if i > start and not self.patterns[i].match(relative_path):
+                continue
+            if self.rules[i].reaches_thresholds(size, age_days, content_type):
+                return self.rules[i]
+        return None
+
+class RuleSet:
+    """
+    Compiled cleaning policy: the ``rules`` list plus the global settings
+
+    Rule subtrees are stored in a trie of path segments, so the rules that
+    apply in a folder are collected with one walk down the trie and then
+    compiled once per folder. The global ``max_age_days``, ``min_size_mb``,
+    ``exclude_extensions`` and ``exclude_types`` settings act as the final
+    fallback rules, and ``exclude_folders`` names are never walked. Files
+    are only sniffed for their content type when some rule asks for one.
+    """
+
+    def __init__(self, rules: Iterable[Rule], exclude_folders: Iterable[str] = (),
+                 exclude_extensions: Iterable[str] = (), min_age: float = 0,
+                 min_size: float = 0, archive_path: Optional[str] = None,
+                 exclude_types: Iterable[str] = ()):
+        self.rules = list(rules)
+        self.exclude_folders = set(exclude_folders)
+        self.archive_path = archive_path
+        self._root = _TrieNode()
+        for rule in self.rules:
+            node = self._root
+            for segment in filter(None, rule.path.lower().split('/')):
+                node = node.children.setdefault(segment, _TrieNode())
+            node.rules.append(rule)
+
+        fallback = []
+        extensions = [ext for ext in exclude_extensions if ext]
+        if extensions:
+            fallback.append(Rule(action='keep', match=tuple(f"*.{ext}" for ext in extensions)))
+        types = tuple(file_type.lower().lstrip('.') for file_type in exclude_types if file_type)
+        if types:
+            fallback.append(Rule(action='keep', types=types))
+        fallback.append(Rule(action='delete', min_age_days=min_age, min_size_mb=min_size))
+        self._fallback = fallback
+        self._policies: Dict[str, FolderPolicy] = {}
+        # Folders reaching the same trie node share one compiled policy
+        self._compiled: Dict[Tuple[int, bool], FolderPolicy] = {}
+        self.needs_types = any(rule.types for rule in self.rules + fallback)
+        self._sniffer: Optional['ContentSniffer'] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], min_age: Optional[float] = None,
+                    min_size: Optional[float] = None) -> 'RuleSet':
+        """
+        Compile the rules in ``config``
+
+        Args:
+            min_age: Overrides max_age_days for files no rule matches
+            min_size: Overrides min_size_mb for files no rule matches
+        """
+        rules = [Rule.from_dict(data, number) for number, data in enumerate(config.get('rules', []), 1)]
+        return cls(
+            rules,
+            exclude_folders=config.get('exclude_folders', []),
+            exclude_extensions=config.get('exclude_extensions', []),
+            min_age=min_age if min_age is not None else config.get('max_age_days', 0),
+            min_size=min_size if min_size is not None else config.get('min_size_mb', 0),
+            archive_path=config.get('archive_path'),
+            exclude_types=config.get('exclude_types', []),
+        )
+
+    @property
+    def is_default(self) -> bool:
+        """Whether only the global age, size and extension settings are in effect"""
+        return not self.rules and not self.needs_types
+
+    @property
+    def signature(self) -> str:
+        """Identifies what the walker may prune, for caches of walked folders"""
+        return json.dumps([rule.__dict__ for rule in self.rules if rule.unconditional and rule.action == 'keep'])
+
+    def policy(self, folder: str) -> FolderPolicy:
+        """Compiled policy for a '/'-separated folder path relative to the downloads folder"""
+        policy = self._policies.get(folder)
+        if policy is None:
+            scopes = [self._root.rules]
+            node = self._root
+            inside = True  # Whether every segment of the folder is in the trie
+            for segment in filter(None, folder.lower().split('/')):
+                child = node.children.get(segment)
+                if child is None:
+                    inside = False
+                    break
+                node = child
+                scopes.append(node.rules)
+            key = (id(node), inside)
+            policy = self._compiled.get(key)
+            if policy is None:
+                rules = [rule for scope in reversed(scopes) for rule in scope] + self._fallback
+                policy = FolderPolicy(rules, has_deeper_rules=inside and bool(node.children))
+                self._compiled[key] = policy
+            self._policies[folder] = policy
+        return policy
+
+    def decide(self, relative_path: str, size: int, mtime: float, now: Optional[float] = None,
+               content_type: Optional[str] = None) -> Decision:
+        """
+        Decide what to do with one file
+
+        Args:
+            relative_path: Path relative to the downloads folder
+            size: Size in bytes
+            mtime: Modification time in seconds since the epoch
+            content_type: Sniffed type (see iter_typed); rules with a
+                ``type`` never match without one
+        """
+        relative_path = relative_path.replace(os.sep, '/')
+        folder = relative_path.rpartition('/')[0]
+        age_days = int(((now or time.time()) - mtime) // SECONDS_PER_DAY)
+        rule = self.policy(folder).first_match(relative_path, size, age_days, content_type)
+        if rule is None or rule.action == 'keep':
+            return Decision('keep', rule=rule)
+        archive_to = None
+        if rule.action == 'archive':
+            archive_to = os.path.expanduser(rule.archive_to or self.archive_path)
+        return Decision(rule.action, archive_to, rule)
+
+    def pruner(self, root: str) -> Callable[[str], bool]:
+        """Predicate telling the walker which folders under ``root`` it can skip entirely"""
+        prefix = os.path.join(os.fspath(root), '')
+
+        def prune(path: str) -> bool:
+            folder = path[len(prefix):].replace(os.sep, '/')
+            return self.policy(folder).prunable
+        return prune
+
+    def iter_typed(self, items: Iterable[T], path_of: Callable[[T], str],
+                   stat_of: Optional[Callable[[T], Optional[os.stat_result]]] = None) -> Iterator[Tuple[T, Optional[str]]]:
+        """Pair items with their sniffed content type, or None when no rule needs it"""
+        if not self.needs_types:
+            for item in items:
+                yield item, None
+            return
+        if self._sniffer is None:
+            from .sniffer import ContentSniffer
+            self._sniffer = ContentSniffer()
+        yield from self._sniffer.iter_classified(items, path_of, stat_of)
+
+    def iter_actionable(self, infos: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield the get_file_info dictionaries a rule deletes or archives, tagged with the decision"""
+        now = time.time()
+        for info, content_type in self.iter_typed(infos, lambda info: str(info['path'])):
+            decision = self.decide(
+                str(info['relative_path']),
+                round(info['size'] * BYTES_PER_MB),
+                info['modified'].timestamp(),
+                now,
+                content_type
+            )
+            if decision.action == 'keep':
+                continue
+            info['action'] = decision.action
+            info['archive_to'] = decision.archive_to
+            if content_type is not None:
+                info['content_type'] = content_type
+            yield info
+
+    def filter_entries(self, entries: Iterable[Tuple[Path, os.DirEntry]]) -> Iterator[os.DirEntry]:
+        """Yield the entries of walk_roots' (root, entry) pairs that a rule deletes or archives"""
+        now = time.time()
+        for (root, entry), content_type in self.iter_typed(entries, lambda pair: pair[1].path, lambda pair: pair[1].stat()):
+            try:
+                stats = entry.stat()
+            except OSError:
+                continue
+            relative_path = entry.path[len(os.path.join(os.fspath(root), '')):]
+            if self.decide(relative_path, stats.st_size, stats.st_mtime, now, content_type).action != 'keep':
+                yield entry
@@ -0,0 +1,247 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+from . import profiler
+
+# Hidden staging folder of the trash (see core.trash); never walked
+TRASH_DIR_NAME = '.dropclear-trash'
+
+class IndexedEntry:
+    """File entry served from the scan index, mirroring the os.DirEntry interface"""
+    __slots__ = ('path', 'name', '_stats')
+
+    def __init__(self, path: str, stats: os.stat_result):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stats = stats
+
+    def stat(self) -> os.stat_result:
+        return self._stats
+
+class ScanIndex:
+    """
+    Persistent SQLite index of directory mtimes and the files beneath them
+
+    A directory's mtime changes whenever an entry is added, removed or renamed
+    in it, so directories whose mtime still matches the index are served from
+    the stored records without being listed again. Files modified in place
+    keep their indexed size and times until their directory is relisted, so
+    callers re-check a file before acting on it and ``mark_stale`` the
+    folders of files that turned out to have changed.
+
+    Each root keeps separate records for rule-pruned walks and for full
+    walks (top, usage, rollups), since a pruned walk leaves subtrees out.
+    Each such view is keyed by its excluded and pruned folders and only
+    that view is emptied when they change, so alternating kinds of scans
+    never rebuild one another's records.
+
+    Scans may run from several threads at once (one per root in
+    walk_roots) or be resumed on another thread between entries (as the
+    asyncio wrappers do), so the one connection is shared across threads
+    and every group of statements holds the lock, as in TypeCache.
+    """
+
+    # Bumped when the tables change; older index files are rebuilt
+    SCHEMA_VERSION = 2
+
+    def __init__(self, index_file: str):
+        self.index_file = index_file
+        self.conn = sqlite3.connect(index_file, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock, self.conn:
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                self.conn.executescript("""
+                    DROP TABLE IF EXISTS meta;
+                    DROP TABLE IF EXISTS views;
+                    DROP TABLE IF EXISTS dirs;
+                    DROP TABLE IF EXISTS files;
+                """)
+                self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS views (
+                    id INTEGER PRIMARY KEY,
+                    root TEXT,
+                    kind TEXT,
+                    signature TEXT,
+                    UNIQUE (root, kind)
+                );
+                CREATE TABLE IF NOT EXISTS dirs (
+                    view INTEGER,
+                    path TEXT,
+                    parent TEXT,
+                    mtime_ns INTEGER,
+                    PRIMARY KEY (view, path)
+                );
+                CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(view, parent);
+                CREATE INDEX IF NOT EXISTS dirs_path ON dirs(path);
+                CREATE TABLE IF NOT EXISTS files (
+                    view INTEGER,
+                    path TEXT,
+                    dir TEXT,
+                    size INTEGER,
+                    atime REAL,
+                    mtime REAL,
+                    PRIMARY KEY (view, path)
+                );
+                CREATE INDEX IF NOT EXISTS files_dir ON files(view, dir);
+            """)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def clear(self) -> None:
+        """Drop every indexed directory and file"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM views")
+            self.conn.execute("DELETE FROM dirs")
+            self.conn.execute("DELETE FROM files")
+
+    def mark_stale(self, paths: Iterable[str]) -> None:
+        """Have the next scan list the folders of ``paths`` again, e.g. of files modified in place"""
+        folders = {os.path.dirname(path) for path in paths}
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE dirs SET mtime_ns = NULL WHERE path = ?", [(folder,) for folder in folders])
+
+    def _view(self, root: str, kind: str, exclude_folders: List[str], prune_signature: str = '') -> int:
+        """
+        The id of the records ``kind`` walks keep for ``root``
+
+        They are emptied when the excluded or pruned folders differ from
+        the ones they were indexed with.
+        """
+        signature = json.dumps([sorted(exclude_folders), prune_signature])
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT id, signature FROM views WHERE root = ? AND kind = ?", (root, kind)
+            ).fetchone()
+            if row is None:
+                return self.conn.execute(
+                    "INSERT INTO views (root, kind, signature) VALUES (?, ?, ?)", (root, kind, signature)
+                ).lastrowid
+            view, indexed = row
+            if indexed != signature:
+                self.conn.execute("DELETE FROM dirs WHERE view = ?", (view,))
+                self.conn.execute("DELETE FROM files WHERE view = ?", (view,))
+                self.conn.execute("UPDATE views SET signature = ? WHERE id = ?", (signature, view))
+            return view
+
+    def _forget(self, view: int, path: str) -> None:
+        """Remove a directory and everything indexed beneath it"""
+        prefix = os.path.join(path, '')
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM dirs WHERE view = ? AND (path = ? OR substr(path, 1, ?) = ?)",
+                (view, path, len(prefix), prefix)
+            )
+            self.conn.execute(
+                "DELETE FROM files WHERE view = ? AND (dir = ? OR substr(dir, 1, ?) = ?)",
+                (view, path, len(prefix), prefix)
+            )
+
+    def scan(self, path: Union[str, os.PathLike],
+             exclude_folders: Optional[List[str]] = None,
+             prune: Optional[Callable[[str], bool]] = None,
+             prune_signature: str = '') -> Iterator[Union[os.DirEntry, IndexedEntry]]:
+        """
+        Walk directory incrementally and yield file entries
+
+        Only directories whose mtime changed since the last scan are listed;
+        everything else is served from the index. Changes are committed as the
+        walk progresses, so stopping early keeps what was already refreshed.
+
+        Args:
+            path: Root directory to walk
+            exclude_folders: Folder names to skip at any level of the tree
+            prune: Called with each subdirectory's path; subtrees it returns
+                True for are skipped and left out of the index
+            prune_signature: Identifies what ``prune`` skips; this root's
+                pruned records are rebuilt when it changes
+        """
+        exclude_folders = set(exclude_folders or [])
+        root = os.fspath(path)
+        view = self._view(root, 'pruned' if prune else 'full', list(exclude_folders), prune_signature)
+        exclude_folders.add(TRASH_DIR_NAME)
+        stack = [root]
+        try:
+            while stack:
+                current = stack.pop()
+                try:
+                    mtime_ns = os.stat(current).st_mtime_ns
+                    profiler.count('stat_calls')
+                except OSError:
+                    self._forget(view, current)
+                    continue
+
+                with self._lock:
+                    row = self.conn.execute(
+                        "SELECT mtime_ns FROM dirs WHERE view = ? AND path = ?", (view, current)
+                    ).fetchone()
+                    if row and row[0] == mtime_ns:
+                        subdirs = self.conn.execute(
+                            "SELECT path FROM dirs WHERE view = ? AND parent = ?", (view, current)
+                        ).fetchall()
+                        records = self.conn.execute(
+                            "SELECT path, size, atime, mtime FROM files WHERE view = ? AND dir = ?", (view, current)
+                        ).fetchall()
+                if row and row[0] == mtime_ns:
+                    stack.extend(subdir for (subdir,) in subdirs)
+                    for file_path, size, atime, mtime in records:
+                        stats = os.stat_result((0, 0, 0, 0, 0, 0, size, atime, mtime, mtime))
+                        yield IndexedEntry(file_path, stats)
+                    continue
+
+                # Directory is new or changed: list it and refresh its records
+                entries = []
+                subdirs = []
+                try:
+                    with os.scandir(current) as listing:
+                        profiler.count('directories_listed')
+                        for entry in listing:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    if entry.name not in exclude_folders and not (prune and prune(entry.path)):
+                                        subdirs.append(entry.path)
+                                elif entry.is_file():
+                                    entry.stat()
+                                    profiler.count('stat_calls')
+                                    entries.append(entry)
+                            except OSError:
+                                continue  # Entry vanished or is unreadable
+                except OSError:
+                    self._forget(view, current)
+                    continue
+
+                with self._lock:
+                    indexed_subdirs = self.conn.execute(
+                        "SELECT path FROM dirs WHERE view = ? AND parent = ?", (view, current)
+                    ).fetchall()
+                    for (subdir,) in indexed_subdirs:
+                        if subdir not in subdirs:
+                            self._forget(view, subdir)
+
+                    self.conn.execute("DELETE FROM files WHERE view = ? AND dir = ?", (view, current))
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO files (view, path, dir, size, atime, mtime) VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (view, entry.path, current, entry.stat().st_size,
+                             entry.stat().st_atime, entry.stat().st_mtime)
+                            for entry in entries
+                        ]
+                    )
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO dirs (view, path, parent, mtime_ns) VALUES (?, ?, ?, ?)",
+                        (view, current, os.path.dirname(current), mtime_ns)
+                    )
+                    self.conn.commit()
+
+                stack.extend(subdirs)
+                yield from entries
+        finally:
+            with self._lock:
+                self.conn.commit()
@@ -0,0 +1,300 @@
+"""
+Content-type detection from file headers
+
+Browser downloads often arrive without an extension or with a wrong one
+(``download``, ``file.bin``, an ``invoice.php`` that is really a PDF). The
+sniffer reads only the first few KiB of a file and matches them against
+magic-byte signatures. Types are named after their usual extension, so rules
+and archive extension lists can name them the same way.
+"""
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from . import profiler
+
+# Bytes read from the start of each file
+SNIFF_SIZE = 4096
+# Files classified per pool round trip when streaming
+CHUNK_SIZE = 256
+
+# (type, offset, magic); checked in order, so more specific signatures
+# come before the generic ones they share a prefix with
+SIGNATURES: Tuple[Tuple[str, int, bytes], ...] = (
+    ('pdf', 0, b'%PDF-'),
+    ('png', 0, b'\x89PNG\r\n\x1a\n'),
+    ('jpg', 0, b'\xff\xd8\xff'),
+    ('gif', 0, b'GIF87a'),
+    ('gif', 0, b'GIF89a'),
+    ('bmp', 0, b'BM'),
+    ('tiff', 0, b'II*\x00'),
+    ('tiff', 0, b'MM\x00*'),
+    ('ico', 0, b'\x00\x00\x01\x00'),
+    ('psd', 0, b'8BPS'),
+    ('heic', 4, b'ftypheic'),
+    ('heic', 4, b'ftypmif1'),
+    ('mov', 4, b'ftypqt'),
+    ('m4a', 4, b'ftypM4A'),
+    ('mp4', 4, b'ftyp'),
+    ('mp3', 0, b'ID3'),
+    ('flac', 0, b'fLaC'),
+    ('ogg', 0, b'OggS'),
+    ('mid', 0, b'MThd'),
+    ('gz', 0, b'\x1f\x8b'),
+    ('bz2', 0, b'BZh'),
+    ('xz', 0, b'\xfd7zXZ\x00'),
+    ('zst', 0, b'\x28\xb5\x2f\xfd'),
+    ('7z', 0, b"7z\xbc\xaf'\x1c"),
+    ('rar', 0, b'Rar!\x1a\x07'),
+    ('cab', 0, b'MSCF'),
+    ('ole', 0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'),
+    ('rtf', 0, b'{\\rtf'),
+    ('exe', 0, b'MZ'),
+    ('elf', 0, b'\x7fELF'),
+    ('deb', 0, b'!<arch>\ndebian'),
+    ('sqlite', 0, b'SQLite format 3\x00'),
+    ('torrent', 0, b'd8:announce'),
+    ('woff', 0, b'wOFF'),
+    ('woff2', 0, b'wOF2'),
+    ('ttf', 0, b'\x00\x01\x00\x00\x00'),
+    ('otf', 0, b'OTTO'),
+    ('wasm', 0, b'\x00asm'),
+)
+# RIFF containers: (type, form type at offset 8)
+RIFF_FORMS = (('webp', b'WEBP'), ('wav', b'WAVE'), ('avi', b'AVI '))
+# ZIP-based formats, told apart by names in the first entries
+ZIP_MEMBERS = (
+    ('docx', b'word/'), ('xlsx', b'xl/'), ('pptx', b'ppt/'),
+    ('odt', b'opendocument.text'), ('ods', b'opendocument.spreadsheet'),
+    ('epub', b'application/epub+zip'), ('apk', b'AndroidManifest.xml'),
+    ('jar', b'META-INF/MANIFEST.MF'),
+)
+TEXT_PREFIXES = (('html', (b'<!doctype html', b'<html')), ('svg', (b'<svg',)), ('xml', (b'<?xml',)))
+# Downloads still being written by a browser; never sniffed, so a partial
+# report.pdf.crdownload is not archived from under the browser
+PARTIAL_SUFFIXES = frozenset(('crdownload', 'part', 'partial', 'download', 'tmp', 'opdownload'))
+# Extensions that say nothing about the content: server script names,
+# generic binary blobs, or none at all
+GENERIC_SUFFIXES = frozenset(('', 'bin', 'dat', 'data', 'php', 'asp', 'aspx', 'jsp', 'cgi', 'file', 'unknown'))
+
+def _suffix(path: str) -> str:
+    name = os.path.basename(path)
+    dot = name.rfind('.')
+    return name[dot + 1:].lower() if dot > 0 else ''
+
+def is_partial(path: str) -> bool:
+    """Whether ``path`` is a download still in progress, judged by its name"""
+    return _suffix(path) in PARTIAL_SUFFIXES
+
+def needs_sniffing(path: str) -> bool:
+    """Whether the extension of ``path`` is too generic to say what the file is"""
+    return _suffix(path) in GENERIC_SUFFIXES
+
+def sniff_header(header: bytearray, length: int) -> str:
+    """
+    Detected type of a file whose first ``length`` bytes are in ``header``
+
+    Works on the caller's buffer in place. Returns '' when no signature
+    matches.
+    """
+    if header.startswith(b'PK\x03\x04', 0, length):
+        for file_type, member in ZIP_MEMBERS:
+            if header.find(member, 0, length) != -1:
+                return file_type
+        return 'zip'
+    if header.startswith(b'RIFF', 0, length):
+        for file_type, form in RIFF_FORMS:
+            if header.startswith(form, 8, length):
+                return file_type
+        return ''
+    if header.startswith(b'\x1a\x45\xdf\xa3', 0, length):
+        return 'webm' if header.find(b'webm', 0, min(length, 64)) != -1 else 'mkv'
+    for file_type, offset, magic in SIGNATURES:
+        if header.startswith(magic, offset, length):
+            return file_type
+    if length > 2 and header[0] == 0xff and header[1] & 0xe0 == 0xe0:
+        return 'mp3'  # MPEG audio frame sync without an ID3 tag
+    # Markup, after an optional byte order mark and leading whitespace
+    text = bytes(header[:min(length, 512)]).lstrip(b'\xef\xbb\xbf').lstrip().lower()
+    for file_type, prefixes in TEXT_PREFIXES:
+        if text.startswith(prefixes):
+            if file_type == 'xml' and b'<svg' in text:
+                return 'svg'
+            return file_type
+    return ''
+
+_local = threading.local()
+
+def sniff_file(path: str) -> Optional[str]:
+    """
+    Detected type of the file at ``path``, or None if it cannot be read
+
+    The header is read with ``readinto`` into a buffer each thread reuses
+    for every file, so sniffing allocates nothing per file.
+    """
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = _local.buffer = bytearray(SNIFF_SIZE)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            length = f.readinto(buffer)
+    except OSError:
+        return None
+    return sniff_header(buffer, length)
+
+# (device, inode, size, mtime in nanoseconds), as in HashCache
+FileKey = Tuple[int, int, int, int]
+
+class TypeCache:
+    """
+    Persistent SQLite cache of detected types
+
+    Keyed like HashCache by (device, inode, size, mtime), so each file is
+    sniffed once for as long as it stays unchanged.
+    """
+
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        # Streaming callers may resume on another thread; the lock keeps
+        # the connection to one user at a time
+        self.conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS types (
+                    dev INTEGER,
+                    ino INTEGER,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    type TEXT,
+                    PRIMARY KEY (dev, ino, size, mtime_ns)
+                )
+            """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, keys: Sequence[FileKey]) -> List[Optional[str]]:
+        """Cached type for each key, or None where there is none"""
+        with self._lock:
+            return [
+                row[0] if row else None
+                for row in (
+                    self.conn.execute(
+                        "SELECT type FROM types WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?", key
+                    ).fetchone()
+                    for key in keys
+                )
+            ]
+
+    def put(self, items: Iterable[Tuple[FileKey, str]]) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO types (dev, ino, size, mtime_ns, type) VALUES (?, ?, ?, ?, ?)",
+                [key + (file_type,) for key, file_type in items]
+            )
+
+_default_cache_file: Optional[str] = None
+
+def use_cache(cache_file: Optional[str]) -> None:
+    """Set the cache file ContentSniffer instances use when given none"""
+    global _default_cache_file
+    _default_cache_file = cache_file
+
+def _key(path: str, stats: Optional[os.stat_result] = None) -> Optional[FileKey]:
+    """
+    Cache key of ``path``, from ``stats`` when given
+
+    Stats without an inode (DirEntry stats on Windows, or scan index
+    entries) cannot tell files apart, so those are stat'ed again.
+    """
+    if stats is None or not stats.st_ino:
+        try:
+            stats = os.stat(path)
+        except OSError:
+            return None
+        profiler.count('stat_calls')
+    return stats.st_dev, stats.st_ino, stats.st_size, stats.st_mtime_ns
+
+T = TypeVar('T')
+
+def _stat_or_none(stat_of: Callable[[T], Optional[os.stat_result]], item: T) -> Optional[os.stat_result]:
+    try:
+        return stat_of(item)
+    except OSError:
+        return None
+
+class ContentSniffer:
+    """
+    Classify files by content on a thread pool, with a persistent cache
+
+    Cache lookups and writes happen in one batch per call; only the
+    misses are opened and read.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None, max_workers: int = 8):
+        cache_file = cache_file or _default_cache_file
+        self.cache = TypeCache(cache_file) if cache_file else None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sniff')
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        if self.cache:
+            self.cache.close()
+
+    @profiler.timed('sniff')
+    def classify(self, paths: Sequence[str], stats: Optional[Sequence[Optional[os.stat_result]]] = None) -> List[str]:
+        """
+        Detected type of each path ('' for unknown or unreadable files)
+
+        Args:
+            paths: Files to classify; partial downloads are never opened
+            stats: The walker's stats of each path, reused for the cache key
+                instead of another stat call
+        """
+        stats = stats or [None] * len(paths)
+        keys: List[Optional[FileKey]] = [None] * len(paths)
+        restat = []
+        for i, (path, file_stats) in enumerate(zip(paths, stats)):
+            if is_partial(path):
+                continue
+            if file_stats is not None and file_stats.st_ino:
+                keys[i] = _key(path, file_stats)
+            else:
+                restat.append(i)
+        for i, key in zip(restat, self.executor.map(_key, [paths[i] for i in restat])):
+            keys[i] = key
+        known = [key for key in keys if key]
+        cached = iter(self.cache.get(known) if self.cache else [None] * len(known))
+        # Partial downloads and files that vanished since they were listed
+        # have no type
+        types: List[Optional[str]] = [next(cached) if key else '' for key in keys]
+
+        misses = [i for i, file_type in enumerate(types) if file_type is None]
+        found = []
+        for i, file_type in zip(misses, self.executor.map(sniff_file, [paths[i] for i in misses])):
+            types[i] = file_type or ''
+            if file_type is not None:
+                found.append((keys[i], file_type))
+        profiler.count('files_sniffed', len(misses))
+        if self.cache and found:
+            self.cache.put(found)
+        return types
+
+    def iter_classified(self, items: Iterable[T], path_of: Callable[[T], str],
+                        stat_of: Optional[Callable[[T], Optional[os.stat_result]]] = None) -> Iterator[Tuple[T, str]]:
+        """
+        Stream (item, type) pairs, classifying a chunk of items at a time
+
+        ``stat_of`` gives an item's already known stats, such as a walked
+        DirEntry's cached ones; an OSError from it counts as unknown.
+        """
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, CHUNK_SIZE))
+            if not chunk:
+                return
+            stats = [_stat_or_none(stat_of, item) for item in chunk] if stat_of else None
+            yield from zip(chunk, self.classify([path_of(item) for item in chunk], stats))
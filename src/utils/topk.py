@@ -0,0 +1,39 @@
+import heapq
+from itertools import count
+from typing import Any, Generic, List, Tuple, TypeVar
+
+T = TypeVar('T')
+
+class TopK(Generic[T]):
+    """
+    The ``k`` highest-keyed items offered, kept in a min-heap of size ``k``
+
+    ``admits`` is a cheap check callers make before building an item, so
+    the cost of everything that cannot make the cut is one comparison.
+    On equal keys, the item offered first ranks higher.
+    """
+    __slots__ = ('k', '_heap', '_order')
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: List[Tuple[Any, int, T]] = []
+        self._order = count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def admits(self, key: Any) -> bool:
+        return self.k > 0 and (len(self._heap) < self.k or key > self._heap[0][0])
+
+    def offer(self, key: Any, item: T) -> None:
+        if not self.admits(key):
+            return
+        entry = (key, -next(self._order), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> List[T]:
+        """The kept items, highest key first"""
+        return [item for *_, item in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
@@ -0,0 +1,36 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+import pytest
+from src.utils.config import Config
+
+# A modification time comfortably older than any max_age_days in the tests
+OLD_MTIME = 946684800  # 2000-01-01
+
+def make_file(path: Path, size: int = 16, mtime: Optional[float] = OLD_MTIME) -> Path:
+    """Create ``path`` holding ``size`` bytes, with its parents and the given mtime"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(os.urandom(size))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+@pytest.fixture
+def downloads(tmp_path: Path) -> Path:
+    root = tmp_path / 'Downloads'
+    root.mkdir()
+    return root
+
+@pytest.fixture
+def config(tmp_path: Path, downloads: Path) -> Dict[str, Any]:
+    """Default settings pointed at the temporary downloads folder, with no size or age floor"""
+    config = Config.default_config()
+    config.update(
+        downloads_path=str(downloads),
+        archive_path=str(tmp_path / 'Archive'),
+        min_size_mb=0,
+        max_age_days=1,
+        exclude_extensions=[],
+        exclude_folders=['node_modules'],
+    )
+    return config
@@ -0,0 +1,68 @@
+import os
+from pathlib import Path
+import pytest
+from src.core import cleaner as cleaner_module
+from src.core.archiver import FileArchiver
+from src.core.checkpoint import RunCheckpoint
+from src.core.cleaner import FileCleaner
+from src.core.transfer import TransferEngine
+from .conftest import make_file
+
+@pytest.fixture
+def checkpoint_dir(tmp_path: Path) -> str:
+    return str(tmp_path / 'checkpoints')
+
+def _interrupt(*args, **kwargs):
+    raise KeyboardInterrupt
+
+def test_plan_round_trip_and_torn_done_line(checkpoint_dir):
+    items = [[f"/file{i}", i, 0.0] for i in range(3000)]
+    checkpoint = RunCheckpoint.create(checkpoint_dir, 'clean', {'delete_mode': 'delete'}, items)
+    checkpoint.mark_done(0)
+    checkpoint.mark_done(2)
+    checkpoint.flush()
+    with open(checkpoint.path, 'a') as f:
+        f.write('{"done": [1')
+
+    state = RunCheckpoint.load(checkpoint_dir, 'clean')
+    assert state.items == items
+    assert state.done == {0, 2}
+    assert state.remaining[:2] == [1, 3]
+
+def test_interrupted_clean_resumes_and_leaves_replaced_files(downloads, config, checkpoint_dir, monkeypatch):
+    paths = [make_file(downloads / f"file{i}.bin") for i in range(3)]
+    cleaner = FileCleaner(config, checkpoint_dir=checkpoint_dir)
+    files = list(cleaner.iter_files_to_clean())
+    assert len(files) == 3
+
+    monkeypatch.setattr(cleaner_module, '_delete_batch', _interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        cleaner.clean_files(files)
+    monkeypatch.undo()
+    assert RunCheckpoint.pending(checkpoint_dir, 'clean')
+
+    # A new download now sits where a planned file was
+    paths[1].write_bytes(b'a different file')
+    result = cleaner.resume_clean()
+    assert sorted(result.deleted) == sorted(str(path) for path in (paths[0], paths[2]))
+    assert [path for path, _ in result.errors] == [str(paths[1])]
+    assert paths[1].exists()
+    assert not RunCheckpoint.pending(checkpoint_dir, 'clean')
+    assert cleaner.resume_clean() is None
+
+def test_interrupted_archive_resumes_without_rescanning(downloads, config, checkpoint_dir, monkeypatch):
+    paths = [make_file(downloads / 'docs' / f"report{i}.pdf") for i in range(3)]
+    archiver = FileArchiver(config, checkpoint_dir=checkpoint_dir)
+    monkeypatch.setattr(TransferEngine, 'transfer', _interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        archiver.archive_files(['pdf'])
+    monkeypatch.undo()
+
+    # Files added after the plan was written are not picked up by the resume
+    make_file(downloads / 'late.pdf')
+    archive_path, archived = archiver.resume_archive()
+    assert archive_path == Path(config['archive_path'])
+    assert sorted(archived) == sorted(os.path.join('docs', path.name) for path in paths)
+    assert all((archive_path / 'docs' / path.name).exists() for path in paths)
+    assert (downloads / 'late.pdf').exists()
+    assert archiver.resume_archive() is None
@@ -0,0 +1,51 @@
+import os
+from pathlib import Path
+import pytest
+from src.core.archiver import FileArchiver
+from src.core.cleaner import FileCleaner
+from src.utils.file_utils import walk_roots
+from .conftest import make_file
+
+@pytest.fixture
+def index_file(tmp_path: Path) -> str:
+    return str(tmp_path / 'scan_index.db')
+
+def _rewrite_in_place(path: Path, size: int) -> None:
+    """Replace a file's content without touching its folder's mtime"""
+    folder_mtime = os.stat(path.parent).st_mtime_ns
+    with open(path, 'r+b') as f:
+        f.write(os.urandom(size))
+    assert os.stat(path.parent).st_mtime_ns == folder_mtime
+
+@pytest.mark.parametrize('delete_mode', ['delete', 'trash'])
+def test_files_rewritten_after_an_indexed_scan_are_not_cleaned(downloads, config, index_file, delete_mode):
+    rewritten = make_file(downloads / 'report.pdf', 10)
+    stale = make_file(downloads / 'old.pdf', 10)
+    cleaner = FileCleaner(config, index_file)
+    list(cleaner.iter_files_to_clean())
+    _rewrite_in_place(rewritten, 5000)
+
+    # The index still serves the old size and mtime
+    files = list(cleaner.iter_files_to_clean())
+    assert sorted(Path(info['path']).name for info in files) == ['old.pdf', 'report.pdf']
+    result = cleaner.clean_files(files, delete_mode=delete_mode)
+    assert result.deleted == [str(stale)]
+    assert result.changed == [str(rewritten)]
+    assert [path for path, _ in result.errors] == [str(rewritten)]
+    assert rewritten.exists()
+
+    # Its folder is listed again, so the next scan sees the new file
+    assert list(cleaner.iter_files_to_clean()) == []
+    [(_, entry)] = walk_roots([downloads], config['exclude_folders'], index_file)
+    assert entry.stat().st_size == 5000
+
+def test_sources_rewritten_after_an_indexed_scan_are_not_archived(downloads, config, index_file):
+    rewritten = make_file(downloads / 'report.pdf', 10)
+    moved = make_file(downloads / 'old.pdf', 10)
+    archiver = FileArchiver(config, index_file)
+    infos = list(FileCleaner(config, index_file).iter_files_to_clean())
+    _rewrite_in_place(rewritten, 5000)
+
+    archived = archiver.move_files(infos, config['archive_path'])
+    assert archived == ['old.pdf']
+    assert rewritten.exists() and not moved.exists()
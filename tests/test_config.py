@@ -0,0 +1,30 @@
+import json
+from src.utils.config import Config
+
+def test_missing_settings_are_filled_silently_and_saved_once(tmp_path, downloads, monkeypatch, capsys):
+    config_file = tmp_path / 'config.json'
+    config_file.write_text(json.dumps({
+        'downloads_path': str(downloads),
+        'archive_path': str(tmp_path / 'Archive'),
+        'min_size_mb': 10,
+    }))
+
+    def no_probe():
+        raise AssertionError('path defaults probed with both paths configured')
+
+    monkeypatch.setattr(Config, 'get_default_downloads_path', staticmethod(no_probe))
+    monkeypatch.setattr(Config, 'get_default_archive_path', staticmethod(no_probe))
+    saves = []
+    save = Config._save_config
+    monkeypatch.setattr(Config, '_save_config', lambda self, config: saves.append(1) or save(self, config))
+
+    config = Config(str(config_file))
+    assert config.get('min_size_mb') == 10
+    assert config.get('delete_mode') == 'delete'
+    assert set(Config.DEFAULT_SETTINGS) <= set(json.loads(config_file.read_text()))
+    assert len(saves) == 1
+    assert 'Missing' not in capsys.readouterr().out
+
+    # Nothing is missing on the next load, so the file is left alone
+    Config(str(config_file))
+    assert len(saves) == 1
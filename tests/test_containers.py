@@ -0,0 +1,123 @@
+import os
+import zipfile
+from pathlib import Path
+import pytest
+from src.core import containers
+from src.core.containers import ContainerWriter, extract_member, manifest_path, read_manifest
+from .conftest import OLD_MTIME, make_file
+
+def _sources(downloads: Path, count: int, size: int = 1000):
+    """(source, arcname, size, mtime) tuples for ``count`` new files"""
+    return [
+        (str(make_file(downloads / 'docs' / f"file{i}.bin", size)), f"docs/file{i}.bin", size, OLD_MTIME)
+        for i in range(count)
+    ]
+
+def test_zip_containers_roll_over_and_list_their_members(tmp_path, downloads):
+    files = _sources(downloads, 10)
+    writer = ContainerWriter(str(tmp_path / 'out'), 'zip', container_size=3000, max_workers=1,
+                             remove_sources=False)
+    result = writer.write(files)
+    assert not result.errors
+    assert result.files == 10 and result.bytes_in == 10000
+    # Three files fit under the size, so ten files need four containers
+    assert len(result.containers) == 4
+    names = []
+    for container in result.containers:
+        records = list(read_manifest(container))
+        with zipfile.ZipFile(container) as zf:
+            assert zf.namelist() == [record['name'] for record in records]
+        names += [record['name'] for record in records]
+    assert sorted(names) == sorted(arcname for _, arcname, _, _ in files)
+    assert all(os.path.exists(source) for source, *_ in files)
+
+def test_sources_are_removed_and_reported_in_batches(tmp_path, downloads, monkeypatch):
+    monkeypatch.setattr(containers, 'REMOVED_BATCH', 3)
+    files = _sources(downloads, 7)
+    batches = []
+    result = ContainerWriter(str(tmp_path / 'out'), 'zip', max_workers=1).write(files, on_removed=batches.append)
+    assert not result.errors
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert sorted(batch for group in batches for batch in group) == sorted((source, size) for source, _, size, _ in files)
+    assert not any(os.path.exists(source) for source, *_ in files)
+
+def test_a_source_that_cannot_be_removed_is_not_reported(tmp_path, downloads, monkeypatch):
+    files = _sources(downloads, 3)
+    stuck = files[1][0]
+    unlink = os.unlink
+
+    def failing_unlink(path, *args, **kwargs):
+        if path == stuck:
+            raise PermissionError(13, 'Permission denied', path)
+        return unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'unlink', failing_unlink)
+    removed = []
+    result = ContainerWriter(str(tmp_path / 'out'), 'zip', max_workers=1).write(files, on_removed=removed.extend)
+    assert [path for path, _ in result.errors] == [stuck]
+    assert stuck not in [source for source, _ in removed]
+    assert len(removed) == 2
+    assert os.path.exists(stuck)
+
+def test_on_file_reports_each_file_and_its_error(tmp_path, downloads):
+    files = _sources(downloads, 2)
+    os.unlink(files[0][0])
+    seen = []
+    result = ContainerWriter(str(tmp_path / 'out'), 'zip', max_workers=1).write(
+        files, on_file=lambda source, arcname, size, error: seen.append((arcname, error is None)))
+    assert sorted(seen) == [('docs/file0.bin', False), ('docs/file1.bin', True)]
+    assert result.files == 1
+
+@pytest.mark.parametrize('container_format', ['zip', 'tar.zst'])
+def test_extract_member(tmp_path, downloads, container_format):
+    if container_format == 'tar.zst':
+        pytest.importorskip('zstandard')
+    files = _sources(downloads, 5)
+    expected = Path(files[3][0]).read_bytes()
+    result = ContainerWriter(str(tmp_path / 'out'), container_format, max_workers=1).write(files)
+    [container] = result.containers
+    assert container.endswith('.' + container_format)
+
+    target = extract_member(container, 'docs/file3.bin', str(tmp_path / 'restored'))
+    assert target == str(tmp_path / 'restored' / 'docs' / 'file3.bin')
+    assert Path(target).read_bytes() == expected
+    assert os.stat(target).st_mtime == OLD_MTIME
+    with pytest.raises(KeyError):
+        extract_member(container, 'docs/missing.bin', str(tmp_path / 'restored'))
+
+def test_existing_containers_are_never_overwritten(tmp_path, downloads):
+    out = tmp_path / 'out'
+    first = ContainerWriter(str(out), 'zip', max_workers=1, remove_sources=False)
+    second = ContainerWriter(str(out), 'zip', max_workers=1, remove_sources=False)
+    # Same second, same prefix: the second writer has to pick another name
+    second._prefix = first._prefix
+    [taken] = first.write(_sources(downloads, 1)).containers
+    before = Path(taken).read_bytes()
+    [written] = second.write(_sources(downloads, 1)).containers
+    assert written != taken
+    assert Path(taken).read_bytes() == before
+    assert os.path.exists(manifest_path(written))
+
+def test_writing_stops_when_every_worker_has_died(tmp_path, downloads, monkeypatch):
+    monkeypatch.setattr(ContainerWriter, '_work', lambda self, *args: None)
+    monkeypatch.setattr(containers, 'PUT_TIMEOUT', 0.01)
+    writer = ContainerWriter(str(tmp_path / 'out'), 'zip', max_workers=1)
+    with pytest.raises(RuntimeError):
+        writer.write(_sources(downloads, 10))
+
+def test_a_source_changed_since_it_was_queued_is_left_in_place(tmp_path, downloads):
+    files = _sources(downloads, 2)
+    source, arcname, size, mtime = files[0]
+    files[0] = (source, arcname, size, mtime + 60)
+    result = ContainerWriter(str(tmp_path / 'out'), 'zip', max_workers=1).write(files)
+    assert [path for path, _ in result.errors] == [source]
+    assert result.files == 1
+    assert os.path.exists(source) and not os.path.exists(files[1][0])
+
+def test_a_few_files_share_one_container_across_workers(tmp_path, downloads):
+    files = _sources(downloads, 3)
+    result = ContainerWriter(str(tmp_path / 'out'), 'zip', max_workers=4).write(files)
+    assert not result.errors
+    assert len(result.containers) == 1
+    assert sorted(record['name'] for record in read_manifest(result.containers[0])) == \
+        sorted(arcname for _, arcname, _, _ in files)
@@ -0,0 +1,24 @@
+import os
+from src.core.cleaner import FileCleaner
+from src.core.duplicates import DuplicateFinder
+from .conftest import OLD_MTIME, make_file
+
+def test_redundant_copies_respect_keep_rules_and_hidden_files(downloads, config):
+    original = make_file(downloads / 'report.pdf', 5000)
+    content = original.read_bytes()
+    copies = {}
+    for offset, name in enumerate(['copy.pdf', 'Projects/report.pdf', 'report.zip', '.report.pdf'], 1):
+        path = downloads / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        os.utime(path, (OLD_MTIME + offset, OLD_MTIME + offset))
+        copies[name] = path
+    config['rules'] = [{'action': 'keep', 'path': 'Projects'}]
+    config['exclude_extensions'] = ['zip']
+
+    [group] = DuplicateFinder(config).find_duplicates()
+    assert str(group[0]['path']) == str(original)
+    assert str(copies['.report.pdf']) not in [str(info['path']) for info in group]
+
+    redundant = FileCleaner(config).identify_duplicates_to_clean([group])
+    assert [str(info['path']) for info in redundant] == [str(copies['copy.pdf'])]
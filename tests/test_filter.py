@@ -0,0 +1,20 @@
+from itertools import count
+from pathlib import Path
+from src.utils import file_utils
+from src.utils.file_utils import iter_filter_files
+
+def _infos(names, consumed):
+    for name in names:
+        consumed.append(name)
+        yield {'name': name, 'relative_path': Path('docs') / name, 'extension': 'pdf',
+               'is_hidden': False, 'age': 100, 'size': 1.0}
+
+def test_pattern_matches_stream_a_chunk_at_a_time(monkeypatch):
+    monkeypatch.setattr(file_utils, 'PATTERN_CHUNK', 10)
+    consumed = []
+    names = (f"invoice-{i}.pdf" if i % 7 == 3 else f"photo-{i}.pdf" for i in count())
+    matches = iter_filter_files(_infos(names, consumed), pattern='invoice')
+    assert next(matches)['name'] == 'invoice-3.pdf'
+    assert next(matches)['name'] == 'invoice-10.pdf'
+    # The walk is never read to its end
+    assert len(consumed) == 20
@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+from src.core.integrity import ArchiveManifest, file_digest, verify_archive
+from src.core.transfer import TransferEngine
+from .conftest import make_file
+
+def _archive(downloads: Path, archive: Path, count: int = 3):
+    """Copy ``count`` new files into ``archive`` the cross-device way, with a manifest"""
+    moves = [
+        (str(make_file(downloads / f"file{i}.bin", 5000)), str(archive / 'docs' / f"file{i}.bin"), 5000)
+        for i in range(count)
+    ]
+    digests = {target: file_digest(source) for source, target, _ in moves}
+    errors = []
+    TransferEngine(max_workers=2).transfer(
+        moves, same_device=False, manifest=ArchiveManifest(str(archive)),
+        on_done=lambda source, target, size, error: error and errors.append(error))
+    assert not errors
+    return moves, digests
+
+def test_copies_are_recorded_with_their_digest(tmp_path, downloads):
+    archive = tmp_path / 'Archive'
+    moves, digests = _archive(downloads, archive)
+    entries = ArchiveManifest(str(archive)).entries()
+    assert sorted(entries) == [f"docs/file{i}.bin" for i in range(3)]
+    for source, target, size in moves:
+        entry = entries[os.path.relpath(target, archive).replace(os.sep, '/')]
+        assert entry['digest'] == digests[target]
+        assert not os.path.exists(source)
+
+    result = verify_archive(str(archive))
+    assert result.ok
+    assert len(result.skipped) == 3 and not result.verified
+
+def test_verify_reports_changed_and_missing_files(tmp_path, downloads):
+    archive = tmp_path / 'Archive'
+    moves, _ = _archive(downloads, archive)
+    changed, deleted = moves[0][1], moves[1][1]
+    # Same size, new content and a new mtime
+    Path(changed).write_bytes(os.urandom(5000))
+    os.unlink(deleted)
+
+    result = verify_archive(str(archive))
+    assert not result.ok
+    assert [path for path, _ in result.corrupt] == ['docs/file0.bin']
+    assert result.missing == ['docs/file1.bin']
+    assert result.skipped == ['docs/file2.bin']
+
+def test_full_verify_reads_every_file_and_refreshes_touched_ones(tmp_path, downloads):
+    archive = tmp_path / 'Archive'
+    moves, _ = _archive(downloads, archive)
+    os.utime(moves[0][1], (1, 1))
+
+    result = verify_archive(str(archive), full=True)
+    assert result.ok
+    assert len(result.verified) == 3 and result.bytes_read == 15000
+    # The touched file checked out, so its new mtime is recorded
+    assert sorted(verify_archive(str(archive)).skipped) == [f"docs/file{i}.bin" for i in range(3)]
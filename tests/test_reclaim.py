@@ -0,0 +1,55 @@
+import time
+from datetime import datetime
+from pathlib import Path
+from src.core.reclaim import BYTES_PER_MB, CandidateHeap, SpaceReclaimer, reclaim_score
+from .conftest import make_file
+
+DAY = 86400
+
+def _info(name: str, size: int, idle_days: float, now: float):
+    used = datetime.fromtimestamp(now - idle_days * DAY)
+    return {'path': Path(name), 'size': size / BYTES_PER_MB, 'modified': used, 'last_access': used}
+
+def test_candidate_heap_keeps_the_best_scoring_files_until_the_need_is_covered():
+    now = time.time()
+    infos = [
+        _info('small-old', 100, 300, now),
+        _info('large-new', 1000, 0, now),
+        _info('large-old', 1000, 300, now),
+        _info('medium', 500, 30, now),
+    ]
+    heap = CandidateHeap(1500)
+    for info in infos:
+        size = round(info['size'] * BYTES_PER_MB)
+        heap.offer(info, reclaim_score(info, now), size)
+    assert heap.covered
+    # Staleness lifts the small file above the new one; the medium file is not needed
+    assert [info['path'].name for info in heap.selected()] == ['large-old', 'small-old', 'large-new']
+    assert heap.bytes == 2100
+
+def test_candidate_heap_with_nothing_to_free_picks_nothing():
+    now = time.time()
+    heap = CandidateHeap(0)
+    heap.offer(_info('file', 100, 10, now), 1.0, 100)
+    assert heap.selected() == []
+
+def test_plan_picks_large_stale_files_and_respects_keep_rules(downloads, config):
+    recent = time.time() - DAY
+    make_file(downloads / 'big-old.iso', 40000)
+    make_file(downloads / 'big-recent.iso', 40000, mtime=recent)
+    make_file(downloads / 'small-old.txt', 2000)
+    make_file(downloads / 'Projects' / 'huge-old.iso', 200000)
+    config['rules'] = [{'action': 'keep', 'path': 'Projects'}]
+
+    plan = SpaceReclaimer(config).plan(reclaim=30000)
+    assert [Path(info['path']).name for info in plan.files] == ['big-old.iso']
+    assert plan.shortfall == 0
+    assert plan.considered == 3
+
+    # More than the large stale file holds pulls in the small stale one
+    # before the recent one
+    plan = SpaceReclaimer(config).plan(reclaim=60000)
+    assert [Path(info['path']).name for info in plan.files] == ['big-old.iso', 'small-old.txt', 'big-recent.iso']
+
+    plan = SpaceReclaimer(config).plan(reclaim=10 ** 6)
+    assert plan.shortfall == 10 ** 6 - 82000
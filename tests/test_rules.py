@@ -0,0 +1,16 @@
+import pytest
+from src.utils.rules import Rule, RuleSet
+
+@pytest.mark.parametrize('regex', [r'(?P<n>foo)', r'(a)\1', r'(a)(?(1)b|c)'])
+def test_regexes_that_cannot_share_a_folder_pattern_are_rejected(regex):
+    with pytest.raises(ValueError, match='Rule 2: regex cannot use'):
+        Rule.from_dict({'action': 'keep', 'regex': regex}, 2)
+
+def test_rules_with_numbered_groups_combine_in_one_folder():
+    rules = RuleSet([
+        Rule.from_dict({'action': 'keep', 'regex': r'(draft|wip)-'}, 1),
+        Rule.from_dict({'action': 'delete', 'regex': r'(\d+)\.tmp$'}, 2),
+    ])
+    assert rules.decide('docs/wip-12.tmp', 1, 0).action == 'keep'
+    assert rules.decide('docs/final-12.tmp', 1, 0).action == 'delete'
+    assert rules.decide('docs/notes.txt', 1, 0).action == 'delete'
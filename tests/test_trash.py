@@ -0,0 +1,78 @@
+import os
+import time
+from src.core.trash import RESTORING, STAGED, TrashStore, _Journal
+from src.utils.file_utils import TRASH_DIR_NAME
+from .conftest import OLD_MTIME, make_file
+
+def test_stage_and_restore_round_trip(downloads):
+    files = [make_file(downloads / f"file{i}.bin", size=100) for i in range(3)]
+    store = TrashStore([downloads])
+    result = store.stage([(str(path), 100, OLD_MTIME) for path in files])
+    assert sorted(result.deleted) == sorted(map(str, files))
+    assert not any(path.exists() for path in files)
+
+    [batch] = store.batches()
+    assert batch.state == STAGED and batch.size == 300
+    restored = store.restore(result.trash_batch)
+    assert not restored.errors
+    assert all(path.exists() for path in files)
+    assert store.batches() == []
+
+def test_interrupted_stage_is_committed_and_restorable(downloads):
+    moved = make_file(downloads / 'moved.bin')
+    untouched = make_file(downloads / 'untouched.bin')
+    staging_dir = str(downloads / TRASH_DIR_NAME)
+    journal = _Journal(staging_dir)
+    batch_id = 'crashed'
+    staged = os.path.join(staging_dir, batch_id, '0-moved.bin')
+    # A run that logged both moves, renamed one file and then died
+    journal.append([{'op': 'begin', 'batch': batch_id, 'time': time.time()}])
+    journal.append([
+        {'op': 'move', 'batch': batch_id, 'source': str(moved), 'staged': staged, 'size': 16},
+        {'op': 'move', 'batch': batch_id, 'source': str(untouched),
+         'staged': os.path.join(staging_dir, batch_id, '1-untouched.bin'), 'size': 16},
+    ])
+    os.makedirs(os.path.dirname(staged))
+    os.rename(moved, staged)
+
+    store = TrashStore([downloads])
+    [batch] = store.batches()
+    assert batch.batch_id == batch_id and batch.state == STAGED
+    result = store.restore(batch_id)
+    assert result.files == [str(moved)]
+    assert moved.exists() and untouched.exists()
+
+def test_interrupted_restore_finishes_when_the_store_opens(downloads):
+    files = [make_file(downloads / f"file{i}.bin") for i in range(2)]
+    store = TrashStore([downloads])
+    batch_id = store.stage([(str(path), 16, OLD_MTIME) for path in files]).trash_batch
+    journal = next(iter(store.journals.values()))
+    [batch] = journal.replay().values()
+    # A restore that moved the first file back and then died
+    journal.append([{'op': 'restore', 'batch': batch_id}])
+    source, staged, _ = batch.files[0]
+    os.rename(staged, source)
+    assert journal.replay()[batch_id].state == RESTORING
+
+    reopened = TrashStore([downloads])
+    assert all(path.exists() for path in files)
+    assert reopened.batches() == []
+
+def test_journal_skips_a_torn_last_line(downloads):
+    path = make_file(downloads / 'file.bin')
+    store = TrashStore([downloads])
+    batch_id = store.stage([(str(path), 16, OLD_MTIME)]).trash_batch
+    journal = next(iter(store.journals.values()))
+    with open(journal.path, 'a') as f:
+        f.write('{"op": "purge", "ba')
+    assert TrashStore([downloads]).batches()[0].batch_id == batch_id
+    # The next append starts on a fresh line
+    assert TrashStore([downloads]).restore(batch_id).files == [str(path)]
+
+def test_files_changed_since_they_were_scanned_are_not_staged(downloads):
+    kept = make_file(downloads / 'rewritten.bin')
+    staged = make_file(downloads / 'stale.bin')
+    result = TrashStore([downloads]).stage([(str(kept), 10, OLD_MTIME), (str(staged), 16, OLD_MTIME)])
+    assert result.deleted == [str(staged)]
+    assert result.changed == [str(kept)]
+    assert kept.exists()
@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+import pytest
+from benchmarks.runner import SyscallCounter
+from src.core.scanner import FileScanner
+from src.utils.file_utils import walk_roots
+from src.utils import profiler
+from .conftest import make_file
+
+@pytest.fixture
+def tree(downloads: Path) -> Path:
+    for i in range(20):
+        make_file(downloads / f"file{i}.pdf")
+        make_file(downloads / 'docs' / 'nested' / f"doc{i}.txt")
+    for i in range(50):
+        make_file(downloads / 'node_modules' / 'pkg' / f"module{i}.js")
+    return downloads
+
+def _walked(config, index_file=None):
+    """Paths of every file a scan reports, with the real stat syscalls it made"""
+    with SyscallCounter() as counter:
+        paths = [str(info['path']) for info in FileScanner(config, index_file).iter_files()]
+    return paths, counter.counts['stat']
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_scan_stats_each_file_at_most_once(tmp_path, tree, config, use_index):
+    index_file = str(tmp_path / 'scan_index.db') if use_index else None
+    paths, stats = _walked(config, index_file)
+    assert len(paths) == 40
+    # One stat per file, plus the root stat that picks the device and, for
+    # the index, one stat per folder to compare its mtime
+    folders = 3 if use_index else 0
+    assert stats <= len(paths) + 1 + folders
+
+def test_scan_of_unchanged_tree_from_index_stats_only_folders(tmp_path, tree, config):
+    index_file = str(tmp_path / 'scan_index.db')
+    _walked(config, index_file)
+    paths, stats = _walked(config, index_file)
+    assert len(paths) == 40
+    # The root stat, then one stat per folder; no file is stat'ed again
+    assert stats == 1 + 3
+
+def test_excluded_folders_are_never_listed(tree, config, monkeypatch):
+    listed = []
+    scandir = os.scandir
+
+    def recording_scandir(path='.'):
+        listed.append(os.fspath(path))
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', recording_scandir)
+    paths = [entry.path for _, entry in walk_roots([tree], ['node_modules'])]
+    assert len(paths) == 40
+    assert listed
+    assert not any('node_modules' in path for path in listed)
+
+def test_profiler_counts_match_real_stats(tmp_path, tree, config):
+    for index_file in (None, str(tmp_path / 'scan_index.db')):
+        recorder = profiler.enable()
+        try:
+            with SyscallCounter() as counter:
+                list(FileScanner(config, index_file).iter_files())
+                FileScanner(config, index_file).top_files(5)
+        finally:
+            profiler.disable()
+        assert recorder.counters['stat_calls'] == counter.counts['stat']
+
+def test_pruned_and_full_walks_keep_their_own_records(tmp_path, tree, config):
+    make_file(tree / 'Projects' / 'app' / 'main.py')
+    config['rules'] = [{'action': 'keep', 'path': 'Projects'}]
+    index_file = str(tmp_path / 'scan_index.db')
+    scanner = FileScanner(config, index_file)
+    list(scanner.iter_files())
+    scanner.top_files(5)
+    # Neither walk emptied the other's records, so nothing is listed again
+    with SyscallCounter() as counter:
+        assert len(list(scanner.iter_files())) == 40
+        assert len(scanner.top_files(100)) == 41
+    assert counter.counts['scandir'] == 0
+
+def test_roots_walked_concurrently_share_the_index(tmp_path, config):
+    roots = [make_file(tmp_path / f"root{i}" / 'sub' / f"file{j}.pdf").parent.parent
+             for i in range(4) for j in range(30)][::30]
+    index_file = str(tmp_path / 'scan_index.db')
+    for _ in range(3):
+        paths = [entry.path for _, entry in walk_roots(roots, [], index_file, max_workers=4)]
+        assert len(paths) == 120